@@ -1,3 +1,14 @@
+from .match_index import MATCH_INDEX_TABLE_NAME, match_index_partition
 from .math import roman_to_integer
+from .raw_matches import (
+    MATCH_FILE_EXTENSION,
+    MATCH_INFO_TABLE_NAME,
+    MATCH_TIMELINE_TABLE_NAME,
+    find_raw_matches,
+    raw_match_id,
+    raw_match_partition,
+    raw_match_partition_columns,
+    read_raw_match,
+)
 from .threading import multithreaded
 from .tqdm import print, tqdm_range, work_generator
@@ -0,0 +1,24 @@
+"""
+Layout of the match index, shared by the ingestion that writes it
+(`ds_riot_api.match_index`, through the `riot_api_bucket` StorageS3 resource)
+and the transforms that read it (`ds_tables.basic.worker`).
+
+Keys follow `ds_storage.Storage.partition_path` for that resource
+(root = environment, dataset `riot_api`, schema `raw`):
+
+    <environment>/riot_api/raw/match_ids_index/region=<region>/<segment>.parquet
+"""
+from pathlib import Path
+
+
+MATCH_INDEX_DATASET = "riot_api"
+MATCH_INDEX_SCHEMA = "raw"
+MATCH_INDEX_TABLE_NAME = "match_ids_index"
+
+
+def match_index_partition(root: str, region: str) -> Path:
+    """
+    Directory of a region's index segments under `root`: the bucket's environment
+    prefix, or a local mirror of it.
+    """
+    return Path(root, MATCH_INDEX_DATASET, MATCH_INDEX_SCHEMA, MATCH_INDEX_TABLE_NAME, f"region={region}")
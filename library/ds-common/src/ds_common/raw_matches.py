@@ -0,0 +1,55 @@
+"""
+Layout of the raw match info and timeline objects, shared by the ingestion that writes them
+(`ds_riot_api.player_matches`, through the `riot_api_bucket` StorageS3 resource)
+and the transforms that read them (`ds_tables.basic.worker`).
+
+Each is the API's response body, gzipped, under the yearmonth of the match's day
+(root = environment, dataset `riot_api`, schema `raw`):
+
+    <environment>/riot_api/raw/<match_info|match_timeline>/region=<region>/yearmonth=<YYYYMM>/<match_id>.json.gz
+"""
+import gzip
+import json
+from pathlib import Path
+from .match_index import MATCH_INDEX_DATASET, MATCH_INDEX_SCHEMA
+
+
+MATCH_INFO_TABLE_NAME = "match_info"
+MATCH_TIMELINE_TABLE_NAME = "match_timeline"
+MATCH_FILE_EXTENSION = "json.gz"
+
+
+def raw_match_partition_columns(region: str, yearmonth: str) -> dict[str, str]:
+    """
+    Partitions of a raw match object, in the order of its key.
+    """
+    return {"region": region, "yearmonth": yearmonth}
+
+
+def raw_match_partition(root: str, table_name: str, region: str) -> Path:
+    """
+    Directory of a region's raw matches of `table_name` under `root`: the bucket's environment
+    prefix, or a local mirror of it. Holds a `yearmonth=<YYYYMM>` directory per month.
+    """
+    return Path(root, MATCH_INDEX_DATASET, MATCH_INDEX_SCHEMA, table_name, f"region={region}")
+
+
+def find_raw_matches(root: str, table_name: str, region: str, match_id: str = "*") -> list[Path]:
+    """
+    Paths of a region's raw matches of `table_name` (wildcard supported), whatever their yearmonth.
+    """
+    return sorted(raw_match_partition(root, table_name, region).glob(f"yearmonth=*/{match_id}.{MATCH_FILE_EXTENSION}"))
+
+
+def raw_match_id(path: Path) -> str:
+    return path.name.removesuffix(f".{MATCH_FILE_EXTENSION}")
+
+
+def read_raw_match(root: str, table_name: str, region: str, match_id: str) -> dict:
+    """
+    Decodes a raw match object. Raises FileNotFoundError if it isn't stored.
+    """
+    paths = find_raw_matches(root, table_name, region, match_id)
+    if not paths:
+        raise FileNotFoundError(f"{table_name} of match {match_id} not found in {raw_match_partition(root, table_name, region)}.")
+    return json.loads(gzip.decompress(paths[0].read_bytes()))
@@ -170,9 +170,13 @@ class StorageIceberg(Storage):
         mode: str = 'append',
         retries: int = DEFAULT_RETRIES,
         backoff_factor: int = DEFAULT_BACKOFF_FACTOR,
+        overwrite_filter: BooleanExpression = None,
     ):
         """
         Attempt to write a PyArrow table to Iceberg, retrying on failure.
+
+        In 'overwrite' mode, `overwrite_filter` restricts the replaced rows
+        (e.g. to a single partition); without it, the whole table is replaced.
         """
         table = self.catalog.load_table(self.full_table_name(table_name))
 
@@ -188,7 +192,10 @@ class StorageIceberg(Storage):
                     case 'overwrite':
                         # Replaces all rows with the new payload — used for "latest
                         # snapshot" tables where history is not retained at this layer.
-                        table.overwrite(pyarrow_table)
+                        if overwrite_filter is not None:
+                            table.overwrite(pyarrow_table, overwrite_filter=overwrite_filter)
+                        else:
+                            table.overwrite(pyarrow_table)
                     case _:
                         raise ValueError(f"Unsupported write mode: '{mode}'")
                 return  # Success
@@ -208,6 +215,7 @@ class StorageIceberg(Storage):
         mode: str = 'append',
         retries: int = DEFAULT_RETRIES,
         backoff_factor: int = DEFAULT_BACKOFF_FACTOR,
+        overwrite_filter: BooleanExpression = None,
     ):
         """
         Load a Polars DataFrame into an Iceberg table.
@@ -219,7 +227,8 @@ class StorageIceberg(Storage):
             convert_polars_df_to_pyarrow_table_using_iceberg_schema(df, schema),
             mode=mode,
             retries=retries,
-            backoff_factor=backoff_factor
+            backoff_factor=backoff_factor,
+            overwrite_filter=overwrite_filter,
         )
 
 
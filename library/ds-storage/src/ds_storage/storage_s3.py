@@ -3,6 +3,7 @@ from botocore.config import Config
 from botocore.exceptions import ClientError
 import duckdb
 import fnmatch
+import gzip
 import io
 import json
 import os
@@ -79,6 +80,7 @@ class StorageS3(Storage):
         self,
         table_name: str,
         object_name: str = "*",
+        file_extension: Optional[str] = None,
         **partition_columns: Optional[dict[str, str]]
     ) -> list[str]:
         """
@@ -98,7 +100,7 @@ class StorageS3(Storage):
         pages = paginator.paginate(Bucket=self.bucket_name, Prefix=prefix)
 
         # Create our filename wildcard pattern (e.g., "*.parquet" or "2026-03-08.parquet")
-        file_pattern = f"{object_name}.{self.file_extension}"
+        file_pattern = f"{object_name}.{file_extension or self.file_extension}"
 
         results = []
 
@@ -117,6 +119,20 @@ class StorageS3(Storage):
         return results
 
 
+    def delete_objects(self, keys: list[str]):
+        """
+        Deletes the given S3 object keys (e.g. as returned by `list_objects`).
+        """
+        # S3 accepts at most 1000 keys per DeleteObjects request
+        for i in range(0, len(keys), 1000):
+            self.client.delete_objects(
+                Bucket=self.bucket_name,
+                Delete={
+                    "Objects": [{"Key": key} for key in keys[i:i + 1000]],
+                    "Quiet": True,
+                }
+            )
+
     def get_object_as_json(
         self,
         table_name: str,
@@ -149,11 +165,58 @@ class StorageS3(Storage):
         match ext:
             case 'json':
                 return pl.read_json(response['Body'].read())
+            case 'json.gz':
+                return pl.read_json(gzip.decompress(response['Body'].read()))
             case 'parquet':
                 return pl.read_parquet(response["Body"].read())
             case _:
                 raise ValueError(f"Unsupported file extension: {ext}")
 
+    def storage_options(self) -> dict[str, str]:
+        """
+        S3 credentials and endpoint in the format expected by Polars' cloud readers.
+        """
+        return {
+            "aws_access_key_id": self.access_key_id,
+            "aws_secret_access_key": self.secret_access_key,
+            "aws_endpoint_url": self.bucket_endpoint,
+            "aws_region": "auto",
+        }
+
+    def scan_objects(
+        self,
+        table_name: str,
+        object_name: str = "*",
+        schema: Optional[pl.Schema | dict[str, pl.DataType]] = None,
+        **partition_columns: Optional[dict[str, str]]
+    ) -> pl.LazyFrame:
+        """
+        Lazily scans every parquet object matching the table, object_name (wildcard supported)
+        and any provided partitions, as a single Polars LazyFrame.
+
+        Omitted nested partitions are traversed, and every `k=v` partition in an object's key
+        is exposed as a column (hive partitioning).
+
+        Without a `schema`, every object must have the same columns and dtypes.
+        With one, objects written with older layouts are aligned to it: its columns
+        missing from an object are null, other columns are ignored, and integers are upcast.
+        """
+        if self.file_extension != 'parquet':
+            raise ValueError(f"Scans aren't supported for file extension: '{self.file_extension}'")
+
+        schema_options = {} if schema is None else {
+            "schema": schema,
+            "missing_columns": "insert",
+            "extra_columns": "ignore",
+            "cast_options": pl.ScanCastOptions(integer_cast="upcast"),
+        }
+        return pl.scan_parquet(
+            f"{self.s3_uri(table_name, **partition_columns)}/**/{object_name}.parquet",
+            hive_partitioning=True,
+            storage_options=self.storage_options(),
+            **schema_options,
+        )
+
     def download_file(
         self,
         target_file_path: str,
@@ -279,7 +342,7 @@ class StorageS3(Storage):
 
     def upload(
         self,
-        data: pl.DataFrame | list[dict],
+        data: pl.DataFrame | list[dict] | bytes,
         table_name: str,
         object_name: str,
         file_extension: Optional[str] = None,
@@ -292,6 +355,9 @@ class StorageS3(Storage):
         Polars DataFrame writes a zero-column "root only" parquet that DuckDB and most
         readers reject as malformed. Either way, callers shouldn't have to know — we
         silently skip the write so glob-based readers don't trip over corpse blobs.
+
+        `json.gz` uploads also accept an already-serialized JSON body as bytes
+        (e.g. a raw API response), which is stored gzip-compressed as-is.
         """
         file_extension = file_extension or self.file_extension
 
@@ -315,6 +381,16 @@ class StorageS3(Storage):
                     Body=json.dumps(data).encode("utf-8"),
                     ContentType='application/json'
                 )
+            case 'json.gz':
+                assert isinstance(data, (list, bytes)), "Data must be a list of records or JSON bytes for JSON uploads"
+                body = data if isinstance(data, bytes) else json.dumps(data).encode("utf-8")
+
+                self.client.put_object(
+                    Bucket=self.bucket_name,
+                    Key=object_key,
+                    Body=gzip.compress(body),
+                    ContentType='application/gzip'
+                )
             case 'parquet':
                 assert isinstance(data, pl.DataFrame), "Data must be a DataFrame for parquet uploads"
 
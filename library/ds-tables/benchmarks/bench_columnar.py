@@ -0,0 +1,95 @@
+"""
+Validates the columnar matches engine against the Python path, and compares their throughput.
+
+Expects the raw layer's layout, as `bench_timeline_into_events.py` does:
+
+    python benchmarks/bench_columnar.py \\
+        --match-info raw/riot_api/match_info/region=europe \\
+        --match-timeline raw/riot_api/match_timeline/region=europe \\
+        --region europe
+
+Both engines' `matches`, `participants` and `events` tables must be identical
+once standardized to the schema; the first difference is raised.
+Run from the directory holding `data/cdragon` (the default item positions).
+"""
+import argparse
+import copy
+import gzip
+import orjson
+from pathlib import Path
+import polars as pl
+from polars.testing import assert_frame_equal
+import time
+from ds_tables.basic.matches import columnar, transform
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compare the columnar and Python matches engines.")
+
+    parser.add_argument("--match-info", required=True, help="Directory of recorded match info files.")
+    parser.add_argument("--match-timeline", required=True, help="Directory of recorded match timeline files.")
+    parser.add_argument("--region", required=True, help="Region of the recorded matches.")
+    parser.add_argument("--count", type=int, default=200, help="Matches to process.")
+
+    return parser.parse_args()
+
+
+def read_body(path: Path) -> bytes:
+    body = path.read_bytes()
+    return gzip.decompress(body) if path.name.endswith(".gz") else body
+
+
+def load_bodies(match_info_dir: str, match_timeline_dir: str, count: int) -> tuple[list[str], list[bytes], list[bytes]]:
+    match_ids, infos, timelines = [], [], []
+    for timeline_path in sorted(Path(match_timeline_dir).glob("*.json*")):
+        match_id = timeline_path.name.split(".json")[0]
+        info_path = next(Path(match_info_dir).glob(f"{match_id}.json*"), None)
+        if info_path is None:
+            continue
+
+        match_ids.append(match_id)
+        infos.append(read_body(info_path))
+        timelines.append(read_body(timeline_path))
+        if len(match_ids) == count:
+            break
+    return match_ids, infos, timelines
+
+
+def python_engine(match_ids, infos, timelines, region):
+    matches, participants, events = [], [], []
+    for match_id, info, timeline in zip(match_ids, infos, timelines):
+        match, match_participants = transform.match_into_match_and_participants(match_id, orjson.loads(info), region)
+        # The participants are mutated by neither, but kept apart from the stored rows
+        events.extend(transform.timeline_into_events(orjson.loads(timeline), copy.deepcopy(match_participants)))
+        matches.append(match)
+        participants.extend(match_participants)
+    return matches, participants, events
+
+
+def main():
+    args = parse_args()
+    match_ids, infos, timelines = load_bodies(args.match_info, args.match_timeline, args.count)
+    if not match_ids:
+        raise SystemExit("No recorded matches found.")
+
+    start = time.perf_counter()
+    matches, participants, events = python_engine(match_ids, infos, timelines, args.region)
+    python_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    df_matches, df_participants = columnar.matches_into_matches_and_participants(match_ids, infos, args.region)
+    df_events = columnar.timelines_into_events(timelines, df_participants)
+    columnar_s = time.perf_counter() - start
+
+    assert_frame_equal(columnar.standardize_matches(matches), df_matches)
+    assert_frame_equal(columnar.standardize_participants(participants), df_participants)
+    assert_frame_equal(columnar.standardize_events(events), df_events)
+
+    print(f"{len(match_ids)} matches, {len(df_events)} events: identical output "
+          f"({pl.thread_pool_size()} Polars threads)")
+    for engine, seconds in (("python", python_s), ("columnar", columnar_s)):
+        print(f"{engine:<9} {seconds:.2f}s  {len(match_ids) / seconds:.1f} matches/s  {len(df_events) / seconds:.0f} events/s")
+
+
+if __name__ == "__main__":
+    main()
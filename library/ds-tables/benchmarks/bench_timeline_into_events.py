@@ -0,0 +1,91 @@
+"""
+Benchmark of `timeline_into_events` over a set of recorded matches.
+
+Expects the raw layer's layout: one `<match_id>.json` (or `.json.gz`) per match
+in a match info directory, and the same name in a match timeline directory.
+
+    python benchmarks/bench_timeline_into_events.py \\
+        --match-info raw/riot_api/match_info/region=europe \\
+        --match-timeline raw/riot_api/match_timeline/region=europe
+
+Reports matches/s, events/s and p50/p99 time per match, and the time per match
+against its event count (which should stay flat: the transform is O(n log n)).
+Run from the directory holding `data/cdragon` (the default item positions).
+"""
+import argparse
+import copy
+import gzip
+import json
+from pathlib import Path
+import statistics
+import time
+from ds_tables.basic.matches import transform
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark timeline_into_events on recorded matches.")
+
+    parser.add_argument("--match-info", required=True, help="Directory of recorded match info files.")
+    parser.add_argument("--match-timeline", required=True, help="Directory of recorded match timeline files.")
+    parser.add_argument("--count", type=int, default=100, help="Matches to benchmark.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per match (the fastest is kept).")
+
+    return parser.parse_args()
+
+
+def read_json(path: Path) -> dict:
+    if path.name.endswith(".gz"):
+        return json.loads(gzip.decompress(path.read_bytes()))
+    return json.loads(path.read_bytes())
+
+
+def load_matches(match_info_dir: str, match_timeline_dir: str, count: int) -> list[tuple[str, dict, list[dict]]]:
+    matches = []
+    for timeline_path in sorted(Path(match_timeline_dir).glob("*.json*")):
+        match_id = timeline_path.name.split(".json")[0]
+        info_path = next(Path(match_info_dir).glob(f"{match_id}.json*"), None)
+        if info_path is None:
+            continue
+
+        info = read_json(info_path)
+        _match, participants = transform.match_into_match_and_participants(match_id, info, region="")
+        matches.append((match_id, read_json(timeline_path), participants))
+        if len(matches) == count:
+            break
+    return matches
+
+
+def main():
+    args = parse_args()
+    matches = load_matches(args.match_info, args.match_timeline, args.count)
+    if not matches:
+        raise SystemExit("No recorded matches found.")
+
+    durations = []
+    event_counts = []
+    for match_id, timeline, participants in matches:
+        best = float("inf")
+        for _ in range(args.repeat):
+            # The transform mutates the timeline in place
+            timeline_copy = copy.deepcopy(timeline)
+            start = time.perf_counter()
+            events = transform.timeline_into_events(timeline=timeline_copy, participants=participants)
+            best = min(best, time.perf_counter() - start)
+        durations.append(best)
+        event_counts.append(len(events))
+
+    total = sum(durations)
+    quantiles = statistics.quantiles(durations, n=100) if len(durations) > 1 else durations * 99
+    print(f"{len(matches)} matches, {sum(event_counts)} events")
+    print(f"{len(matches) / total:.1f} matches/s, {sum(event_counts) / total:.0f} events/s")
+    print(f"p50 {1000 * quantiles[49]:.2f} ms, p99 {1000 * quantiles[98]:.2f} ms per match")
+
+    # Cost per event by match size: roughly constant when the transform scales linearly
+    by_size = sorted(zip(event_counts, durations))
+    for label, chunk in (("smallest", by_size[:len(by_size) // 4 or 1]), ("largest", by_size[-(len(by_size) // 4 or 1):])):
+        events, seconds = sum(n for n, _ in chunk), sum(d for _, d in chunk)
+        print(f"{label} quarter: {events / len(chunk):.0f} events/match, {1e6 * seconds / events:.1f} µs/event")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Benchmark of the ultimate events enrichment, the lazy plan of `enrich_events`.
+
+Expects parquet files of the basic tables (globs accepted), e.g. a shard of 1,000 matches:
+
+    python benchmarks/bench_ultimate_events.py \\
+        --events "basic/matches/events/region=europe/*.parquet" \\
+        --participants "basic/matches/participants/region=europe/*.parquet" \\
+        --matches "basic/matches/matches/region=europe/*.parquet" \\
+        --count 1000
+"""
+import argparse
+import polars as pl
+import time
+from ds_tables.ultimate.events import transform
+
+
+# The pre-game columns `ultimate.events.main` keeps
+PARTICIPANT_COLUMNS = [
+    "championId", "summoner1Id", "summoner2Id",
+    "rune_primary_0", "rune_primary_1", "rune_primary_2", "rune_primary_3",
+    "rune_secondary_0", "rune_secondary_1",
+    "rune_shard_offense", "rune_shard_flex", "rune_shard_defense",
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the ultimate events enrichment.")
+
+    parser.add_argument("--events", required=True, help="Parquet files of basic events.")
+    parser.add_argument("--participants", required=True, help="Parquet files of basic participants.")
+    parser.add_argument("--matches", required=True, help="Parquet files of basic matches.")
+    parser.add_argument("--count", type=int, default=1000, help="Matches in the shard.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs (the fastest is kept).")
+
+    return parser.parse_args()
+
+
+def enrich(df_events, df_participants, df_matches) -> pl.DataFrame:
+    return transform.enrich_events(df_events, df_participants, df_matches).collect()
+
+
+def main():
+    args = parse_args()
+    df_matches = pl.read_parquet(args.matches).head(args.count)
+    match_ids = df_matches["matchId"]
+    df_events = pl.scan_parquet(args.events).filter(pl.col("matchId").is_in(match_ids)).collect()
+    df_participants = (
+        pl.scan_parquet(args.participants)
+        .filter(pl.col("matchId").is_in(match_ids))
+        .select("matchId", "participantId", *PARTICIPANT_COLUMNS)
+        .collect()
+    )
+    print(f"{len(df_matches)} matches, {len(df_events)} events ({pl.thread_pool_size()} Polars threads)")
+
+    best = float("inf")
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        df = enrich(df_events, df_participants, df_matches)
+        best = min(best, time.perf_counter() - start)
+    print(f"{best:.2f}s  {len(df_events) / best:.0f} events/s  -> {df.shape}")
+
+
+if __name__ == "__main__":
+    main()
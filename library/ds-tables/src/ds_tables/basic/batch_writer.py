@@ -0,0 +1,134 @@
+"""
+Adaptive, byte-bounded buffers between the matches transform and storage.
+
+Each processed chunk of matches arrives as one Polars (Arrow-backed) frame per
+table. Frames are buffered per table, and a table's buffer is stored once it
+holds the matches of about `target_file_bytes` of parquet, as measured by its
+`BatchSizer`: the tables differ by orders of magnitude in bytes per match, and
+a batch of late-game matches weighs several times one of early surrenders, so
+a fixed number of matches makes files of any size.
+
+`max_bytes` caps the memory a table's buffer may take regardless (stored files
+are then smaller than the target).
+
+Batches are stored sorted by matchId, so each row group of their parquet
+files covers a narrow range of matchIds, which its statistics record: loads
+filtered on matchIds (`ultimate.load`) then skip the other row groups.
+"""
+from ds_common import print
+import io
+import polars as pl
+import resource
+import packages.storage.src as src
+
+
+# Parquet bytes per stored file, per table
+TARGET_FILE_BYTES = 128 * 2**20
+# Buffered bytes (in memory, as Arrow) per table before storing it regardless
+BUFFER_BYTES = 2**30
+
+
+class BatchSizer():
+    """
+    Matches per batch of a table, for its parquet file to weigh about `target_bytes`.
+    Parquet bytes per match are measured on the first chunks, then every `sample_every`.
+    """
+    def __init__(
+        self,
+        target_bytes: int = TARGET_FILE_BYTES,
+        warmup: int = 3,
+        sample_every: int = 10,
+    ):
+        self.target_bytes = target_bytes
+        self.warmup = warmup
+        self.sample_every = sample_every
+        self.chunks = 0
+        self.sampled_bytes = 0
+        self.sampled_matches = 0
+
+    def observe(self, df: pl.DataFrame, matches: int):
+        self.chunks += 1
+        if self.chunks > self.warmup and self.chunks % self.sample_every:
+            return
+        buffer = io.BytesIO()
+        df.write_parquet(buffer)
+        self.sampled_bytes += buffer.tell()
+        self.sampled_matches += matches
+
+    @property
+    def bytes_per_match(self) -> float | None:
+        return self.sampled_bytes / self.sampled_matches if self.sampled_matches else None
+
+    @property
+    def matches_per_batch(self) -> int:
+        if self.bytes_per_match is None:
+            return 1
+        return max(1, round(self.target_bytes / self.bytes_per_match))
+
+
+class BatchWriter():
+    def __init__(
+        self,
+        storage: src.StoragePartition,
+        tables: list[str],
+        descriptor: str,
+        target_file_bytes: int = TARGET_FILE_BYTES,
+        max_bytes: int = BUFFER_BYTES,
+    ):
+        self.storage = storage
+        self.descriptor = descriptor
+        self.max_bytes = max_bytes
+        self.sizers = {table: BatchSizer(target_file_bytes) for table in tables}
+        self.buffers = {table: [] for table in tables}
+        self.buffered_bytes = {table: 0 for table in tables}
+        self.buffered_matches = {table: 0 for table in tables}
+        # High-water mark of the bytes buffered across tables
+        self.peak_bytes = 0
+
+    def append(self, frames: dict[str, pl.DataFrame], matches: int):
+        """
+        Buffers the frames of `matches` matches, one per table,
+        and stores the tables whose buffer reached its batch size.
+        """
+        for table, df in frames.items():
+            if df.is_empty():
+                continue
+            self.sizers[table].observe(df, matches)
+            self.buffers[table].append(df)
+            self.buffered_bytes[table] += df.estimated_size()
+            self.buffered_matches[table] += matches
+        self.peak_bytes = max(self.peak_bytes, sum(self.buffered_bytes.values()))
+
+        for table in self.buffers:
+            if (
+                self.buffered_matches[table] >= self.sizers[table].matches_per_batch
+                or self.buffered_bytes[table] >= self.max_bytes
+            ):
+                self.store(table)
+
+    def store(self, table: str):
+        if not self.buffers[table]:
+            return
+        print(
+            f"[{self.descriptor}] Storing {table} batch: {self.buffered_matches[table]} matches, "
+            f"~{self.buffered_matches[table] * self.sizers[table].bytes_per_match / 2**20:.0f} MB"
+        )
+        # Stable: the events of a match keep their order
+        self.storage.store_batch(table, pl.concat(self.buffers[table]).sort("matchId", maintain_order=True))
+        self.buffers[table].clear()
+        self.buffered_bytes[table] = 0
+        self.buffered_matches[table] = 0
+
+    def close(self):
+        """
+        Stores what remains buffered, and reports the memory high-water marks.
+        """
+        for table in self.buffers:
+            self.store(table)
+        # ru_maxrss is in KB on Linux; the children are the worker processes already reaped
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**10
+        peak_rss_children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 2**10
+        print(
+            f"[{self.descriptor}] Peak buffered: {self.peak_bytes / 2**20:.0f} MB, "
+            f"peak RSS: {peak_rss:.0f} MB (largest worker: {peak_rss_children:.0f} MB)"
+        )
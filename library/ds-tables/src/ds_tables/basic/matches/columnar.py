@@ -0,0 +1,478 @@
+"""
+Columnar engine for the basic matches transform.
+
+Same output as `transform` (`match_into_match_and_participants` and
+`timeline_into_events`, once standardized to `schema`), but for a batch of
+matches at once: the raw JSON bodies are decoded by Polars in a single call,
+and flattening, kill/assist/killed expansion, respawn derivation and default
+positions are expressions and joins over the whole batch, which Polars runs
+across every core instead of one interpreter thread.
+
+Inventories are the exception: each item event depends on every earlier one
+of its participant (including undos), so they're replayed per match in Python
+(`inventory.replay_item_events`), over item events only.
+
+`standardize_events` (and friends) bring the Python path's records to the same
+columns and types, so both engines can be compared frame to frame.
+"""
+from array import array
+from dorans import death
+from itertools import groupby
+import numpy as np
+from operator import itemgetter
+import polars as pl
+import re
+from .coordinates import camp_coordinates, spawn_coordinates
+from .inventory import LIST_OF_CONSUMABLES, replay_item_events
+from .schema import EVENTS, MATCHES, PARTICIPANTS
+from .transform import participant_id_from_auto_item_event
+
+
+# Fields the expressions below refer to, which a batch may lack altogether
+EVENT_FIELDS = {
+    'actualStartTime': pl.Int64,
+    'assistingParticipantIds': pl.List(pl.Int64),
+    'creatorId': pl.Int64,
+    'gameId': pl.Int64,
+    'itemId': pl.Int64,
+    'killerId': pl.Int64,
+    'level': pl.Int64,
+    'position': pl.Struct({'x': pl.Int64, 'y': pl.Int64}),
+    'realTimestamp': pl.Int64,
+    'teamId': pl.Int64,
+    'victimId': pl.Int64,
+}
+
+
+def _json_array(bodies: list[bytes]) -> bytes:
+    # A JSON array rather than NDJSON: raw bodies may span several lines
+    return b"[" + b",".join(bodies) + b"]"
+
+
+def _with_fields(df: pl.DataFrame, fields: dict[str, pl.DataType]) -> pl.DataFrame:
+    return df.with_columns(
+        pl.lit(None, dtype=dtype).alias(name)
+        for name, dtype in fields.items()
+        if name not in df.columns
+    )
+
+
+def _standardize(df: pl.DataFrame, schema: dict[str, pl.DataType]) -> pl.DataFrame:
+    if df.width == 0:
+        # No records at all: literals alone would make a row of nulls
+        return pl.DataFrame(schema=schema)
+    return df.select(
+        (pl.col(name) if name in df.columns else pl.lit(None)).cast(dtype, strict=False).alias(name)
+        for name, dtype in schema.items()
+    )
+
+
+def standardize_events(events: list[dict] | pl.DataFrame) -> pl.DataFrame:
+    """
+    Events (e.g. from `transform.timeline_into_events`) with the columns and types of `schema.EVENTS`.
+    """
+    if not isinstance(events, pl.DataFrame):
+        events = pl.DataFrame(events, infer_schema_length=None)
+    return _standardize(events, EVENTS)
+
+
+def standardize_matches(matches: list[dict] | pl.DataFrame) -> pl.DataFrame:
+    if not isinstance(matches, pl.DataFrame):
+        matches = pl.DataFrame(matches, infer_schema_length=None)
+    return _standardize(matches, MATCHES)
+
+
+def standardize_participants(participants: list[dict] | pl.DataFrame) -> pl.DataFrame:
+    if not isinstance(participants, pl.DataFrame):
+        participants = pl.DataFrame(participants, infer_schema_length=None)
+    return _standardize(participants, PARTICIPANTS)
+
+
+def _struct_field(expr: pl.Expr, dtype: pl.DataType, *path: str) -> pl.Expr:
+    """
+    `expr.struct.field(*path)`, or null when the batch never has that field.
+    """
+    for name in path:
+        if not isinstance(dtype, pl.Struct) or name not in {field.name for field in dtype.fields}:
+            return pl.lit(None)
+        dtype = next(field.dtype for field in dtype.fields if field.name == name)
+        expr = expr.struct.field(name)
+    return expr
+
+
+def matches_into_matches_and_participants(
+    match_ids: list[str],
+    matches: list[bytes],
+    region: str,
+) -> tuple[pl.DataFrame, pl.DataFrame]:
+    """
+    Raw `match_info` bodies into the `matches` and `participants` tables.
+    """
+    df_info = (
+        pl.read_json(_json_array(matches), infer_schema_length=None)
+        .select(pl.col("info"))
+        .unnest("info")
+        .with_columns(
+            matchId=pl.Series(match_ids, dtype=pl.String),
+            region=pl.lit(region),
+            # Retain only the patch
+            patch=pl.col("gameVersion").str.split(".").list.slice(0, 2).list.join("."),
+        )
+    )
+
+    team_dtype = df_info.schema["teams"].inner
+    teams = {
+        team_id: pl.col("teams").list.eval(
+            pl.element().filter(pl.element().struct.field("teamId") == team_id)
+        ).list.first()
+        for team_id in (100, 200)
+    }
+
+    # Team columns, as listed in the schema: objectives (`_first`/`_kills`) and feats
+    team_columns = []
+    for column in MATCHES:
+        if not (match := re.fullmatch(r"team_(\d+)_(.+)", column)):
+            continue
+        team, name = teams[int(match.group(1))], match.group(2)
+        if objective := re.fullmatch(r"(.+)_(first|kills)", name):
+            team_columns.append(
+                _struct_field(team, team_dtype, "objectives", objective.group(1), objective.group(2)).alias(column)
+            )
+        else:
+            team_columns.append(_struct_field(team, team_dtype, "feats", name, "featState").alias(column))
+
+    df_matches = df_info.with_columns(
+        *team_columns,
+        winner_team_id=pl.col("teams").list.eval(
+            pl.element().filter(pl.element().struct.field("win")).struct.field("teamId")
+        ).list.first(),
+    )
+
+    df_participants = (
+        df_info
+        .select("matchId", "teams", "participants")
+        .with_columns(i=pl.int_ranges(pl.col("participants").list.len()))
+        .explode("participants", "i")
+        .unnest("participants")
+    )
+    # Draft information: the ban (and pick turn) of the same slot in the participant's team
+    team_bans = pl.when(pl.col("teamId") == 100).then(teams[100]).otherwise(teams[200]).struct.field("bans")
+    ban = team_bans.list.get(pl.col("i") % 5, null_on_oob=True)
+    # Runes, as listed in the schema: primary and secondary selections, and shards
+    styles = pl.col("perks").struct.field("styles")
+    rune_columns = []
+    for column in PARTICIPANTS:
+        if rune := re.fullmatch(r"rune_(primary|secondary)_(\d+)", column):
+            style = styles.list.get(0 if rune.group(1) == "primary" else 1, null_on_oob=True)
+            rune_columns.append(
+                style.struct.field("selections")
+                .list.get(int(rune.group(2)), null_on_oob=True)
+                .struct.field("perk")
+                .alias(column)
+            )
+        elif column.startswith("rune_shard_"):
+            rune_columns.append(
+                _struct_field(
+                    pl.col("perks"), df_participants.schema["perks"], "statPerks", column.removeprefix("rune_shard_")
+                ).alias(column)
+            )
+    df_participants = df_participants.with_columns(
+        *rune_columns,
+        ban=ban.struct.field("championId"),
+        pickTurn=ban.struct.field("pickTurn"),
+    )
+
+    return standardize_matches(df_matches), standardize_participants(df_participants)
+
+
+def _respawn_timer(level: pl.Expr, timestamp: pl.Expr) -> pl.Expr:
+    """
+    `dorans.death.timer(level, game_minutes=timestamp / 60000)`, evaluated by `dorans`
+    itself (once per champion kill), so the formula only lives there.
+    """
+    return pl.struct(level=level, timestamp=timestamp).map_batches(
+        lambda s: pl.Series(
+            [
+                death.timer(level=level, game_minutes=timestamp / 60000)
+                for level, timestamp in zip(s.struct.field("level"), s.struct.field("timestamp"))
+            ],
+            dtype=pl.Float64,
+        ),
+        return_dtype=pl.Float64,
+    )
+
+
+def _closest(
+    df_events: pl.DataFrame,
+    df_candidates: pl.DataFrame,
+    left_by: list[str],
+    right_by: list[str],
+) -> pl.DataFrame:
+    """
+    For each event, the candidate of the same match and participant closest in time
+    (on ties, the earliest), as `transform.EventIndex.closest` does.
+    """
+    df_candidates = (
+        df_candidates
+        # Among simultaneous candidates, the first one wins
+        .unique(subset=[*right_by, "timestamp"], keep="first", maintain_order=True)
+        .sort("timestamp")
+    )
+    df_events = df_events.sort("timestamp")
+    df_before = df_events.join_asof(
+        df_candidates.rename({"timestamp": "before"}),
+        left_on="timestamp", right_on="before", by_left=left_by, by_right=right_by, strategy="backward",
+        check_sortedness=False,
+    )
+    df_after = df_events.select("ordinal", "timestamp", *left_by).join_asof(
+        df_candidates.rename({"timestamp": "after"}),
+        left_on="timestamp", right_on="after", by_left=left_by, by_right=right_by, strategy="forward",
+        check_sortedness=False,
+    )
+    values = [column for column in df_candidates.columns if column not in (*right_by, "timestamp")]
+    df_after = df_after.select("ordinal", "after", *[pl.col(column).alias(f"{column}_after") for column in values])
+
+    take_after = pl.col("before").is_null() | (
+        pl.col("after").is_not_null()
+        & (pl.col("timestamp") - pl.col("before") > pl.col("after") - pl.col("timestamp"))
+    )
+    return df_before.join(df_after, on="ordinal").select(
+        "ordinal",
+        *[pl.when(take_after).then(pl.col(f"{column}_after")).otherwise(pl.col(column)).alias(column) for column in values],
+    )
+
+
+def _inventories(df_items: pl.DataFrame, df_participants: pl.DataFrame) -> pl.DataFrame:
+    """
+    Replays each match's item events (in event order) into its participants' inventories.
+    """
+    participant_ids = df_participants.group_by("matchId").agg("participantId")
+    participant_ids = dict(zip(participant_ids["matchId"], participant_ids["participantId"]))
+
+    list_of_participant_ids, lengths, flat_ids, flat_counts = array('i'), array('i'), array('i'), array('i')
+    rows = df_items.select("matchId", "participantId", "type", "timestamp", "itemId").iter_rows()
+    for match_id, match_rows in groupby(rows, key=itemgetter(0)):
+        match_participant_ids, match_lengths, match_ids, match_counts = replay_item_events(
+            participant_ids[match_id],
+            (row[1:] for row in match_rows),
+            # Items can be auto-assigned to players
+            assign_participant_id=participant_id_from_auto_item_event,
+        )
+        list_of_participant_ids += match_participant_ids
+        lengths += match_lengths
+        flat_ids += match_ids
+        flat_counts += match_counts
+
+    # Lists are built from flat columns: constructing them from Python lists is far slower
+    as_series = lambda values: pl.Series(np.frombuffer(values, dtype=np.int32))
+    df_inventories = pl.DataFrame({
+        "ordinal": df_items["ordinal"],
+        "participantId": as_series(list_of_participant_ids).cast(df_items.schema["participantId"]),
+    })
+    df_lists = pl.DataFrame({
+        "ordinal": df_items["ordinal"].repeat_by(as_series(lengths)).explode(),
+        "inventoryIds": as_series(flat_ids),
+        "inventoryCounts": as_series(flat_counts),
+    }).group_by("ordinal", maintain_order=True).agg("inventoryIds", "inventoryCounts")
+
+    return df_inventories.join(df_lists, on="ordinal", how="left")
+
+
+def timelines_into_events(
+    timelines: list[bytes],
+    df_participants: pl.DataFrame,
+) -> pl.DataFrame:
+    """
+    Raw `match_timeline` bodies into the `events` table.
+    `df_participants` must hold (at least) the batch's `matchId`, `participantId` and `championName`.
+    """
+    df_frames = (
+        pl.read_json(_json_array(timelines), infer_schema_length=None)
+        .select(
+            pl.col("metadata").struct.field("matchId"),
+            pl.col("info").struct.field("frames"),
+        )
+        .with_row_index("match_order")
+        .explode("frames")
+        .unnest("frames")
+        .with_columns(frame_order=pl.int_range(pl.len()).over("match_order"))
+    )
+
+    # Treat participant frames as events, in frame order
+    participant_keys = [field.name for field in df_frames.schema["participantFrames"].fields]
+    df_participant_frames = pl.concat([
+        df_frames.select(
+            "match_order", "matchId", "timestamp", "frame_order",
+            pl.col("participantFrames").struct.field(key).alias("participantFrame"),
+            key_order=pl.lit(key_order),
+        )
+        .unnest("participantFrame")
+        .with_columns(participantId=pl.lit(int(key)), type=pl.lit("PARTICIPANT_FRAME"))
+        for key_order, key in enumerate(participant_keys)
+    ], how="diagonal_relaxed").sort("match_order", "frame_order", "key_order").drop("frame_order", "key_order")
+
+    # Then the frames' events, in timestamp order
+    df_timeline_events = (
+        df_frames
+        .sort("match_order", "timestamp", "frame_order", maintain_order=True)
+        .select("match_order", "matchId", "events")
+        .explode("events")
+        .drop_nulls("events")
+        .unnest("events")
+    )
+
+    df = (
+        pl.concat([df_participant_frames, df_timeline_events], how="diagonal_relaxed")
+        .with_row_index("ordinal")
+        .pipe(_with_fields, EVENT_FIELDS)
+    )
+
+    # Sort events by timestamp, then type (consumables are purchased before they're destroyed).
+    # The sort is stable, so ties keep their order above.
+    df = (
+        df.sort(
+            "match_order",
+            "timestamp",
+            pl.when(pl.col("itemId").is_in(LIST_OF_CONSUMABLES))
+            .then(pl.col("type").replace({'ITEM_PURCHASED': 'A', 'ITEM_DESTROYED': 'Z'}))
+            .otherwise(pl.col("type")),
+            maintain_order=True,
+        )
+        .with_columns(
+            rank=pl.int_range(pl.len()).over("match_order"),
+            positionX=pl.col("position").struct.field("x"),
+            positionY=pl.col("position").struct.field("y"),
+            # 'creatorId' and 'killerId' become 'participantId'
+            participantId=pl.coalesce("creatorId", "killerId", "participantId"),
+        )
+        .drop("position", "creatorId", "killerId", "gameId", "realTimestamp")
+        .join(
+            df_participants.select(
+                "matchId",
+                pl.col("participantId").cast(pl.Int64),
+                "championName",
+            ),
+            on=["matchId", "participantId"],
+            how="left",
+        )
+    )
+
+    # Default positions for item and dragon soul events
+    is_item = pl.col("type").str.starts_with("ITEM_")
+    is_dragon_soul = pl.col("type") == "DRAGON_SOUL_GIVEN"
+    if len(df.filter(is_item | is_dragon_soul)):
+        df_ornn_frames = _closest(
+            df.filter(is_item & (pl.col("championName") == "Ornn")).select("ordinal", "timestamp", "matchId", "participantId"),
+            df.filter(pl.col("type") == "PARTICIPANT_FRAME").select(
+                "matchId", "participantId", "timestamp",
+                ornnX=pl.col("positionX"), ornnY=pl.col("positionY"),
+            ),
+            left_by=["matchId", "participantId"],
+            right_by=["matchId", "participantId"],
+        )
+        dragon_x, dragon_y = camp_coordinates('Dragon')
+        (order_x, order_y), (chaos_x, chaos_y) = spawn_coordinates(1), spawn_coordinates(6)
+        is_order = pl.col("participantId") <= 5
+        df = df.join(df_ornn_frames, on="ordinal", how="left").with_columns(
+            positionX=pl.when(is_dragon_soul).then(pl.lit(dragon_x))
+            .when(is_item & (pl.col("championName") == "Ornn")).then(pl.col("ornnX"))
+            .when(is_item).then(pl.when(is_order).then(pl.lit(order_x)).otherwise(pl.lit(chaos_x)))
+            .otherwise(pl.col("positionX")),
+            positionY=pl.when(is_dragon_soul).then(pl.lit(dragon_y))
+            .when(is_item & (pl.col("championName") == "Ornn")).then(pl.col("ornnY"))
+            .when(is_item).then(pl.when(is_order).then(pl.lit(order_y)).otherwise(pl.lit(chaos_y)))
+            .otherwise(pl.col("positionY")),
+        ).drop("ornnX", "ornnY")
+
+    df = df.with_columns(
+        # Add numberOfAssists to all _KILL events
+        numberOfAssists=pl.when(pl.col("type").str.ends_with("_KILL"))
+        .then(pl.col("assistingParticipantIds").list.len().fill_null(0)),
+    )
+
+    # Respawn of each champion kill's victim, from their closest level-up
+    is_champion_kill = pl.col("type") == "CHAMPION_KILL"
+    df_victim_levels = _closest(
+        df.filter(is_champion_kill).select("ordinal", "timestamp", "matchId", "victimId"),
+        df.filter(pl.col("type") == "LEVEL_UP").select("matchId", "participantId", "timestamp", "level"),
+        left_by=["matchId", "victimId"],
+        right_by=["matchId", "participantId"],
+    )
+    df_respawns = (
+        df.filter(is_champion_kill)
+        .select("match_order", "matchId", "rank", "ordinal", "timestamp", "victimId")
+        .join(df_victim_levels, on="ordinal", how="left")
+        .with_columns(timeSpentDead=_respawn_timer(pl.col("level").fill_null(1), pl.col("timestamp")))
+        .select(
+            "match_order", "matchId", "rank",
+            type=pl.lit("RESPAWN"),
+            timestamp=pl.col("timestamp") + pl.col("timeSpentDead"),
+            participantId=pl.col("victimId"),
+            timeSpentDead="timeSpentDead",
+            derived_order=pl.lit(0),
+        )
+    )
+
+    # Split _KILL events into KILL and ASSIST, and CHAMPION_KILL events into KILL and KILLED
+    df_assists = (
+        df.filter(pl.col("assistingParticipantIds").is_not_null())
+        .with_columns(derived_order=pl.int_ranges(1, pl.col("assistingParticipantIds").list.len() + 1))
+        .explode("assistingParticipantIds", "derived_order")
+        .drop_nulls("assistingParticipantIds")
+        .with_columns(
+            type=pl.col("type").str.replace_all("KILL", "ASSIST", literal=True),
+            participantId=pl.col("assistingParticipantIds"),
+        )
+        .drop("assistingParticipantIds")
+    )
+    df_killed = (
+        df.filter(is_champion_kill)
+        .with_columns(
+            type=pl.lit("CHAMPION_KILLED"),
+            derived_order=pl.col("assistingParticipantIds").list.len().fill_null(0) + 1,
+        )
+        .drop("assistingParticipantIds")
+    )
+    # Objective bounty start events, from their announcement
+    df_bounty_starts = (
+        df.filter(pl.col("type") == "OBJECTIVE_BOUNTY_PRESTART")
+        .select(
+            "match_order", "matchId", "rank",
+            type=pl.lit("OBJECTIVE_BOUNTY_START"),
+            timestamp=pl.col("actualStartTime"),
+            teamId="teamId",
+            derived_order=pl.lit(1_000),
+        )
+    )
+
+    # Add inventory to ITEM_ events
+    df_items = df.filter(is_item).sort("match_order", "rank").select("ordinal", "matchId", "participantId", "type", "timestamp", "itemId")
+    if len(df_items):
+        df = (
+            df.join(_inventories(df_items, df_participants), on="ordinal", how="left", suffix="_inventory")
+            .with_columns(participantId=pl.coalesce("participantId_inventory", "participantId"))
+            .drop("participantId_inventory")
+        )
+
+    # Derived events come after every timeline event, in the order they were derived
+    df_derived = (
+        pl.concat(
+            [
+                df_respawns,
+                df_assists.drop("ordinal"),
+                df_killed.drop("ordinal"),
+                df_bounty_starts,
+            ],
+            how="diagonal_relaxed",
+        )
+        .join(df.group_by("match_order").agg(timeline_events=pl.len()), on="match_order", how="left")
+        .sort("match_order", "rank", "derived_order")
+        .with_columns(rank=pl.col("timeline_events") + pl.int_range(pl.len()).over("match_order"))
+        .drop("derived_order", "timeline_events")
+    )
+
+    return standardize_events(
+        pl.concat([df.drop("ordinal", "assistingParticipantIds"), df_derived], how="diagonal_relaxed")
+        .sort("match_order", "rank")
+        .with_columns(eventId=pl.col("rank"))
+    )
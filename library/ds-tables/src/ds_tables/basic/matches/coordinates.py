@@ -0,0 +1,45 @@
+"""
+Map coordinates from CommunityDragon (`data/cdragon/coordinates/*.json`).
+
+Each table is read and parsed once per process, into an immutable mapping
+of name to (x, y), rather than on every event that needs a default position.
+"""
+from functools import lru_cache
+import json
+import os
+from pathlib import Path
+from types import MappingProxyType
+from typing import Mapping
+
+
+# Relative to the working directory, like the rest of `data/`
+COORDINATES_DIR = os.environ.get("CDRAGON_COORDINATES_DIR", "data/cdragon/coordinates")
+
+
+@lru_cache(maxsize=None)
+def load_coordinates(table: str, directory: str = COORDINATES_DIR) -> Mapping[str, tuple]:
+    """
+    Returns the `table` coordinates (e.g. 'buildings', 'camps') by name.
+    Cached: call `load_coordinates.cache_clear()` after the files change.
+    """
+    with open(Path(directory, f"{table}.json"), 'r') as f:
+        coordinates = json.load(f)
+    return MappingProxyType({
+        name: tuple(position) if isinstance(position, list) else position
+        for name, position in coordinates.items()
+    })
+
+
+def spawn_coordinates(participant_id: int, directory: str = COORDINATES_DIR) -> tuple[int, int]:
+    """
+    Spawn gate coordinates of the participant's team.
+    """
+    spawn_key = "OrderSpawnGate" if participant_id <= 5 else "ChaosSpawnGate"
+    return load_coordinates('buildings', directory).get(spawn_key, (None, None))
+
+
+def camp_coordinates(camp: str, directory: str = COORDINATES_DIR) -> tuple[int, int]:
+    """
+    Coordinates of a jungle camp or epic monster pit (e.g. 'Dragon').
+    """
+    return load_coordinates('camps', directory).get(camp, (None, None))
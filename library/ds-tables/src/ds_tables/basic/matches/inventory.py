@@ -1,3 +1,8 @@
+from array import array
+from bisect import bisect_left
+from typing import Callable, Iterable
+
+
 LIST_OF_CONSUMABLES = [
     2003, # Health Potion
     2010, # Total Biscuit of Everlasting Will
@@ -14,21 +19,70 @@ LIST_OF_CONSUMABLES = [
 ]
 
 
+# Types of the item events an ITEM_UNDO can revert
+UNDOABLE_EVENT_TYPES = ('ITEM_PURCHASED', 'ITEM_SOLD', 'ITEM_DESTROYED')
+
+
 class Inventory():
+    """
+    Items held by a participant, as item IDs sorted ascending and their counts,
+    in two arrays padded with zeros to `max_size` (and grown past it if ever needed).
+    They are kept in that form, so reading the inventory after an event is a copy.
+    """
+    __slots__ = ('item_ids', 'counts', 'size', 'undo_stack')
+
+    # max_size = 6 unique items + 1 ward + 1 consumable
+    # The consumable will be instantly consumed because the inventory is full.
+    max_size = 8
+
     def __init__(self):
-        self.dict = {}
-        self.list_of_events = []
-        # max_size = 6 unique items + 1 ward + 1 consumable
-        # The consumable will be instantly consumed because the inventory is full.
-        self.max_size = 8
+        self.item_ids = array('i', [0]) * self.max_size
+        self.counts = array('i', [0]) * self.max_size
+        # Number of distinct items held
+        self.size = 0
+        # (type, timestamp, itemId) of the events an ITEM_UNDO may revert
+        self.undo_stack = []
 
-    def increment(self, item_id: str):
-        self.dict[item_id] = self.dict.get(item_id, 0) + 1
+    def __contains__(self, item_id: int) -> bool:
+        i = bisect_left(self.item_ids, item_id, 0, self.size)
+        return i < self.size and self.item_ids[i] == item_id
 
-    def decrement(self, item_id: str):
-        self.dict[item_id] = max(0, self.dict.get(item_id, 0) - 1)
-        if self.dict[item_id] == 0:
-            self.dict.pop(item_id)
+    def increment(self, item_id: int):
+        item_ids, counts, size = self.item_ids, self.counts, self.size
+        i = bisect_left(item_ids, item_id, 0, size)
+        if i < size and item_ids[i] == item_id:
+            counts[i] += 1
+            return
+
+        if size == len(item_ids):
+            item_ids.append(0)
+            counts.append(0)
+        # Shift the greater items up a slot
+        item_ids[i + 1:size + 1] = item_ids[i:size]
+        counts[i + 1:size + 1] = counts[i:size]
+        item_ids[i] = item_id
+        counts[i] = 1
+        self.size = size + 1
+
+    def decrement(self, item_id: int):
+        item_ids, counts, size = self.item_ids, self.counts, self.size
+        i = bisect_left(item_ids, item_id, 0, size)
+        if i == size or item_ids[i] != item_id:
+            return
+        if counts[i] > 1:
+            counts[i] -= 1
+            return
+
+        # Shift the greater items down a slot
+        item_ids[i:size - 1] = item_ids[i + 1:size]
+        counts[i:size - 1] = counts[i + 1:size]
+        if len(item_ids) > self.max_size:
+            item_ids.pop()
+            counts.pop()
+        else:
+            item_ids[size - 1] = 0
+            counts[size - 1] = 0
+        self.size = size - 1
 
     def process_event(
         self,
@@ -41,47 +95,72 @@ class Inventory():
         """
         # list_of_ward_items = (3363, 3364, 3340)
         # existing_ward_items = [item for item in inventory if item in list_of_ward_items]
-        if event_type in ('ITEM_PURCHASED', 'ITEM_SOLD', 'ITEM_DESTROYED'):
-            self.list_of_events.append({
-                'type': event_type,
-                'timestamp': timestamp,
-                'itemId': item_id
-            })
-
         match event_type:
-            case 'ITEM_PURCHASED':                    
+            case 'ITEM_PURCHASED':
+                self.undo_stack.append((event_type, timestamp, item_id))
                 self.increment(item_id)
-            case 'ITEM_SOLD':
-                self.decrement(item_id)
-            case 'ITEM_DESTROYED':
+            case 'ITEM_SOLD' | 'ITEM_DESTROYED':
+                self.undo_stack.append((event_type, timestamp, item_id))
                 self.decrement(item_id)
             case 'ITEM_UNDO':
-                last_event = self.list_of_events.pop()
+                last_type, last_timestamp, last_item_id = self.undo_stack.pop()
 
                 # Undo item purchase
-                if last_event['type'] == 'ITEM_PURCHASED':
-                    self.decrement(last_event['itemId'])
-                    
+                if last_type == 'ITEM_PURCHASED':
+                    self.decrement(last_item_id)
+
                     # Find all simultaneous ITEM_DETROYED events
                     # and revert them.
-                    for event in reversed(self.list_of_events):
-                        if (
-                            event['timestamp'] == last_event['timestamp']
-                            and event['type'] == 'ITEM_DESTROYED'
-                        ):
-                            self.increment(event['itemId'])
-                            self.list_of_events.pop()
-                        else:
-                            break
+                    undo_stack = self.undo_stack
+                    while (
+                        undo_stack
+                        and undo_stack[-1][1] == last_timestamp
+                        and undo_stack[-1][0] == 'ITEM_DESTROYED'
+                    ):
+                        self.increment(undo_stack.pop()[2])
                 # Undo item sell
-                elif last_event['type'] == 'ITEM_SOLD':
-                    self.increment(last_event['itemId'])
-        return self.dict
+                elif last_type == 'ITEM_SOLD':
+                    self.increment(last_item_id)
+
+    def get_items_and_counts(self) -> tuple[list[int], list[int]]:
+        # The arrays are already sorted and padded to the max inventory size
+        return self.item_ids.tolist(), self.counts.tolist()
+
+
+def replay_item_events(
+    participant_ids: Iterable[int],
+    item_events: Iterable[tuple[int, str, int, int]],
+    assign_participant_id: Callable[[dict[int, Inventory], dict], int] | None = None,
+) -> tuple[array, array, array, array]:
+    """
+    Replays a match's item events, in order, into new inventories of its participants.
+
+    `item_events` are (participantId, type, timestamp, itemId) tuples. Events of
+    participant 0 are first given `assign_participant_id(inventories, event)`, if any.
+    Returns, as arrays, the participant ID of each event, the length of the
+    inventory after it (`max_size` unless overflowing), and those inventories'
+    item IDs and counts, concatenated.
+    """
+    inventories = {participant_id: Inventory() for participant_id in participant_ids}
+    event_participant_ids, lengths = array('i'), array('i')
+    flat_item_ids, flat_counts = array('i'), array('i')
+
+    for participant_id, event_type, timestamp, item_id in item_events:
+        # Items can be auto-assigned to players
+        if participant_id == 0 and assign_participant_id is not None:
+            participant_id = assign_participant_id(inventories, {
+                'participantId': participant_id,
+                'type': event_type,
+                'timestamp': timestamp,
+                'itemId': item_id,
+            })
+
+        inventory = inventories[participant_id]
+        inventory.process_event(event_type, timestamp, item_id)
 
-    def get_items_and_counts(self):
-        list_of_item_ids_sorted = sorted(self.dict)
-        list_of_counts_sorted = [self.dict[item_id] for item_id in list_of_item_ids_sorted]
+        event_participant_ids.append(participant_id)
+        lengths.append(len(inventory.item_ids))
+        flat_item_ids += inventory.item_ids
+        flat_counts += inventory.counts
 
-        # Lists are padded to the max inventory size
-        pad_list = lambda l: l + [0] * (self.max_size - len(l))
-        return pad_list(list_of_item_ids_sorted), pad_list(list_of_counts_sorted)
+    return event_participant_ids, lengths, flat_item_ids, flat_counts
@@ -1,61 +1,66 @@
+from .coordinates import camp_coordinates, spawn_coordinates
 from .inventory import LIST_OF_CONSUMABLES, Inventory
+from bisect import bisect_left
+from collections import defaultdict
 from dorans import death
-import json
 
 
-def find_closest_event(
-    event: dict,
-    list_of_events: list[dict],
-    **event_filters: dict,
-) -> list[dict] | None:
+class EventIndex:
     """
-    Find the closest event in the list of events.
-    Provided a dictionary of event filters,
-    it will filter the events based on the filters.
+    Events of a single type, grouped by participant and sorted by timestamp.
+
+    Built once per match, so looking up a participant's closest event is a bisect
+    instead of a filter and a sort over every event of the match.
     """
-    filtered_events = [
-        e for e in list_of_events
-        if all(e[key] == value for key, value in event_filters.items())
-    ]
 
-    # Sort events by timestamp difference
-    filtered_events.sort(key=lambda x: abs(x['timestamp'] - event['timestamp']))
+    def __init__(self, list_of_events: list[dict], event_type: str):
+        # Events must already be sorted by timestamp
+        self.events = defaultdict(list)
+        for event in list_of_events:
+            if event['type'] == event_type:
+                self.events[event.get('participantId')].append(event)
+        self.timestamps = {
+            participant_id: [event['timestamp'] for event in events]
+            for participant_id, events in self.events.items()
+        }
+
+    def closest(self, participant_id: int, timestamp: int) -> dict | None:
+        """
+        The participant's event closest in time to `timestamp`.
+        On ties, the earliest one.
+        """
+        events = self.events.get(participant_id)
+        if not events:
+            return None
+        timestamps = self.timestamps[participant_id]
 
-    return filtered_events[0] if filtered_events else None
+        i = bisect_left(timestamps, timestamp)
+        if i == len(events):
+            return events[bisect_left(timestamps, timestamps[-1])]
+        if i == 0 or timestamp - timestamps[i - 1] > timestamps[i] - timestamp:
+            return events[i]
+        return events[bisect_left(timestamps, timestamps[i - 1])]
 
 
 def default_position_from_event_type(
     event: dict,
-    champion_name: str,
-    list_of_events: list[dict],
+    champion_name: str | None,
+    participant_frames: EventIndex,
 ) -> tuple[int, int]:
     """
     Default position for events that don't have a position.
     """
     if event["type"] == "DRAGON_SOUL_GIVEN":
-        with open('data/cdragon/coordinates/camps.json', 'r') as f:
-            camp_coordinates = json.load(f)
-        return camp_coordinates.get('Dragon', (None, None))
+        return camp_coordinates('Dragon')
     
     # If the event is an item event and the champion is Ornn,
     # use Ornn's nearest known coordinates
     if event["type"].startswith("ITEM_") and champion_name == "Ornn":
-        closest_ornn_frame = find_closest_event(
-            event,
-            list_of_events,
-            type='PARTICIPANT_FRAME',
-            participant_id=event.get('participantId')
-        )
+        closest_ornn_frame = participant_frames.closest(event.get('participantId'), event['timestamp'])
         return closest_ornn_frame['positionX'], closest_ornn_frame['positionY']
 
     # Else, use spawn coordinates for item events
-    spawn_key = (
-        "OrderSpawnGate" if event['participantId'] <= 5 else "ChaosSpawnGate"
-    )
-    with open('data/cdragon/coordinates/buildings.json', 'r') as f:
-        building_coordinates = json.load(f)
-
-    return building_coordinates.get(spawn_key, (None, None))
+    return spawn_coordinates(event['participantId'])
 
 
 def match_into_match_and_participants(
@@ -156,14 +161,9 @@ def match_into_match_and_participants(
 
 def respawn_event_from_kill_event(
     event: dict,
-    list_of_events: list[dict],
+    level_ups: EventIndex,
 ) -> dict:
-    victim_level = find_closest_event(
-        event,
-        list_of_events,
-        type='LEVEL_UP',
-        participantId=event['victimId']
-    ) or {'level': 1}
+    victim_level = level_ups.closest(event['victimId'], event['timestamp']) or {'level': 1}
 
     death_timer = death.timer(
         level=victim_level['level'],
@@ -216,9 +216,9 @@ def participant_id_from_auto_item_event(
     ):
         match event['itemId']:
             case 3865:  # World Atlas
-                if event['itemId'] not in inventories[5].dict:
+                if event['itemId'] not in inventories[5]:
                     return 5
-                elif event['itemId'] not in inventories[10].dict:
+                elif event['itemId'] not in inventories[10]:
                     return 10
     return 0
 
@@ -271,6 +271,17 @@ def timeline_into_events(
     )
     # list_of_events_sorted = list_of_events #sorted(list_of_events, key=lambda d: d['timestamp'])
 
+    for event in list_of_events_sorted:
+        if 'position' in event:
+            event['positionX'] = event['position']['x']
+            event['positionY'] = event['position']['y']
+            event.pop('position', None)
+
+    # Lookups built once per match, rather than scanning every event for each event
+    participant_frames = EventIndex(list_of_events_sorted, 'PARTICIPANT_FRAME')
+    level_ups = EventIndex(list_of_events_sorted, 'LEVEL_UP')
+    champion_names = {participant['participantId']: participant['championName'] for participant in participants}
+
     # Preprocess events and collect all unique keys
     all_columns = set(["eventId"])
     # Keep track of inventories
@@ -279,11 +290,6 @@ def timeline_into_events(
     for event in list_of_events_sorted:
         event['matchId'] = timeline['metadata']['matchId']
         event.pop('gameId', None)
-        
-        if 'position' in event:
-            event['positionX'] = event['position']['x']
-            event['positionY'] = event['position']['y']
-            event.pop('position', None)
 
         # Rename 'creatorId' and 'killerId' to 'participantId'
         event['participantId'] = (
@@ -296,17 +302,13 @@ def timeline_into_events(
         if event['type'].startswith('ITEM_') or event['type'] == 'DRAGON_SOUL_GIVEN':
             event['positionX'], event['positionY'] = default_position_from_event_type(
                 event,
-                champion_name=[
-                    participant['championName']
-                    for participant in participants
-                    if participant['participantId'] == event.get('participantId')
-                ] if 'participantId' in event else None,
-                list_of_events=list_of_events_sorted
+                champion_name=champion_names.get(event['participantId']),
+                participant_frames=participant_frames,
             )
         # Add respawn event
         if event['type'] == 'CHAMPION_KILL':
             list_of_events_sorted.append(
-                respawn_event_from_kill_event(event, list_of_events_sorted)
+                respawn_event_from_kill_event(event, level_ups)
             )
         # Add numberOfAssists to all _KILL events
         if event["type"].endswith("_KILL"):
@@ -1,35 +1,94 @@
-from .matches import schema, transform
-from ds_common import work_generator
+from .batch_writer import TARGET_FILE_BYTES, BatchWriter
+from .matches import columnar, schema, transform
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+from ds_common import (
+    MATCH_INFO_TABLE_NAME,
+    MATCH_TIMELINE_TABLE_NAME,
+    find_raw_matches,
+    match_index_partition,
+    print,
+    raw_match_id,
+    raw_match_partition,
+    read_raw_match,
+)
+import multiprocessing
+import os
+import polars as pl
+from tqdm import tqdm
 import packages.storage.src as src
 
 
+# Matches per task sent to a worker process: large enough to amortize pickling
+# the frames back, small enough to keep every worker busy until the end
+CHUNK_SIZE = 25
+RANKED_SOLO_QUEUE = 420
+
+# Root of the raw matches in the worker process, set once by `_init_worker`
+_root: str | None = None
+
+
+def eligible_match_ids(root: str, region: str) -> list[str] | None:
+    """
+    Returns the ids of the region's raw matches that are ranked and not remade, per the match index,
+    or None if the region has no index. Matches indexed without metadata are kept,
+    and checked by `process_match` as before.
+
+    The index is read at `ds_common.match_index_partition(root, region)`, the layout
+    ingestion writes it with, so `root` must hold a mirror of the bucket's environment
+    prefix (e.g. synced from `s3://<bucket>/<environment>/riot_api/raw/match_ids_index`).
+    Matches ingested since the mirror was synced aren't selected.
+    """
+    index_dir = match_index_partition(root, region)
+    segments = list(index_dir.glob("*.parquet"))
+    if not segments:
+        return None
+    synced_at = datetime.fromtimestamp(max(segment.stat().st_mtime for segment in segments))
+    print(f"[{region}] Reading {len(segments)} match index segments from {index_dir} (newest from {synced_at:%Y-%m-%d %H:%M}).")
+
+    return (
+        pl.scan_parquet(
+            index_dir / "*.parquet",
+            # Segments written by the bootstrap only have match ids
+            schema={"match_id": pl.String, "queue_id": pl.Int32, "early_surrender": pl.Boolean},
+            missing_columns="insert",
+            extra_columns="ignore",
+        )
+        .filter(
+            pl.col("queue_id").is_null()
+            | ((pl.col("queue_id") == RANKED_SOLO_QUEUE) & ~pl.col("early_surrender").fill_null(False))
+        )
+        .select(pl.col("match_id").unique().sort())
+        .collect()["match_id"]
+        .to_list()
+    )
+
 
 def process_match(
     match_id: str,
     region: str,
-    overwrite: bool,
-    storage_raw: src.Storage,
-    storage_basic: src.StoragePartition
-) -> tuple[dict, list[dict], list[dict]]:
+    root: str,
+) -> tuple[list[dict], list[dict], list[dict]]:
+    """
+    Reads a match's raw info and timeline where ingestion stores them
+    (see `ds_common.raw_matches`; `root` mirrors the bucket like for the index),
+    and transforms them into its records.
+    """
     # print(f"[{region}] Processing match {match_id}...")
 
-    if not overwrite and storage_basic.has_records_in_all_tables(matchId=match_id):
-        print(f"[{region}] Match {match_id} already exists.")
-        return
-    
     try:
-        info = storage_raw.read_files('match_info', record=match_id, region=region)
+        info = read_raw_match(root, MATCH_INFO_TABLE_NAME, region, match_id)
     except FileNotFoundError:
         print(f"[{region}] Match {match_id} not found in raw storage.")
         return
-    
+
     if info["info"]["queueId"] != 420:
         print(f"[{region}] Match {match_id} is not ranked.")
         return
     if info["info"]["participants"][0]["gameEndedInEarlySurrender"] == True:
         print(f"[{region}] Match {match_id} ended in remake.")
         return
-    timeline = storage_raw.read_files('match_timeline', record=match_id, region=region)
+    timeline = read_raw_match(root, MATCH_TIMELINE_TABLE_NAME, region, match_id)
 
     match, participants = transform.match_into_match_and_participants(
         match_id=match_id,
@@ -41,6 +100,37 @@ def process_match(
     return [match], participants, events
 
 
+def _init_worker(root: str):
+    global _root
+    _root = root
+
+
+def process_matches(
+    match_ids: list[str],
+    region: str,
+) -> tuple[list[str], pl.DataFrame, pl.DataFrame, pl.DataFrame]:
+    """
+    Processes a chunk of matches in a worker process.
+    Returns the IDs of the matches kept, and their tables as frames,
+    which go back to the parent as Arrow buffers rather than pickled records.
+    Each match's records are converted as soon as it is processed,
+    so no more than one match is held as dicts.
+    """
+    kept, matches, participants, events = [], [], [], []
+    for match_id in match_ids:
+        data = process_match(match_id, region, _root)
+        if data is None:
+            continue
+        kept.append(match_id)
+        matches.append(columnar.standardize_matches(data[0]))
+        participants.append(columnar.standardize_participants(data[1]))
+        events.append(columnar.standardize_events(data[2]))
+
+    if not kept:
+        return kept, columnar.standardize_matches([]), columnar.standardize_participants([]), columnar.standardize_events([])
+    return kept, pl.concat(matches), pl.concat(participants), pl.concat(events)
+
+
 def main(
     region: str,
     root: str,
@@ -48,13 +138,9 @@ def main(
     count: int = 1000,
     flush: bool = True,
     overwrite: bool = False,
+    workers: int = os.cpu_count() or 1,
+    target_file_bytes: int = TARGET_FILE_BYTES,
 ):
-    storage_raw = src.Storage(
-        root,
-        'raw',
-        'riot_api',
-        ['player_match_ids', 'match_info', 'match_timeline']
-    )
     storage_basic = src.StoragePartition(
         root,
         'basic',
@@ -64,44 +150,84 @@ def main(
         partition_col="region",
         partition_val=region,
     )
-    
-    list_of_match_ids = [
-        filename.name.split('/')[-1].split('.json')[0]
-        for filename in storage_raw.find_files(
-            'match_info',
-            record='*',
-            region=region,
-            count=int(count * 1.5)
-    )]
-
-    matches, participants, events = [], [], []
-    for i, data in enumerate(work_generator(
-        list_of_match_ids,
-        process_match,
+
+    # Without an index, every candidate's info is opened to check it
+    list_of_match_ids = eligible_match_ids(root, region)
+    if list_of_match_ids is None:
+        print(
+            f"[{region}] No match index at {match_index_partition(root, region)}; "
+            f"listing the raw matches at {raw_match_partition(root, MATCH_INFO_TABLE_NAME, region)}, "
+            "and opening each one to check it."
+        )
+        list_of_match_ids = [
+            raw_match_id(path)
+            for path in find_raw_matches(root, MATCH_INFO_TABLE_NAME, region)[:int(count * 1.5)]
+        ]
+    else:
+        print(f"[{region}] Found {len(list_of_match_ids)} eligible matches in the match index.")
+
+    def chunks():
+        chunk = []
+        for match_id in list_of_match_ids:
+            if not overwrite and storage_basic.has_records_in_all_tables(matchId=match_id):
+                print(f"[{region}] Match {match_id} already exists.")
+                continue
+            chunk.append(match_id)
+            if len(chunk) == CHUNK_SIZE:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    processed = 0
+    writer = BatchWriter(
+        storage_basic,
+        ['matches', 'participants', 'events'],
         descriptor=region,
-        max_count=count,
-        # kwargs
-        overwrite=overwrite,
-        storage_raw=storage_raw,
-        storage_basic=storage_basic
-    )):
-        matches.extend(data[0])
-        participants.extend(data[1])
-        events.extend(data[2])
-
-        if i % 500 == 0:
-            print(f"[{region}] Storing batch...")
-            storage_basic.store_batch('matches', matches)
-            storage_basic.store_batch('participants', participants)
-            storage_basic.store_batch('events', events)
-            matches.clear()
-            participants.clear()
-            events.clear()
-
-    print(f"[{region}] Storing batch...")
-    storage_basic.store_batch('matches', matches)
-    storage_basic.store_batch('participants', participants)
-    storage_basic.store_batch('events', events)
+        target_file_bytes=target_file_bytes,
+    )
+    progress = tqdm(total=count, desc=f"[{region}]".ljust(12))
+    # Spawned rather than forked: the parent runs one thread per region
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(root,),
+    ) as executor:
+        pending_chunks = chunks()
+        running = set()
+        while True:
+            # Keep two chunks per worker in flight, until enough matches are underway
+            while processed + CHUNK_SIZE * len(running) < count and len(running) < 2 * workers:
+                chunk = next(pending_chunks, None)
+                if chunk is None:
+                    break
+                running.add(executor.submit(process_matches, chunk, region))
+            if not running:
+                break
+
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                kept, df_matches, df_participants, df_events = future.result()
+                if processed + len(kept) > count:
+                    # Trim the last chunk to the requested count
+                    kept = kept[:count - processed]
+                    df_matches, df_participants, df_events = (
+                        df.filter(pl.col("matchId").is_in(kept))
+                        for df in (df_matches, df_participants, df_events)
+                    )
+                if not kept:
+                    continue
+
+                processed += len(kept)
+                progress.update(len(kept))
+                writer.append(
+                    {"matches": df_matches, "participants": df_participants, "events": df_events},
+                    matches=len(kept),
+                )
+    progress.close()
+
+    writer.close()
 
     if flush:
         storage_basic.flush()
@@ -2,6 +2,7 @@ import argparse
 from ds_common import print, multithreaded
 from packages.constants.src import REGIONS_AND_PLATFORMS
 import importlib
+import os
 
 
 def parse_args():
@@ -26,10 +27,42 @@ def parse_args():
         for dataset in datasets:
             table_parser = dataset_subparsers.add_parser(dataset, help=f"Table: {schema}.{dataset}.")
             add_common_args(table_parser)
+            table_parser.add_argument(
+                "--workers",
+                help="Worker processes, shared by the regions (default: one per core).",
+                type=int,
+                default=os.cpu_count() or 1,
+            )
+            if schema == "basic":
+                table_parser.add_argument(
+                    "--target-file-mb",
+                    help="Target size of each stored parquet file, per table.",
+                    type=int,
+                    default=128,
+                )
+            if schema == "ultimate":
+                table_parser.add_argument(
+                    "--memory-gb",
+                    help="Memory for the shards in flight, shared by the regions (default: half of the physical memory).",
+                    type=float,
+                    default=None,
+                )
 
     return parser.parse_args()
 
 
+def worker_kwargs(args, worker_module) -> dict:
+    # The regions run concurrently, so each gets its share of the worker processes and memory
+    regions = len(REGIONS_AND_PLATFORMS)
+    kwargs = {"workers": max(1, args.workers // regions)}
+    if args.schema == "basic":
+        kwargs["target_file_bytes"] = args.target_file_mb * 2**20
+    if args.schema == "ultimate":
+        memory_budget = worker_module.MEMORY_BUDGET if args.memory_gb is None else int(args.memory_gb * 2**30)
+        kwargs["memory_budget"] = memory_budget // regions
+    return kwargs
+
+
 def main():
     args = parse_args()
     print(f"Schema: {args.schema}")
@@ -54,4 +87,5 @@ def main():
             args.flush,
             args.overwrite,
         ),
+        kwargs=worker_kwargs(args, worker_module),
     )
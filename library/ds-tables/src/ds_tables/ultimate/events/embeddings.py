@@ -0,0 +1,110 @@
+"""
+Embeddings of the event types, for `transform.enrich_events_with_event_type_embeddings`.
+
+Each event type is described by keywords, which a sentence embedding model
+encodes and a PCA then reduces. Computing them loads the model, so the table
+is computed once and persisted as a small parquet file, named after a hash of
+everything it depends on (model, keywords, PCA), then read from there by
+every shard. Changing any of those makes a new file, and the old one is left
+as is.
+"""
+from functools import lru_cache
+import hashlib
+import json
+import os
+from pathlib import Path
+import polars as pl
+
+
+# Relative to the working directory, like the rest of `data/`
+EMBEDDINGS_DIR = os.environ.get("EVENT_TYPE_EMBEDDINGS_DIR", "data/embeddings")
+
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"  # 384-dim embeddings
+# Reduce to the number of components that explain at least 90% of the variance
+PCA_COMPONENTS = 0.9
+
+EVENT_TYPE_KEYWORDS = {
+    "PARTICIPANT_FRAME": "CHAMPION STATUS",
+    "ITEM_DESTROYED": "CHAMPION ITEM DESTROYED",
+    "ITEM_PURCHASED": "CHAMPION ITEM PURCHASED",
+    "ITEM_SOLD": "CHAMPION ITEM SOLD",
+    "ITEM_UNDO": "CHAMPION ITEM UNDO",
+    "LEVEL_UP": "CHAMPION LEVEL UP",
+    "CHAMPION_TRANSFORM": "CHAMPION LEVEL TRANSFORM",
+    "SKILL_LEVEL_UP": "CHAMPION LEVEL SKILL",
+    "BUILDING_ASSIST": "TAKEDOWN BUILDING ASSIST",
+    "BUILDING_KILL": "TAKEDOWN BUILDING KILL",
+    "TURRET_PLATE_DESTROYED": "TAKEDOWN BUILDING PLATE KILL",
+    "CHAMPION_ASSIST": "TAKEDOWN CHAMPION ASSIST",
+    "CHAMPION_KILL": "TAKEDOWN CHAMPION KILL",
+    "RESPAWN": "TAKEDOWN CHAMPION RESPAWN",
+    "ELITE_MONSTER_ASSIST": "TAKEDOWN MONSTER ASSIST",
+    "ELITE_MONSTER_KILL": "TAKEDOWN MONSTER KILL",
+    "WARD_KILL": "TAKEDOWN WARD KILL",
+    "WARD_PLACED": "TAKEDOWN WARD SPAWN",
+    "DRAGON_SOUL_GIVEN": "SYSTEM MONSTER DRAGON SOUL",
+    "FEAT_UPDATE": "SYSTEM TAKEDOWN FEAT",
+    "OBJECTIVE_BOUNTY_PRESTART": "SYSTEM BOUNTY PRESTART",
+    "OBJECTIVE_BOUNTY_START": "SYSTEM BOUNTY START",
+    "OBJECTIVE_BOUNTY_FINISH": "SYSTEM BOUNTY END",
+    "GAME_END": "SYSTEM GAME END",
+    "PAUSE_END": "SYSTEM GAME START",
+}
+
+
+def embeddings_version(
+    model: str = EMBEDDING_MODEL,
+    keywords: dict[str, str] = EVENT_TYPE_KEYWORDS,
+    pca_components: float = PCA_COMPONENTS,
+) -> str:
+    """
+    Short hash of everything the embeddings table depends on.
+    """
+    key = json.dumps({"model": model, "keywords": keywords, "pca_components": pca_components}, sort_keys=True)
+    return hashlib.sha256(key.encode()).hexdigest()[:12]
+
+
+def compute_event_type_embeddings(
+    model: str = EMBEDDING_MODEL,
+    keywords: dict[str, str] = EVENT_TYPE_KEYWORDS,
+    pca_components: float = PCA_COMPONENTS,
+) -> pl.DataFrame:
+    """
+    Encodes the keywords of each event type, and reduces the embeddings with a PCA.
+    """
+    # Only imported when the table has to be computed: loading them takes seconds
+    from sentence_transformers import SentenceTransformer
+    from sklearn.decomposition import PCA as sk_PCA
+
+    pca = sk_PCA(n_components=pca_components)
+    array_of_reduced_embeddings = pca.fit_transform(
+        SentenceTransformer(model).encode(list(keywords.values()))
+    )
+    return pl.DataFrame(
+        {
+            "type": list(keywords),
+            # Converted to lists of Python floats, as Float64
+            "type_embeddings": [embedding.tolist() for embedding in array_of_reduced_embeddings],
+        },
+        schema={"type": pl.String, "type_embeddings": pl.List(pl.Float64)},
+    )
+
+
+@lru_cache(maxsize=None)
+def load_event_type_embeddings(directory: str = EMBEDDINGS_DIR) -> pl.DataFrame:
+    """
+    Returns the embedding of each event type (`type`, `type_embeddings`),
+    computing and persisting it under `directory` the first time.
+    Cached: call `load_event_type_embeddings.cache_clear()` after the files change.
+    """
+    path = Path(directory, f"event_types-{EMBEDDING_MODEL}-{embeddings_version()}.parquet")
+    if path.exists():
+        return pl.read_parquet(path)
+
+    df = compute_event_type_embeddings()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Written aside then renamed, so concurrent workers never read a partial file
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    df.write_parquet(tmp_path)
+    os.replace(tmp_path, path)
+    return df
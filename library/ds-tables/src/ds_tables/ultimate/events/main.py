@@ -1,86 +1,57 @@
 from . import transform
+from .. import load
 import polars as pl
 import packages.storage.src as src
 
 
+# The pre-game data of each participant
+PARTICIPANT_COLUMNS = [
+    "matchId",
+    "participantId",
+    "championId",
+    "summoner1Id",
+    "summoner2Id",
+    "rune_primary_0",
+    "rune_primary_1",
+    "rune_primary_2",
+    "rune_primary_3",
+    "rune_secondary_0",
+    "rune_secondary_1",
+    "rune_shard_offense",
+    "rune_shard_flex",
+    "rune_shard_defense",
+]
+# The general match information joined to each event
+MATCH_COLUMNS = ["matchId", "gameStartTimestamp", "patch", "platformId"]
+
+
 def main(
     list_of_match_ids: list[str],
     region: str,
     storage_basic: src.StoragePartition,
     storage_ultimate: src.StoragePartition
-):
+) -> dict[str, pl.DataFrame]:
     # Load dataframes
     print(f"[{region}] Loading dataframes from ds_storage...")
-    df_events = storage_basic.load_to_polars(
-        "events",
-        matchId=list_of_match_ids
-    )
-
-    df_participants = storage_basic.load_to_polars(
-        "participants",
-        matchId=list_of_match_ids
-    ).select([
-        "matchId",
-        "participantId",
-        "championId",
-        "summoner1Id",
-        "summoner2Id",
-        "rune_primary_0",
-        "rune_primary_1",
-        "rune_primary_2",
-        "rune_primary_3",
-        "rune_secondary_0",
-        "rune_secondary_1",
-        "rune_shard_offense",
-        "rune_shard_flex",
-        "rune_shard_defense",
-    ])
-
-    # To each participant frame, add the pre-game data
-    df_events_with_pregame_data = transform.enrich_events_with_pregame_data(
-        df_events, df_participants
+    dict_of_dfs = load.load_shard(
+        storage_basic,
+        list_of_match_ids,
+        {"events": None, "participants": PARTICIPANT_COLUMNS, "matches": MATCH_COLUMNS},
     )
-
-    # Add inventory context to each event
-    df_events_with_inventory = transform.enrich_events_with_inventory_data(
-        df_events_with_pregame_data,
-        df_item_events=df_events.filter(
-            pl.col("type").is_in([
-                "ITEM_PURCHASED",
-                "ITEM_SOLD",
-                "ITEM_DESTROYED",
-                "ITEM_UNDO",
-            ])
-        )
+    df_events = dict_of_dfs["events"]
+    df_participants = dict_of_dfs["participants"].select(PARTICIPANT_COLUMNS)
+    df_matches = dict_of_dfs["matches"]
+
+    # Add the pre-game data, inventories, levels and general match information
+    # to each event, in a single lazy plan
+    lf_events_with_matches = transform.enrich_events(
+        df_events, df_participants, df_matches
     )
 
-    # Update participant levels to reflect the last level-up event
-    df_events_with_levels = transform.enrich_events_with_levels(
-        df_events_with_inventory,
-        df_level_up_events=df_events.filter(pl.col("type") == "LEVEL_UP")
-    )
-
-    # Add general match information
-    df_matches = storage_basic.load_to_polars(
-        "matches",
-        matchId=list_of_match_ids
-    ).select([
-        "gameStartTimestamp",
-        "patch",
-        "matchId",
-        "platformId"
-    ])
-    df_events_with_matches = df_events_with_levels.join(
-        df_matches,
-        on=["matchId"],
-        how="inner"
-    )
-
-    # Create event type embeddings,
+    # Add event type embeddings (computed once, then read from the local cache),
     # that map event types to a semantically-meaningful embedding space.
     df_events_with_event_type_embeddings = transform.enrich_events_with_event_type_embeddings(
-        df_events_with_matches
-    )
+        lf_events_with_matches
+    ).collect()
 
-    print(f"[{region}] Storing batch...")
-    storage_ultimate.store_batch("events", df_events_with_event_type_embeddings)
+    return {"events": df_events_with_event_type_embeddings}
@@ -1,24 +1,30 @@
 import polars as pl
 import polars.selectors as cs
-from sentence_transformers import SentenceTransformer
-from sklearn.decomposition import PCA as sk_PCA
+from .embeddings import load_event_type_embeddings
+
+
+# Participants of a match, as pivoted into columns
+PARTICIPANT_IDS = list(range(1, 11))
+ITEM_EVENT_TYPES = ["ITEM_PURCHASED", "ITEM_SOLD", "ITEM_DESTROYED", "ITEM_UNDO"]
 
 
 def enrich_events_with_pregame_data(
-    df_events: pl.DataFrame,
-    df_participants: pl.DataFrame,
-) -> pl.DataFrame:
+    df_events: pl.DataFrame | pl.LazyFrame,
+    df_participants: pl.DataFrame | pl.LazyFrame,
+) -> pl.LazyFrame:
     """
     Create a DataFrame with participant frames enriched with pre-game data.
     This function filters the events DataFrame for participant frames and
     joins it with the participants DataFrame to add pre-game data such as
     championId, etc.
+    Participant columns come in participantId order (1 to 10).
     Args:
-        df_events (pl.DataFrame): DataFrame containing events.
-        df_participants (pl.DataFrame): DataFrame containing participant information.
+        df_events (pl.DataFrame | pl.LazyFrame): DataFrame containing events.
+        df_participants (pl.DataFrame | pl.LazyFrame): DataFrame containing participant information.
     Returns:
-        pl.DataFrame: DataFrame containing participant frames with pre-game data.
+        pl.LazyFrame: Events (other than participant frames) with the preceding participant frames and pre-game data.
     """
+    lf_events = df_events.lazy()
     # To each participant frame, add the pre-game data
     participant_exclusive_columns = [
         "currentGold", "totalGold",
@@ -27,7 +33,7 @@ def enrich_events_with_pregame_data(
         "minionsKilled", "jungleMinionsKilled",
         "championStats",
     ]
-    df_participant_frames_with_pregame_data = df_events.filter(
+    lf_participant_frames_with_pregame_data = lf_events.filter(
         pl.col("type") == "PARTICIPANT_FRAME"
     ).select([
         "matchId", "participantId",
@@ -35,95 +41,97 @@ def enrich_events_with_pregame_data(
         "positionX", "positionY",
         *participant_exclusive_columns,
     ]).join(
-        df_participants,
+        df_participants.lazy(),
         on=["matchId", "participantId"],
         how="left",
     )
     # To each event, add the preceding participant frame, pivoted by participantId
-    df_participant_frames_pivoted = df_participant_frames_with_pregame_data.pivot(
-        on=["participantId"],
+    lf_participant_frames_pivoted = lf_participant_frames_with_pregame_data.pivot(
+        on="participantId",
+        on_columns=PARTICIPANT_IDS,
         index=["matchId", "timestamp"],
-    )
-    return df_events.filter(
+    ).sort("matchId", "timestamp")
+    return lf_events.filter(
         pl.col("type") != "PARTICIPANT_FRAME"
     ).drop(
         participant_exclusive_columns
     ).sort("matchId", "timestamp").join_asof(
-        df_participant_frames_pivoted,
+        lf_participant_frames_pivoted,
         on="timestamp",
         by=["matchId"],
         strategy="backward",
         allow_parallel=True,
+        # Both sides sorted just above
+        check_sortedness=False,
     )
 
 
 def enrich_events_with_inventory_data(
-    df_events: pl.DataFrame,
-    df_item_events: pl.DataFrame,
-) -> pl.DataFrame:
+    df_events: pl.DataFrame | pl.LazyFrame,
+    df_item_events: pl.DataFrame | pl.LazyFrame,
+) -> pl.LazyFrame:
     """
     Create a DataFrame with events enriched with inventory data.
-    This function filters the events DataFrame for item events and
-    joins it with the participants DataFrame to add inventory data.
+    This function pivots the item events' inventories by participant,
+    and adds to each event the last ones at or before it.
     Args:
-        df_events (pl.DataFrame): DataFrame containing events.
+        df_events (pl.DataFrame | pl.LazyFrame): DataFrame containing events.
+        df_item_events (pl.DataFrame | pl.LazyFrame): DataFrame containing item events.
     Returns:
-        pl.DataFrame: DataFrame containing events with inventory data.
+        pl.LazyFrame: Events with inventory data, sorted by ["matchId", "eventId"].
     """
     # To each item event, add the inventory
-    # Add inventory context to each event
-    df_inventories = df_item_events.select(
-        "matchId",
-        "participantId",
-        "eventId",
-        "inventoryIds",
-        "inventoryCounts"
-    )
-    
-    df_inventories_pivoted = (
-        df_inventories.pivot(
-            on=["participantId"],
+    lf_inventories_pivoted = (
+        df_item_events.lazy()
+        .select("matchId", "participantId", "eventId", "inventoryIds", "inventoryCounts")
+        .pivot(
+            on="participantId",
+            on_columns=PARTICIPANT_IDS,
             index=["matchId", "eventId"],
             aggregate_function="last"  # Multiple item events can occur at the same timestamp
         )
         # Sort to ensure forward fill works correctly
         .sort(["matchId", "eventId"])
-        # Fill forward to propagate the last known level
+        # Fill forward to propagate the last known inventory
         .fill_null(strategy="forward")
     )
 
     # Join-asof inventory info into all events
-    return df_events.sort(
+    return df_events.lazy().sort(
         ["matchId", "eventId"]
     ).join_asof(
-        df_inventories_pivoted,
+        lf_inventories_pivoted,
         on="eventId",
         by=["matchId"],
         strategy="backward",  # get the last inventory at or before the event
         allow_parallel=True,
+        # Both sides sorted just above
+        check_sortedness=False,
     )
 
 
 def enrich_events_with_levels(
-    df_events: pl.DataFrame,
-    df_level_up_events: pl.DataFrame,
-) -> pl.DataFrame:
+    df_events: pl.DataFrame | pl.LazyFrame,
+    df_level_up_events: pl.DataFrame | pl.LazyFrame,
+) -> pl.LazyFrame:
     """
     Create a DataFrame with events enriched with level data.
-    This function joins level_up events with the participants DataFrame to add level data.
+    This function pivots the level-up events by participant,
+    and adds to each event the last levels at or before it.
     Args:
-        df_events (pl.DataFrame): DataFrame containing events.
-        df_level_up_events (pl.DataFrame): DataFrame containing level-up events.
+        df_events (pl.DataFrame | pl.LazyFrame): DataFrame containing events, sorted by ["matchId", "eventId"]
+            (as `enrich_events_with_inventory_data` returns them).
+        df_level_up_events (pl.DataFrame | pl.LazyFrame): DataFrame containing level-up events.
     Returns:
-        pl.DataFrame: DataFrame containing events with level data.
+        pl.LazyFrame: Events with level data.
     """
     # Update participant levels to reflect the last level-up event
-    # Sort data by matchId, participantId, and eventId
-    df_level_ups = (
-        df_level_up_events
+    lf_level_ups = (
+        df_level_up_events.lazy()
         .select(["matchId", "participantId", "eventId", "level"])
         .pivot(
-            on=["participantId"],
+            on="participantId",
+            on_columns=PARTICIPANT_IDS,
             index=["matchId", "eventId"],
             aggregate_function="last"  # Multiple level-ups can occur at the same timestamp
         )
@@ -131,73 +139,77 @@ def enrich_events_with_levels(
         .sort(["matchId", "eventId"])
         # Fill forward to propagate the last known level
         .fill_null(strategy="forward")
-        .rename({str(i): f"level_{i}" for i in range(1, 11)})
+        .rename({str(i): f"level_{i}" for i in PARTICIPANT_IDS})
     )
     # Join-asof level info into all events
-    return df_events.sort(
-        ["matchId", "eventId"]
-    ).join_asof(
-        df_level_ups,
+    return df_events.lazy().join_asof(
+        lf_level_ups,
         on="eventId",
         by=["matchId"],
         strategy="backward",  # get the last level-up at or before the event
         allow_parallel=True,
+        # The events come sorted, the level-ups are sorted just above
+        check_sortedness=False,
     ).with_columns(
         cs.starts_with("level_").fill_null(1)
     )
 
-def enrich_events_with_event_type_embeddings(
-    df_events: pl.DataFrame
-):
-    map_of_event_types_to_keywords = {
-        "PARTICIPANT_FRAME": "CHAMPION STATUS",
-        "ITEM_DESTROYED": "CHAMPION ITEM DESTROYED",
-        "ITEM_PURCHASED": "CHAMPION ITEM PURCHASED",
-        "ITEM_SOLD": "CHAMPION ITEM SOLD",
-        "ITEM_UNDO": "CHAMPION ITEM UNDO",
-        "LEVEL_UP": "CHAMPION LEVEL UP",
-        "CHAMPION_TRANSFORM": "CHAMPION LEVEL TRANSFORM",
-        "SKILL_LEVEL_UP": "CHAMPION LEVEL SKILL",
-        "BUILDING_ASSIST": "TAKEDOWN BUILDING ASSIST",
-        "BUILDING_KILL": "TAKEDOWN BUILDING KILL",
-        "TURRET_PLATE_DESTROYED": "TAKEDOWN BUILDING PLATE KILL",
-        "CHAMPION_ASSIST": "TAKEDOWN CHAMPION ASSIST",
-        "CHAMPION_KILL": "TAKEDOWN CHAMPION KILL",
-        "RESPAWN": "TAKEDOWN CHAMPION RESPAWN",
-        "ELITE_MONSTER_ASSIST": "TAKEDOWN MONSTER ASSIST",
-        "ELITE_MONSTER_KILL": "TAKEDOWN MONSTER KILL",
-        "WARD_KILL": "TAKEDOWN WARD KILL",
-        "WARD_PLACED": "TAKEDOWN WARD SPAWN",
-        "DRAGON_SOUL_GIVEN": "SYSTEM MONSTER DRAGON SOUL",
-        "FEAT_UPDATE": "SYSTEM TAKEDOWN FEAT",
-        "OBJECTIVE_BOUNTY_PRESTART": "SYSTEM BOUNTY PRESTART",
-        "OBJECTIVE_BOUNTY_START": "SYSTEM BOUNTY START",
-        "OBJECTIVE_BOUNTY_FINISH": "SYSTEM BOUNTY END",
-        "GAME_END": "SYSTEM GAME END",
-        "PAUSE_END": "SYSTEM GAME START",
-    }
-
-    model = SentenceTransformer("all-MiniLM-L6-v2")  # 384-dim embeddings
-
-    # Reduce to the number of components that explain at least 90% of the variance
-    pca = sk_PCA(n_components=0.9)
-    array_of_reduced_embeddings = pca.fit_transform(
-        model.encode(list(map_of_event_types_to_keywords.values()))
+
+def enrich_events(
+    df_events: pl.DataFrame | pl.LazyFrame,
+    df_participants: pl.DataFrame | pl.LazyFrame,
+    df_matches: pl.DataFrame | pl.LazyFrame,
+) -> pl.LazyFrame:
+    """
+    The whole enrichment chain, as a single lazy plan: pre-game data, inventories,
+    levels and match information.
+
+    Polars then runs the three pivots in parallel, and only reads the columns
+    the output needs.
+    Args:
+        df_events (pl.DataFrame | pl.LazyFrame): Events.
+        df_participants (pl.DataFrame | pl.LazyFrame): Pre-game data of the participants.
+        df_matches (pl.DataFrame | pl.LazyFrame): Match information.
+    Returns:
+        pl.LazyFrame: The enriched events, to collect.
+    """
+    lf_events = df_events.lazy()
+    lf_enriched = enrich_events_with_pregame_data(lf_events, df_participants)
+    lf_enriched = enrich_events_with_inventory_data(
+        lf_enriched,
+        df_item_events=lf_events.filter(pl.col("type").is_in(ITEM_EVENT_TYPES)),
+    )
+    lf_enriched = enrich_events_with_levels(
+        lf_enriched,
+        df_level_up_events=lf_events.filter(pl.col("type") == "LEVEL_UP"),
     )
 
-    map_of_event_types_to_reduced_embeddings = {
-        # Map to reduced embeddings, and convert to list to prevent serialization issues with Polars
-        k: v.tolist() for k, v in dict(zip(
-            list(map_of_event_types_to_keywords.keys()),
-            array_of_reduced_embeddings
-        )).items()
-    }
-
-    return df_events.with_columns(
-        pl.col("type")
-        .replace_strict(
-            map_of_event_types_to_reduced_embeddings,
-            default=[]
-        )
-        .alias("type_embeddings")
+    # Add general match information
+    return lf_enriched.join(
+        df_matches.lazy().select([
+            "gameStartTimestamp",
+            "patch",
+            "matchId",
+            "platformId",
+        ]),
+        on=["matchId"],
+        how="inner",
+    )
+
+
+def enrich_events_with_event_type_embeddings(
+    df_events: pl.DataFrame | pl.LazyFrame
+) -> pl.DataFrame | pl.LazyFrame:
+    """
+    Maps event types to a semantically-meaningful embedding space (see `embeddings`).
+    Event types without keywords get an empty embedding.
+    """
+    df_embeddings = load_event_type_embeddings()
+    if isinstance(df_events, pl.LazyFrame):
+        df_embeddings = df_embeddings.lazy()
+
+    return df_events.join(
+        df_embeddings, on="type", how="left", maintain_order="left"
+    ).with_columns(
+        pl.col("type_embeddings").fill_null(pl.lit([], dtype=df_embeddings.collect_schema()["type_embeddings"]))
     )
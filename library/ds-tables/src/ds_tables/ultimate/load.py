@@ -0,0 +1,29 @@
+"""
+Loading of a shard's rows from the basic tables.
+
+The basic tables are stored sorted by matchId (see `basic.batch_writer`), so
+the row-group statistics of their parquet files bound the matchIds of each
+row group, and a load filtered on a shard's matchIds skips the row groups
+outside of them. Shards are sorted runs of matchIds (see `ultimate.worker`),
+which keeps the row groups they overlap to a few per file.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import polars as pl
+import packages.storage.src as src
+
+
+def load_shard(
+    storage: src.StoragePartition,
+    list_of_match_ids: list[str],
+    columns_per_table: dict[str, list[str] | None],
+) -> dict[str, pl.DataFrame]:
+    """
+    Loads the rows of the shard's matches from each table, with the given columns
+    (all of them for None). Tables are loaded concurrently: Polars reads without the GIL.
+    """
+    with ThreadPoolExecutor(max_workers=len(columns_per_table)) as executor:
+        futures = {
+            table: executor.submit(storage.load_to_polars, table, columns, matchId=list_of_match_ids)
+            for table, columns in columns_per_table.items()
+        }
+        return {table: future.result() for table, future in futures.items()}
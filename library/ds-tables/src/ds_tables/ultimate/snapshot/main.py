@@ -3,12 +3,26 @@ import polars as pl
 import packages.storage.src as src
 
 
+# Every 5 minutes, up to 30
+SNAPSHOT_TIMES_IN_MS = [minutes * 60_000 for minutes in range(5, 31, 5)]
+
+
+def snapshot_table_name(snapshot_time_in_ms: int) -> str:
+    # The 15-minute snapshot keeps the table it always had
+    if snapshot_time_in_ms == 900_000:
+        return "snapshot"
+    return f"snapshot_{snapshot_time_in_ms // 60_000}min"
+
+
+SNAPSHOT_TABLE_NAMES = [snapshot_table_name(snapshot_time) for snapshot_time in SNAPSHOT_TIMES_IN_MS]
+
+
 def main(
     list_of_match_ids: list[str],
     region: str,
     storage_basic: src.StoragePartition,
     storage_ultimate: src.StoragePartition,
-):
+) -> dict[str, pl.DataFrame]:
     storage_from = src.StoragePartition(
         root=storage_ultimate.root,
         schema="ultimate",
@@ -25,31 +39,9 @@ def main(
         matchId=list_of_match_ids
     )
 
-    # Find matchIds with any timestamp ≥ snapshot time
-    SNAPSHOT_TIME_IN_MS = 900_000
-    df_long_enough_matches = df_events.group_by("matchId").agg(
-        pl.col("timestamp").max().alias("max_timestamp")
-    ).filter(
-        pl.col("max_timestamp") >= SNAPSHOT_TIME_IN_MS
-    )["matchId"]
-    
-    df_before_snapshot = (
-        df_events
-        # Ensure all matches are long enough
-        .filter(
-            pl.col("matchId").is_in(df_long_enough_matches)
-        )
-        # Sort by timestamp and backfill the winningTeam (target variable)
-        .sort(["matchId", "timestamp"])
-        .with_columns([
-            pl.col("winningTeam").fill_null(strategy="backward").over("matchId")
-        ])
-        # Add a 10 second tolerance, to ensure the snapshot's participant frame is included.
-        .filter(pl.col("timestamp").le(SNAPSHOT_TIME_IN_MS + 10_000))
-    )
-    df_snapshot = transform.snapshot_from_events(df_before_snapshot)
-
-    print(f"[{region}] Storing batch...")
-    storage_ultimate.store_batch("snapshot", df_snapshot)
-
-    return df_snapshot
+    # Snapshots at every time, for the matches lasting at least that long
+    dict_of_snapshots = transform.snapshots_from_events(df_events, SNAPSHOT_TIMES_IN_MS)
+    return {
+        snapshot_table_name(snapshot_time_in_ms): df_snapshot
+        for snapshot_time_in_ms, df_snapshot in dict_of_snapshots.items()
+    }
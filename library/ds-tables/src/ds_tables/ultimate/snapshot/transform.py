@@ -1,160 +1,151 @@
-from functools import reduce
 import polars as pl
 
 
-def counts_from_events(
-    df: pl.DataFrame,
-    filter: pl.Expr,
-    prefix: str
-):
-    participant_ids = [str(i) for i in range(1, 11)]
-
-    df_counts = (
-        df
-        .filter(filter)
-        .group_by(["matchId", "participantId"])
-        .len()
-        .pivot(
-            values="len",
-            index="matchId",
-            columns="participantId"
-        )
-    )
-
-    # Ensure all participant columns exist
-    for pid in participant_ids:
-        if pid not in df_counts.columns:
-            df_counts = df_counts.with_columns(pl.lit(0).alias(pid))
-
-        # Rename participant columns with prefix
-        df_counts = df_counts.rename({pid: f"{prefix}_{pid}"})
-
-    # Reorder columns: matchId first, then sorted participants
-    ordered_columns = ["matchId"] + [f"{prefix}_{pid}" for pid in participant_ids]
-    
-    return df_counts.select(ordered_columns)
-
-
-def snapshot_from_events(
-    df_events_up_to_snapshot: pl.DataFrame,
-):
-    df_participant_events_before_snapshot = df_events_up_to_snapshot.select([
-        "matchId",
-        "participantId",
-        "type",
-        "monsterType",
-        "monsterSubType",
-        "buildingType",
-        "towerType",
-        "victimId"
-    ])
-
-    df_kill_counts = counts_from_events(
-        df_participant_events_before_snapshot,
-        (pl.col("type") == "CHAMPION_KILL"),
-        "kills"
-    )
-    df_assist_counts = counts_from_events(
-        df_participant_events_before_snapshot,
-        (pl.col("type") == "CHAMPION_ASSIST"),
-        "assists"
-    )
-
-    df_death_counts = counts_from_events(
-        df_participant_events_before_snapshot.drop("participantId").rename({"victimId": "participantId"}),
-        (pl.col("type") == "CHAMPION_KILL"),
-        "deaths"
-    )
-
-    list_of_df_building_kills = [
-        counts_from_events(
-            df_participant_events_before_snapshot,
+PARTICIPANT_IDS = range(1, 11)
+
+DRAGON_TYPES = [
+    "AIR_DRAGON",
+    "CHEMTECH_DRAGON",
+    "EARTH_DRAGON",
+    "FIRE_DRAGON",
+    "HEXTECH_DRAGON",
+    "WATER_DRAGON"
+]
+
+# State of the participants at the snapshot: taken from the last event before it
+PARTICIPANT_STATE_COLUMNS = [
+    f"{column_prefix}{i}"
+    for i in range(1, 11)
+    for column_prefix in [
+        'currentGold_',
+        'inventoryIds_',
+        'inventoryCounts_',
+        'jungleMinionsKilled_',
+        'level_',
+        'minionsKilled_',
+        'rune_primary_0_',
+        'rune_primary_1_',
+        'rune_primary_2_',
+        'rune_primary_3_',
+        'rune_secondary_0_',
+        'rune_secondary_1_',
+        'rune_shard_defense_',
+        'rune_shard_flex_',
+        'rune_shard_offense_',
+        'positionX_',
+        'positionY_',
+        'summoner1Id_',
+        'summoner2Id_',
+        'totalGold_',
+        'xp_'
+    ]
+]
+SNAPSHOT_COLUMNS = [
+    'matchId',
+    'gameStartTimestamp',
+    'patch',
+    'timestamp',
+    'platformId',
+    'winningTeam',
+    *PARTICIPANT_STATE_COLUMNS,
+]
+
+# Events shortly after a snapshot's time are included, for its participant frame
+SNAPSHOT_TOLERANCE_IN_MS = 10_000
+
+COUNTED_EVENT_TYPES = ["CHAMPION_KILL", "CHAMPION_ASSIST", "BUILDING_KILL", "ELITE_MONSTER_KILL"]
+
+# Counters of each participant: (prefix, column of the participant, events counted)
+COUNTERS = [
+    ("kills", "participantId", pl.col("type") == "CHAMPION_KILL"),
+    ("deaths", "victimId", pl.col("type") == "CHAMPION_KILL"),
+    ("assists", "participantId", pl.col("type") == "CHAMPION_ASSIST"),
+    *[
+        (
+            tower_type,
+            "participantId",
             (pl.col("type") == "BUILDING_KILL")
             & (pl.col("buildingType") == building_type)
             & (pl.col("towerType") == tower_type),
-            prefix=tower_type
         )
         for building_type in ["TOWER_BUILDING"]
         for tower_type in ["OUTER_TURRET", "INNER_TURRET", "INHIBITOR_TURRET", "NEXUS_TURRET"]
-    ]
-
-    list_of_df_monster_kills = [
-        counts_from_events(
-            df_participant_events_before_snapshot,
-            (pl.col("type") == "ELITE_MONSTER_KILL")
-                & (pl.col("monsterType") == monster_type),
-            prefix=monster_type
+    ],
+    *[
+        (
+            monster_type,
+            "participantId",
+            (pl.col("type") == "ELITE_MONSTER_KILL") & (pl.col("monsterType") == monster_type),
         )
         for monster_type in ["HORDE", "RIFTHERALD"]
-    ]
-
-    list_of_dragon_types = [
-        "AIR_DRAGON",
-        "CHEMTECH_DRAGON",
-        "EARTH_DRAGON",
-        "FIRE_DRAGON",
-        "HEXTECH_DRAGON",
-        "WATER_DRAGON"
-    ]
-    list_of_df_dragon_kills = [
-        counts_from_events(
-            df_participant_events_before_snapshot,
-            (pl.col("type") == "ELITE_MONSTER_KILL")
-            & (pl.col("monsterSubType") == monster_sub_type),
-            prefix=monster_sub_type
+    ],
+    *[
+        (
+            monster_sub_type,
+            "participantId",
+            (pl.col("type") == "ELITE_MONSTER_KILL") & (pl.col("monsterSubType") == monster_sub_type),
         )
-        for monster_sub_type in list_of_dragon_types
+        for monster_sub_type in DRAGON_TYPES
+    ],
+]
+
+
+def counts_from_events(df: pl.DataFrame, by: tuple[str, ...] = ("matchId",)) -> pl.DataFrame:
+    """
+    Counts the events of each of COUNTERS, per `by` (a match) and participant (e.g. `kills_3`),
+    in a single pass over the events counted: conditional sums grouped by
+    match and participant (or victim, for deaths), then one pivot.
+    """
+    lf = df.lazy().filter(pl.col("type").is_in(COUNTED_EVENT_TYPES))
+    counted_by_participant = [
+        (prefix, condition)
+        for prefix, participant_column, condition in COUNTERS
+        if participant_column == "participantId"
     ]
-
-    df_stats_at_snapshot = reduce(
-        lambda left, right: left.join(right, on=["matchId"], how="left"),
+    lf_counts = pl.concat(
         [
-            df_kill_counts,
-            df_death_counts,
-            df_assist_counts,
-            *list_of_df_building_kills,
-            *list_of_df_monster_kills,
-            *list_of_df_dragon_kills
-        ]
-    ).fill_null(0)  # Replace missing with zero
+            lf.group_by(*by, "participantId").agg([
+                condition.sum().alias(prefix)
+                for prefix, condition in counted_by_participant
+            ]),
+            *[
+                lf.filter(condition).group_by(*by, participantId=participant_column).agg(
+                    pl.len().alias(prefix)
+                )
+                for prefix, participant_column, condition in COUNTERS
+                if participant_column != "participantId"
+            ],
+        ],
+        how="diagonal_relaxed",
+    )
+    return lf_counts.pivot(
+        on="participantId",
+        on_columns=list(PARTICIPANT_IDS),
+        index=list(by),
+        values=[prefix for prefix, _, _ in COUNTERS],
+        aggregate_function="sum",
+    ).fill_null(0).collect()
+
+
+def snapshot_from_events(
+    df_events_up_to_snapshot: pl.DataFrame,
+):
+    df_stats_at_snapshot = counts_from_events(
+        df_events_up_to_snapshot.select([
+            "matchId",
+            "participantId",
+            "type",
+            "monsterType",
+            "monsterSubType",
+            "buildingType",
+            "towerType",
+            "victimId"
+        ])
+    )
 
     df_snapshot = (
         df_events_up_to_snapshot
-        .select([
-            'matchId',
-            'gameStartTimestamp',
-            'patch',
-            'timestamp',
-            'platformId',
-            'winningTeam',
-            *[
-                f"{column_prefix}{i}"
-                for i in range(1, 11)
-                for column_prefix in [
-                    'currentGold_',
-                    'inventoryIds_',
-                    'inventoryCounts_',
-                    'jungleMinionsKilled_',
-                    'level_',
-                    'minionsKilled_',
-                    'rune_primary_0_',
-                    'rune_primary_1_',
-                    'rune_primary_2_',
-                    'rune_primary_3_',
-                    'rune_secondary_0_',
-                    'rune_secondary_1_',
-                    'rune_shard_defense_',
-                    'rune_shard_flex_',
-                    'rune_shard_offense_',
-                    'positionX_',
-                    'positionY_',
-                    'summoner1Id_',
-                    'summoner2Id_',
-                    'totalGold_',
-                    'xp_'
-                ]
-            ]
-        ])
+        .select(SNAPSHOT_COLUMNS)
         .sort(["matchId", "timestamp"])
         .group_by("matchId", maintain_order=True)
         .last()
@@ -163,6 +154,87 @@ def snapshot_from_events(
             on="matchId",
             how="left"
         )
+        # Matches without any counted event
+        .with_columns(pl.col(df_stats_at_snapshot.columns[1:]).fill_null(0))
     )
 
     return df_snapshot
+
+
+def snapshots_from_events(
+    df_events: pl.DataFrame,
+    snapshot_times_in_ms: list[int],
+    tolerance_in_ms: int = SNAPSHOT_TOLERANCE_IN_MS,
+) -> dict[int, pl.DataFrame]:
+    """
+    Snapshots of every match at each of `snapshot_times_in_ms`, in a single pass over the events.
+    Each is the `snapshot_from_events` of the events up to its time (plus `tolerance_in_ms`),
+    for the matches lasting at least that long, with the winning team of the match.
+
+    The events are sorted once. Each snapshot's state is an as-of join of its time
+    on them, and its counters are cumulative sums of the events counted between
+    consecutive times, so each additional time costs little more than its rows.
+    """
+    snapshot_times_in_ms = sorted(snapshot_times_in_ms)
+    thresholds = [snapshot_time + tolerance_in_ms for snapshot_time in snapshot_times_in_ms]
+
+    df_events = (
+        df_events
+        .sort(["matchId", "timestamp"], maintain_order=True)
+        # Backfill the winningTeam (target variable)
+        .with_columns(pl.col("winningTeam").fill_null(strategy="backward").over("matchId"))
+    )
+
+    # Each match, at each time it lasts until
+    df_keys = (
+        df_events
+        .group_by("matchId")
+        .agg(pl.col("timestamp").max().alias("max_timestamp"))
+        .join(
+            pl.DataFrame({
+                "snapshotIndex": range(len(snapshot_times_in_ms)),
+                "snapshotTime": snapshot_times_in_ms,
+                "threshold": thresholds,
+            }),
+            how="cross",
+        )
+        .filter(pl.col("max_timestamp") >= pl.col("snapshotTime"))
+        .sort(["matchId", "threshold"])
+    )
+
+    # State: the last event at or before each time
+    df_states = df_keys.join_asof(
+        df_events.select(SNAPSHOT_COLUMNS).with_columns(pl.col("timestamp").alias("threshold")),
+        on="threshold",
+        by="matchId",
+        strategy="backward",
+        check_sortedness=False,
+    )
+
+    # Counters: counted between consecutive times, then summed up to each time
+    counter_columns = [f"{prefix}_{i}" for prefix, _, _ in COUNTERS for i in PARTICIPANT_IDS]
+    df_counts = counts_from_events(
+        df_events
+        .filter(pl.col("timestamp") <= thresholds[-1])
+        .with_columns(
+            # Index of the first snapshot whose threshold includes the event
+            pl.lit(pl.Series(thresholds)).search_sorted(pl.col("timestamp"), side="left").alias("snapshotIndex")
+        ),
+        by=("matchId", "snapshotIndex"),
+    )
+    df_counts = (
+        df_keys.select("matchId").unique()
+        .join(pl.DataFrame({"snapshotIndex": range(len(snapshot_times_in_ms))}), how="cross")
+        .join(df_counts.cast({"snapshotIndex": pl.Int64}), on=["matchId", "snapshotIndex"], how="left")
+        .with_columns(pl.col(counter_columns).fill_null(0))
+        .sort(["matchId", "snapshotIndex"])
+        .with_columns(pl.col(counter_columns).cum_sum().over("matchId"))
+    )
+
+    df_snapshots = df_states.join(df_counts, on=["matchId", "snapshotIndex"], how="left")
+    return {
+        snapshot_time: df_snapshot.sort("matchId").select(*SNAPSHOT_COLUMNS, *counter_columns)
+        for (snapshot_time,), df_snapshot in df_snapshots.partition_by(
+            "snapshotTime", as_dict=True, maintain_order=True
+        ).items()
+    }
@@ -1,16 +1,35 @@
-import ds_common
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from ds_common import print
 import importlib
+import multiprocessing
 import numpy as np
+import os
 import polars as pl
 import sklearn
+from tqdm import tqdm
 import packages.storage.src as src
+from .snapshot.main import SNAPSHOT_TABLE_NAMES
 
 
 
 TABLES_PER_DATASET = {
     "events": ["events"],
-    "snapshot": ["snapshot"]
+    # One table per snapshot time
+    "snapshot": SNAPSHOT_TABLE_NAMES
 }
+SPLITS = ["train", "test"]
+
+# Memory for the shards in flight and the output not flushed yet: half of the physical memory by default
+MEMORY_BUDGET = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // 2
+# Peak memory of a shard while processed, relative to the tables it outputs
+PEAK_OVER_OUTPUT = 4
+# Output bytes per match, until a shard has been measured
+DEFAULT_BYTES_PER_MATCH = 4 * 2**20
+
+# Work function and storages of the worker process, opened once by `_init_worker`
+_work_function = None
+_storage_basic: src.StoragePartition | None = None
+_storages_ultimate: dict[str, src.StoragePartition] = {}
 
 
 def train_test_split(
@@ -40,6 +59,64 @@ def train_test_split(
     }
 
 
+def basic_storage(root: str, region: str) -> src.StoragePartition:
+    return src.StoragePartition(
+        root=root,
+        schema="basic",
+        dataset="matches",
+        tables=["matches", "participants", "events"],
+        partition_col="region",
+        partition_val=region
+    )
+
+
+def ultimate_storage(root: str, dataset: str, region: str, split: str) -> src.StoragePartition:
+    return src.StoragePartition(
+        root=root,
+        schema="ultimate",
+        dataset=dataset,
+        tables=TABLES_PER_DATASET[dataset],
+        partition_col="region",
+        partition_val=region,
+        split=split
+    )
+
+
+def work_module(dataset: str):
+    # Import the appropriate work function based on the dataset
+    module_path = f".{dataset.replace('-', '_')}.main"
+
+    # Dynamically import the module and get the worker
+    try:
+        return importlib.import_module(module_path, package=__package__)
+    except ModuleNotFoundError as e:
+        raise ImportError(f"Could not import module {module_path}: {e}") from e
+
+
+def _init_worker(root: str, dataset: str, region: str):
+    global _work_function, _storage_basic, _storages_ultimate
+    _work_function = work_module(dataset).main
+    _storage_basic = basic_storage(root, region)
+    _storages_ultimate = {split: ultimate_storage(root, dataset, region, split) for split in SPLITS}
+
+
+def process_shard(
+    list_of_match_ids: list[str],
+    region: str,
+    split: str,
+) -> dict[str, pl.DataFrame]:
+    """
+    Loads and transforms a shard in a worker process, and returns its tables,
+    which the parent stores.
+    """
+    return _work_function(
+        list_of_match_ids,
+        region,
+        storage_basic=_storage_basic,
+        storage_ultimate=_storages_ultimate[split],
+    )
+
+
 def main(
     region: str,
     root: str,
@@ -47,15 +124,10 @@ def main(
     count: int = 100,
     flush: bool = True,
     overwrite: bool = False,
+    workers: int = os.cpu_count() or 1,
+    memory_budget: int = MEMORY_BUDGET,
 ):
-    storage_basic = src.StoragePartition(
-        root=root,
-        schema="basic",
-        dataset="matches",
-        tables=["matches", "participants", "events"],
-        partition_col="region",
-        partition_val=region
-    )
+    storage_basic = basic_storage(root, region)
 
     df_match_ids_with_game_version = storage_basic.load_to_polars(
         "matches",
@@ -70,35 +142,94 @@ def main(
         stratify_labels=df_match_ids_with_game_version["patch_winner_team_id"].to_numpy()
     )
 
-    # Import the appropriate work function based on the dataset
-    module_path = f".{dataset.replace('-', '_')}.main"
+    dict_of_storages_ultimate = {split: ultimate_storage(root, dataset, region, split) for split in SPLITS}
+    if not overwrite:
+        for split, storage_ultimate in dict_of_storages_ultimate.items():
+            array_of_match_ids = dict_of_match_id_splits[split]
+            dict_of_match_id_splits[split] = array_of_match_ids[np.array([
+                not storage_ultimate.has_records_in_all_tables(matchId=match_id)
+                for match_id in array_of_match_ids
+            ], dtype=bool)]
+            skipped = len(array_of_match_ids) - len(dict_of_match_id_splits[split])
+            if skipped:
+                print(f"[{region}] {skipped} {split} matches already exist.")
 
-    # Dynamically import the module and get the worker
-    try:
-        work_module = importlib.import_module(module_path, package=__package__)
-    except ModuleNotFoundError as e:
-        raise ImportError(f"Could not import module {module_path}: {e}") from e
-    
-
-    for split in ['train', 'test']:
-        storage_ultimate = src.StoragePartition(
-            root=root,
-            schema="ultimate",
-            dataset=dataset,
-            tables=TABLES_PER_DATASET[dataset],
-            partition_col="region",
-            partition_val=region,
-            split=split
-        )
-
-        for _ in common.work_generator(
-            dict_of_match_id_splits[split],
-            work_module.main,
-            descriptor=region,
-            step=count // 100,  # Save shard every N matches
-            # kwargs
-            storage_basic=storage_basic,
-            storage_ultimate=storage_ultimate
-        ):
-            if flush:
-                storage_ultimate.flush()
+    # Save shard every N matches
+    shard_size = max(1, count // 100)
+    # The shards of both splits share the pool
+    list_of_shards = [
+        (split, array_of_match_ids[i:i + shard_size].tolist())
+        for split in SPLITS
+        # Sorted, for each shard to be a run of matchIds (see `load`)
+        for array_of_match_ids in [np.sort(dict_of_match_id_splits[split])]
+        for i in range(0, len(array_of_match_ids), shard_size)
+    ]
+
+    # Memory a shard is expected to take, from the output of the shards done so far:
+    # its peak in the worker, and its output once received by the parent
+    output_bytes, output_matches = 0, 0
+    def shard_bytes(list_of_match_ids: list[str]) -> float:
+        bytes_per_match = output_bytes / output_matches if output_matches else DEFAULT_BYTES_PER_MATCH
+        return (PEAK_OVER_OUTPUT + 1) * bytes_per_match * len(list_of_match_ids)
+
+    # Output stored in each split's storage and not flushed yet, which the parent holds
+    unflushed_bytes = dict.fromkeys(SPLITS, 0)
+
+    progress = tqdm(total=len(list_of_shards), desc=f"[{region}]".ljust(12))
+    # Spawned rather than forked: the parent runs one thread per region
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(root, dataset, region),
+    ) as executor:
+        pending_shards = iter(list_of_shards)
+        next_shard = next(pending_shards, None)
+        running = {}
+        while True:
+            # Keep every worker busy, plus a shard ready to start, within the memory budget;
+            # a shard always runs when none is running, whatever its estimate
+            while next_shard is not None and len(running) < workers + 1 and (
+                not running
+                or sum(map(shard_bytes, (shard for _, shard in running.values())))
+                + shard_bytes(next_shard[1])
+                + sum(unflushed_bytes.values())
+                <= memory_budget
+            ):
+                split, list_of_match_ids = next_shard
+                running[executor.submit(process_shard, list_of_match_ids, region, split)] = next_shard
+                next_shard = next(pending_shards, None)
+            if not running:
+                break
+
+            # Stored by the parent, while the workers process the next shards
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                split, list_of_match_ids = running.pop(future)
+                dict_of_tables = future.result()
+
+                batch_bytes = sum(df.estimated_size() for df in dict_of_tables.values())
+                output_bytes += batch_bytes
+                output_matches += len(list_of_match_ids)
+
+                storage_ultimate = dict_of_storages_ultimate[split]
+                print(f"[{region}] Storing {split} batch...")
+                for table, df in dict_of_tables.items():
+                    storage_ultimate.store_batch(table, df)
+                unflushed_bytes[split] += batch_bytes
+                if flush:
+                    storage_ultimate.flush()
+                    unflushed_bytes[split] = 0
+                progress.update(1)
+
+            # Without flushing after each batch, the output is flushed once it leaves
+            # no room in the memory budget for the next shard
+            if next_shard is not None and (
+                sum(unflushed_bytes.values()) + shard_bytes(next_shard[1]) > memory_budget
+            ):
+                print(f"[{region}] Flushing the stored batches to stay within the memory budget...")
+                for split, storage_ultimate in dict_of_storages_ultimate.items():
+                    if unflushed_bytes[split]:
+                        storage_ultimate.flush()
+                        unflushed_bytes[split] = 0
+    progress.close()
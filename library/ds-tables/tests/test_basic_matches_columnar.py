@@ -0,0 +1,235 @@
+import copy
+from dorans import death
+import json
+import orjson
+import polars as pl
+from polars.testing import assert_frame_equal
+import pytest
+from ds_tables.basic.matches import columnar, coordinates, transform
+
+
+CHAMPION_NAMES = {participant_id: f"Champion{participant_id}" for participant_id in range(1, 11)}
+
+
+@pytest.fixture(autouse=True)
+def cdragon_coordinates(tmp_path, monkeypatch):
+    """
+    Coordinates of the spawn gates and the dragon pit, under the relative `data/cdragon/coordinates`.
+    """
+    directory = tmp_path / "data" / "cdragon" / "coordinates"
+    directory.mkdir(parents=True)
+    (directory / "buildings.json").write_text(json.dumps({"OrderSpawnGate": [400, 400], "ChaosSpawnGate": [14300, 14400]}))
+    (directory / "camps.json").write_text(json.dumps({"Dragon": [9866, 4414]}))
+    monkeypatch.chdir(tmp_path)
+    coordinates.load_coordinates.cache_clear()
+    yield
+    coordinates.load_coordinates.cache_clear()
+
+
+def make_timeline(match_id: str, minutes: int, events: list[dict]) -> dict:
+    """
+    Timeline of a match with a participant frame per minute, and `events` in the frames of their minute.
+    """
+    frames = [
+        {
+            "timestamp": minute * 60_000,
+            "participantFrames": {
+                str(participant_id): {
+                    "participantId": participant_id,
+                    "position": {"x": 1000 * participant_id + minute, "y": 500 * participant_id + minute},
+                    "currentGold": 100 * minute,
+                    "level": 1 + minute // 3,
+                }
+                for participant_id in range(1, 11)
+            },
+            "events": [event for event in events if event["timestamp"] // 60_000 == minute],
+        }
+        for minute in range(minutes + 1)
+    ]
+    return {"metadata": {"matchId": match_id}, "info": {"frames": frames}}
+
+
+def kill(timestamp: int, killer_id: int, victim_id: int, assists: list[int]) -> dict:
+    return {
+        "type": "CHAMPION_KILL", "timestamp": timestamp, "killerId": killer_id, "victimId": victim_id,
+        "assistingParticipantIds": assists, "position": {"x": 7000, "y": 7000}, "bounty": 300,
+    }
+
+
+def item(event_type: str, timestamp: int, participant_id: int, item_id: int | None = None) -> dict:
+    event = {"type": event_type, "timestamp": timestamp, "participantId": participant_id}
+    if item_id is not None:
+        event["itemId"] = item_id
+    return event
+
+
+TIMELINES = [
+    make_timeline("EUW1_1", minutes=50, events=[
+        # World Atlas, auto-assigned to the supports
+        item("ITEM_PURCHASED", 0, 0, 3865),
+        item("ITEM_PURCHASED", 0, 0, 3865),
+        item("ITEM_PURCHASED", 0, 1, 1055),
+        # Consumables: purchased before they're destroyed, whatever their order in the frame
+        item("ITEM_DESTROYED", 0, 1, 2003),
+        item("ITEM_PURCHASED", 0, 1, 2003),
+        # Ornn buys away from his spawn: the closest frame's position is used
+        item("ITEM_PURCHASED", 95_000, 3, 1036),
+        item("ITEM_PURCHASED", 150_000, 3, 3133),
+        item("ITEM_DESTROYED", 150_000, 3, 1036),
+        # Undo of a purchase, and of its simultaneous components being destroyed
+        item("ITEM_UNDO", 152_000, 3),
+        item("ITEM_SOLD", 200_000, 1, 1055),
+        item("ITEM_UNDO", 201_000, 1),
+        {"type": "LEVEL_UP", "timestamp": 120_000, "participantId": 7, "level": 2},
+        {"type": "LEVEL_UP", "timestamp": 900_000, "participantId": 7, "level": 11},
+        {"type": "LEVEL_UP", "timestamp": 2_000_000, "participantId": 2, "level": 16},
+        {"type": "WARD_PLACED", "timestamp": 130_000, "creatorId": 4, "wardType": "YELLOW_TRINKET"},
+        # Respawn timers at every time increase factor: none, and past 15, 30 and 45 minutes
+        kill(300_000, 1, 7, [2, 3]),
+        kill(1_000_000, 8, 7, []),
+        kill(1_850_000, 2, 6, [4]),
+        kill(2_750_000, 9, 2, [6, 7, 8]),
+        {
+            "type": "ELITE_MONSTER_KILL", "timestamp": 1_200_000, "killerId": 4, "killerTeamId": 100,
+            "monsterType": "DRAGON", "monsterSubType": "FIRE_DRAGON", "assistingParticipantIds": [1],
+            "position": {"x": 9866, "y": 4414}, "bounty": 0,
+        },
+        {"type": "DRAGON_SOUL_GIVEN", "timestamp": 1_900_000, "teamId": 100, "name": "Infernal"},
+        {"type": "OBJECTIVE_BOUNTY_PRESTART", "timestamp": 1_500_000, "actualStartTime": 1_530_000, "teamId": 200},
+        {"type": "OBJECTIVE_BOUNTY_FINISH", "timestamp": 1_600_000, "teamId": 200},
+        {"type": "GAME_END", "timestamp": 3_000_000, "winningTeam": 100},
+    ]),
+    make_timeline("EUW1_2", minutes=5, events=[
+        item("ITEM_PURCHASED", 0, 6, 1055),
+        kill(200_000, 6, 1, [7]),
+        {"type": "GAME_END", "timestamp": 300_000, "winningTeam": 200},
+    ]),
+]
+
+
+def participants(match_id: str, ornn_id: int | None = None) -> list[dict]:
+    return [
+        {
+            "matchId": match_id,
+            "participantId": participant_id,
+            "championName": "Ornn" if participant_id == ornn_id else CHAMPION_NAMES[participant_id],
+        }
+        for participant_id in range(1, 11)
+    ]
+
+
+def make_match(match_id: str, ornn_id: int | None = None, feats: bool = True) -> dict:
+    """
+    Raw `match_info` of a match, with the fields the Python transform reads or drops.
+    """
+    def team(team_id: int) -> dict:
+        team = {
+            "teamId": team_id,
+            "win": team_id == 100,
+            "bans": [{"championId": team_id + turn, "pickTurn": turn} for turn in range(1, 6)],
+            "objectives": {
+                objective: {"first": team_id == 100, "kills": team_id // 100 + i}
+                for i, objective in enumerate(["baron", "champion", "dragon", "horde", "inhibitor", "riftHerald", "tower"])
+            },
+        }
+        if feats:
+            team["feats"] = {
+                feat: {"featState": team_id // 100 + i}
+                for i, feat in enumerate(["EPIC_MONSTER_KILL", "FIRST_BLOOD", "FIRST_TURRET"])
+            }
+        return team
+
+    participants = [
+        {
+            "participantId": participant_id,
+            "teamId": 100 if participant_id <= 5 else 200,
+            "puuid": f"puuid-{participant_id}",
+            "championId": participant_id,
+            "championName": "Ornn" if participant_id == ornn_id else CHAMPION_NAMES[participant_id],
+            "teamPosition": "UTILITY" if participant_id in (5, 10) else "TOP",
+            "kills": participant_id, "deaths": 10 - participant_id, "assists": 2 * participant_id,
+            "goldEarned": 1000 * participant_id, "win": participant_id <= 5,
+            "gameEndedInEarlySurrender": False,
+            "perks": {
+                "statPerks": {"defense": 5001, "flex": 5008, "offense": 5005},
+                "styles": [
+                    {"style": 8000, "selections": [{"perk": 8000 + participant_id + j} for j in range(4)]},
+                    {"style": 8100, "selections": [{"perk": 8100 + participant_id + j} for j in range(2)]},
+                ],
+            },
+            **{f"PlayerScore{i}": 0 for i in range(12)},
+            **{f"playerAugment{i}": 0 for i in range(1, 7)},
+            "challenges": {"kda": 1.5}, "missions": {"playerScore0": 0},
+            "riotIdGameName": f"Player{participant_id}", "riotIdTagline": "EUW",
+        }
+        for participant_id in range(1, 11)
+    ]
+    return {
+        "metadata": {"matchId": match_id},
+        "info": {
+            "gameId": int(match_id.split("_")[1]),
+            "gameCreation": 1_700_000_000_000, "gameStartTimestamp": 1_700_000_010_000,
+            "gameEndTimestamp": 1_700_001_810_000, "gameDuration": 1800,
+            "gameMode": "CLASSIC", "gameName": "teambuilder-match", "gameType": "MATCHED_GAME",
+            "gameVersion": "15.1.123.4567", "mapId": 11, "queueId": 420, "platformId": "EUW1",
+            "endOfGameResult": "GameComplete", "tournamentCode": "",
+            "teams": [team(100), team(200)],
+            "participants": participants,
+        },
+    }
+
+
+MATCHES = [
+    make_match("EUW1_1", ornn_id=3),
+    # Before feats existed
+    make_match("EUW1_2", feats=False),
+]
+
+
+def test_columnar_matches_match_the_python_transform():
+    matches, participants = [], []
+    for match in MATCHES:
+        match_record, match_participants = transform.match_into_match_and_participants(
+            match_id=match["metadata"]["matchId"], match=copy.deepcopy(match), region="europe"
+        )
+        matches.append(match_record)
+        participants.extend(match_participants)
+
+    df_matches, df_participants = columnar.matches_into_matches_and_participants(
+        [match["metadata"]["matchId"] for match in MATCHES],
+        [orjson.dumps(match) for match in MATCHES],
+        region="europe",
+    )
+
+    assert_frame_equal(df_matches, columnar.standardize_matches(matches))
+    assert_frame_equal(df_participants, columnar.standardize_participants(participants))
+    # Every case above made it into the tables
+    assert df_participants.filter(pl.col("championName") == "Ornn")["participantId"].to_list() == [3]
+    assert df_matches["team_100_FIRST_BLOOD"].to_list() == [2, None]
+    assert df_participants["rune_secondary_1"].null_count() == 0
+
+
+def test_columnar_events_match_the_python_transform():
+    list_of_participants = [participants("EUW1_1", ornn_id=3), participants("EUW1_2")]
+
+    events = []
+    for timeline, match_participants in zip(TIMELINES, list_of_participants):
+        events.extend(transform.timeline_into_events(copy.deepcopy(timeline), match_participants))
+    df_expected = columnar.standardize_events(events)
+
+    df_actual = columnar.timelines_into_events(
+        [orjson.dumps(timeline) for timeline in TIMELINES],
+        pl.DataFrame([participant for match_participants in list_of_participants for participant in match_participants]),
+    )
+
+    assert_frame_equal(df_actual, df_expected)
+    # Every case above made it into the events
+    assert set(df_actual["type"]) >= {
+        "RESPAWN", "CHAMPION_ASSIST", "CHAMPION_KILLED", "ELITE_MONSTER_ASSIST",
+        "OBJECTIVE_BOUNTY_START", "ITEM_UNDO", "DRAGON_SOUL_GIVEN",
+    }
+    # Respawn timers past 15, 30 and 45 minutes are increased
+    assert df_actual.filter(pl.col("type") == "RESPAWN")["timestamp"].to_list() == [
+        timestamp + int(death.timer(level, game_minutes=timestamp / 60000))
+        for timestamp, level in [(300_000, 2), (1_000_000, 11), (1_850_000, 1), (2_750_000, 16), (200_000, 1)]
+    ]
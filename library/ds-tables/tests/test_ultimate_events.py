@@ -0,0 +1,133 @@
+import polars as pl
+from polars.testing import assert_frame_equal
+import random
+from ds_tables.ultimate.events import transform
+
+
+PARTICIPANT_COLUMNS = [
+    "championId", "summoner1Id", "summoner2Id",
+    "rune_primary_0", "rune_primary_1", "rune_primary_2", "rune_primary_3",
+    "rune_secondary_0", "rune_secondary_1",
+    "rune_shard_offense", "rune_shard_flex", "rune_shard_defense",
+]
+
+
+def make_shard(n_matches: int, seed: int = 0) -> tuple[pl.DataFrame, pl.DataFrame, pl.DataFrame]:
+    """
+    Basic `events`, `participants` and `matches` of synthetic matches,
+    with the columns the enrichment reads.
+    """
+    rng = random.Random(seed)
+    events, participants, matches = [], [], []
+    for m in range(n_matches):
+        match_id = f"EUW1_{m}"
+        matches.append({"matchId": match_id, "gameStartTimestamp": 1_700_000_000_000 + m, "patch": "15.1", "platformId": "EUW1"})
+        for participant_id in range(1, 11):
+            participants.append({"matchId": match_id, "participantId": participant_id, **{
+                column: rng.randint(1, 9000) for column in PARTICIPANT_COLUMNS
+            }})
+
+        event_id = 0
+        def add(**event):
+            nonlocal event_id
+            events.append({"matchId": match_id, "eventId": event_id, **event})
+            event_id += 1
+
+        levels = {participant_id: 1 for participant_id in range(1, 11)}
+        for minute in range(rng.randint(3, 8)):
+            timestamp = minute * 60_000
+            for participant_id in range(1, 11):
+                add(
+                    type="PARTICIPANT_FRAME", timestamp=timestamp, participantId=participant_id,
+                    positionX=rng.randint(0, 15_000), positionY=rng.randint(0, 15_000),
+                    currentGold=rng.randint(0, 3000), totalGold=rng.randint(0, 20_000), xp=rng.randint(0, 18_000),
+                    minionsKilled=rng.randint(0, 300), jungleMinionsKilled=rng.randint(0, 100),
+                    championStats={"armor": rng.randint(0, 200), "attackDamage": rng.randint(0, 400)},
+                    level=levels[participant_id],
+                )
+            for _ in range(rng.randint(5, 30)):
+                timestamp += rng.randint(0, 2_000)
+                participant_id = rng.randint(1, 10)
+                match rng.choice(["ITEM_PURCHASED", "ITEM_SOLD", "ITEM_UNDO", "LEVEL_UP", "CHAMPION_KILL", "WARD_PLACED"]):
+                    case "LEVEL_UP":
+                        levels[participant_id] += 1
+                        add(type="LEVEL_UP", timestamp=timestamp, participantId=participant_id, level=levels[participant_id])
+                    case item_type if item_type.startswith("ITEM_"):
+                        size = rng.randint(0, 8)
+                        add(
+                            type=item_type, timestamp=timestamp, participantId=participant_id,
+                            inventoryIds=[rng.randint(1000, 4000) for _ in range(size)] + [0] * (8 - size),
+                            inventoryCounts=[1] * size + [0] * (8 - size),
+                        )
+                    case event_type:
+                        add(type=event_type, timestamp=timestamp, participantId=participant_id,
+                            positionX=rng.randint(0, 15_000), positionY=rng.randint(0, 15_000))
+        # Derived events come last, whatever their timestamp (e.g. respawns)
+        add(type="RESPAWN", timestamp=rng.randint(0, 60_000), participantId=rng.randint(1, 10))
+
+    return (
+        pl.DataFrame(events, infer_schema_length=None),
+        pl.DataFrame(participants),
+        pl.DataFrame(matches),
+    )
+
+
+def expected_state(df_events: pl.DataFrame) -> dict[tuple[str, int], dict]:
+    """
+    State of the participants at each event (other than participant frames), by (matchId, eventId),
+    replayed event by event: the last participant frame at or before its timestamp,
+    and the last inventory and level at or before it.
+    The last inventories and levels are carried over from earlier matches of the shard,
+    as the forward fill over the shard's item and level-up events does, once the match has one.
+    """
+    state = {}
+    inventories, levels = {}, {}
+    for (match_id,), df_match in df_events.sort("matchId", "eventId").group_by("matchId", maintain_order=True):
+        frames = df_match.filter(pl.col("type") == "PARTICIPANT_FRAME").sort("timestamp", maintain_order=True)
+        has_item_event = has_level_up = False
+        for event in df_match.iter_rows(named=True):
+            if event["type"] in transform.ITEM_EVENT_TYPES:
+                has_item_event = True
+                inventories[event["participantId"]] = event["inventoryIds"]
+            if event["type"] == "LEVEL_UP":
+                has_level_up = True
+                levels[event["participantId"]] = event["level"]
+            if event["type"] == "PARTICIPANT_FRAME":
+                continue
+
+            last_frames = {
+                frame["participantId"]: frame
+                for frame in frames.filter(pl.col("timestamp") <= event["timestamp"]).iter_rows(named=True)
+            }
+            state[match_id, event["eventId"]] = {
+                **{f"xp_{i}": last_frames[i]["xp"] if i in last_frames else None for i in transform.PARTICIPANT_IDS},
+                **{
+                    f"inventoryIds_{i}": inventories.get(i) if has_item_event else None
+                    for i in transform.PARTICIPANT_IDS
+                },
+                **{
+                    f"level_{i}": (levels.get(i) if has_level_up else None) or 1
+                    for i in transform.PARTICIPANT_IDS
+                },
+            }
+    return state
+
+
+def test_enrich_events_adds_the_state_of_each_participant():
+    df_events, df_participants, df_matches = make_shard(n_matches=12)
+
+    df_actual = transform.enrich_events(df_events, df_participants, df_matches).collect()
+
+    assert len(df_actual) == len(df_events.filter(pl.col("type") != "PARTICIPANT_FRAME"))
+    # Pre-game data and match information, from the participant frames' join and the matches'
+    df_pregame = df_participants.pivot(on="participantId", index="matchId").join(df_matches, on="matchId")
+    assert_frame_equal(
+        df_actual.select(df_pregame.columns).unique().sort("matchId"),
+        df_pregame.sort("matchId"),
+        check_column_order=False,
+    )
+
+    state = expected_state(df_events)
+    columns = list(next(iter(state.values())))
+    for row in df_actual.iter_rows(named=True):
+        assert {column: row[column] for column in columns} == state[row["matchId"], row["eventId"]]
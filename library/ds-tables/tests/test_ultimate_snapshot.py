@@ -0,0 +1,108 @@
+import polars as pl
+from polars.testing import assert_frame_equal
+import random
+from ds_tables.ultimate.snapshot import transform
+
+
+SNAPSHOT_TIMES_IN_MS = [minutes * 60_000 for minutes in range(5, 31, 5)]
+TOWER_TYPES = ["OUTER_TURRET", "INNER_TURRET", "INHIBITOR_TURRET", "NEXUS_TURRET"]
+
+
+def make_events(match_id: str, minutes: int, counted: list[dict], rng: random.Random) -> list[dict]:
+    """
+    Ultimate events of a synthetic match: an event with the state of the participants
+    every 20 seconds, the `counted` events, and the winning team on the last one.
+    """
+    events = [
+        {"type": "PARTICIPANT_FRAME", "timestamp": timestamp, "participantId": 0}
+        for timestamp in range(0, minutes * 60_000, 20_000)
+    ]
+    events += counted
+    events.append({"type": "GAME_END", "timestamp": minutes * 60_000, "participantId": 0, "winningTeam": rng.choice([100, 200])})
+    return [
+        {
+            "matchId": match_id,
+            "gameStartTimestamp": 1_700_000_000_000,
+            "patch": "15.1",
+            "platformId": "EUW1",
+            **{column: rng.randint(0, 10_000) for column in transform.PARTICIPANT_STATE_COLUMNS},
+            **event,
+        }
+        for event in events
+    ]
+
+
+def random_counted_events(minutes: int, rng: random.Random) -> list[dict]:
+    events = []
+    for timestamp in rng.sample(range(1, minutes * 60_000, 1_000), k=minutes * 4):
+        match rng.choice(["CHAMPION_KILL", "CHAMPION_ASSIST", "BUILDING_KILL", "ELITE_MONSTER_KILL"]):
+            case "CHAMPION_KILL":
+                event = {"type": "CHAMPION_KILL", "victimId": rng.randint(1, 10)}
+            case "BUILDING_KILL":
+                event = {"type": "BUILDING_KILL", "buildingType": "TOWER_BUILDING", "towerType": rng.choice(TOWER_TYPES)}
+            case "ELITE_MONSTER_KILL":
+                event = rng.choice([
+                    {"monsterType": "DRAGON", "monsterSubType": rng.choice(transform.DRAGON_TYPES)},
+                    {"monsterType": rng.choice(["HORDE", "RIFTHERALD"])},
+                ])
+                event["type"] = "ELITE_MONSTER_KILL"
+            case event_type:
+                event = {"type": event_type}
+        events.append({**event, "timestamp": timestamp, "participantId": rng.randint(1, 10)})
+    return events
+
+
+def make_shard(seed: int = 0) -> pl.DataFrame:
+    rng = random.Random(seed)
+    events = []
+    for m, minutes in enumerate([35, 31, 26, 17]):
+        events += make_events(f"EUW1_{m}", minutes, random_counted_events(minutes, rng), rng)
+    # Assists but no kills (e.g. executions), one right at a snapshot's tolerance,
+    # and shorter than the later snapshots
+    events += make_events("EUW1_assists", 12, [
+        {"type": "CHAMPION_ASSIST", "timestamp": timestamp, "participantId": participant_id}
+        for timestamp, participant_id in [(150_500, 3), (290_500, 4), (290_700, 3), (310_000, 5), (610_300, 8)]
+    ], rng)
+    # No counted event at all
+    events += make_events("EUW1_quiet", 20, [], rng)
+    # Ends exactly at a snapshot's time
+    events += make_events("EUW1_exact", 10, random_counted_events(10, rng), rng)
+    return pl.DataFrame(rng.sample(events, k=len(events)), infer_schema_length=None)
+
+
+def events_up_to(df_events: pl.DataFrame, snapshot_time: int) -> pl.DataFrame:
+    """
+    Events up to a snapshot's time, for the matches lasting at least that long,
+    as the snapshot used to select them for `snapshot_from_events`.
+    """
+    return (
+        df_events
+        .filter(pl.col("timestamp").max().over("matchId") >= snapshot_time)
+        .sort(["matchId", "timestamp"])
+        .with_columns(pl.col("winningTeam").fill_null(strategy="backward").over("matchId"))
+        .filter(pl.col("timestamp") <= snapshot_time + transform.SNAPSHOT_TOLERANCE_IN_MS)
+    )
+
+
+def test_snapshots_match_the_single_time_transform():
+    df_events = make_shard()
+
+    dict_of_snapshots = transform.snapshots_from_events(df_events, SNAPSHOT_TIMES_IN_MS)
+
+    assert list(dict_of_snapshots) == SNAPSHOT_TIMES_IN_MS
+    for snapshot_time, df_snapshot in dict_of_snapshots.items():
+        df_expected = transform.snapshot_from_events(events_up_to(df_events, snapshot_time))
+        assert_frame_equal(df_snapshot, df_expected.sort("matchId"), check_column_order=False)
+
+    # Matches are only in the snapshots of times they last until
+    assert [
+        "EUW1_assists" in df_snapshot["matchId"] for df_snapshot in dict_of_snapshots.values()
+    ] == [True, True, False, False, False, False]
+    assert dict_of_snapshots[600_000]["matchId"].to_list() == [
+        "EUW1_0", "EUW1_1", "EUW1_2", "EUW1_3", "EUW1_assists", "EUW1_exact", "EUW1_quiet",
+    ]
+    # Assists are counted without any kill, and matches without counted events have none
+    df_assists = dict_of_snapshots[300_000].filter(pl.col("matchId") == "EUW1_assists")
+    assert df_assists.select("assists_3", "assists_4", "assists_5", "assists_8", "kills_3").row(0) == (2, 1, 1, 0, 0)
+    df_quiet = dict_of_snapshots[900_000].filter(pl.col("matchId") == "EUW1_quiet")
+    assert df_quiet.select(pl.sum_horizontal(pl.col("^(kills|deaths|assists)_.*$"))).item() == 0
@@ -0,0 +1,152 @@
+"""
+Throughput benchmark of the Riot API client against the local replay server.
+
+Runs the same mixed workload (ladder pages, match ids, matches and timelines
+across several routing values) through each client configuration, and reports
+requests/s, p50/p99 latency (including rate-limit waits and retries) and 429 rate.
+
+    python benchmarks/bench_client.py --requests 2000 --concurrency 100
+
+By default the replay server runs in-process; start it separately
+(`python -m ds_riot_api.replay`) and pass `--base-url` so it doesn't share the client's CPU.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import statistics
+import time
+from types import SimpleNamespace
+
+os.environ.setdefault("RIOT_API_KEY", "replay")
+
+from ds_riot_api import get  # noqa: E402
+from ds_riot_api.client import RiotAPIClient  # noqa: E402
+from ds_riot_api.replay import ReplayConfig, ReplayServer  # noqa: E402
+
+
+PLATFORMS = ["euw1", "na1", "kr", "br1"]
+REGIONS = ["europe", "americas", "asia"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark Riot API client configurations.")
+
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per configuration.")
+    parser.add_argument("--concurrency", type=int, default=100, help="Requests in flight at once.")
+    parser.add_argument("--server-rate-limits", default="100:1",
+                        help="Rate limits enforced by the replay server, per routing value.")
+    parser.add_argument("--latency-median-s", type=float, default=0.02, help="Median server latency.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Server 5xx burst probability.")
+    parser.add_argument("--base-url", default=None,
+                        help="Base URL of an already running replay server (stats are then unavailable).")
+    parser.add_argument("--seed", type=int, default=0, help="Workload seed.")
+
+    return parser.parse_args()
+
+
+def configurations(server_rate_limits: str) -> dict:
+    """
+    Client configurations to compare, by name. `None` means a throwaway session per request.
+    """
+    return {
+        "throwaway sessions": None,
+        "shared session, unthrottled": dict(rate_limits="100000:1"),
+        "shared session, server limits": dict(rate_limits=server_rate_limits),
+        "shared session, server limits, 2 conns/host": dict(rate_limits=server_rate_limits, limit_per_host=2),
+    }
+
+
+def workload(n: int, seed: int) -> list[tuple[str, dict]]:
+    rng = random.Random(seed)
+    requests = []
+    for i in range(n):
+        match rng.random():
+            case x if x < 0.5:
+                requests.append(("league_entries", dict(
+                    platform=rng.choice(PLATFORMS), tier="GOLD", division="II", page=rng.randrange(1, 6),
+                )))
+            case x if x < 0.7:
+                requests.append(("player_match_ids", dict(
+                    region=rng.choice(REGIONS), puuid=f"player-{i}", queue=420, type="ranked",
+                    count=20, start_time=0, end_time=86400,
+                )))
+            case x if x < 0.85:
+                requests.append(("match_info", dict(region=rng.choice(REGIONS), match_id=f"BENCH_{i}")))
+            case _:
+                requests.append(("match_timeline", dict(region=rng.choice(REGIONS), match_id=f"BENCH_{i}")))
+    return requests
+
+
+async def run(client: RiotAPIClient | None, requests: list, concurrency: int) -> tuple[float, list[float], int]:
+    context = SimpleNamespace(log=logging.getLogger("bench"))
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    failures = 0
+
+    async def one(endpoint: str, kwargs: dict):
+        nonlocal failures
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                if client is None:
+                    await get.fetch_with_rate_limit(context, endpoint, decode=bytes, **kwargs)
+                else:
+                    await client.fetch(context, endpoint, decode=bytes, **kwargs)
+            except get.RiotAPIError:
+                failures += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one(endpoint, kwargs) for endpoint, kwargs in requests])
+    elapsed = time.perf_counter() - start
+    if client is not None:
+        await client.close()
+    return elapsed, latencies, failures
+
+
+async def main_async(args):
+    server = None
+    if args.base_url is None:
+        server = ReplayServer(ReplayConfig(
+            latency_median_s=args.latency_median_s,
+            rate_limits=args.server_rate_limits,
+            error_rate=args.error_rate,
+        ))
+        get.BASE_URL = await server.start()
+    else:
+        get.BASE_URL = args.base_url
+
+    requests = workload(args.requests, args.seed)
+    print(f"{'configuration':<45} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'429 %':>7} {'failed':>7}")
+    try:
+        for name, options in configurations(args.server_rate_limits).items():
+            if server is not None:
+                server.reset()
+            client = None if options is None else RiotAPIClient(**options)
+            elapsed, latencies, failures = await run(client, requests, args.concurrency)
+
+            quantiles = statistics.quantiles(latencies, n=100)
+            rate_limited = (
+                f"{100 * server.stats['rate_limited'] / server.stats['requests']:.1f}"
+                if server is not None else "-"
+            )
+            print(
+                f"{name:<45} {len(requests) / elapsed:>8.1f} {1000 * quantiles[49]:>8.1f} "
+                f"{1000 * quantiles[98]:>8.1f} {rate_limited:>7} {failures:>7}"
+            )
+            # Let the server's windows drain before the next configuration
+            await asyncio.sleep(1)
+    finally:
+        if server is not None:
+            await server.close()
+
+
+def main():
+    logging.basicConfig(level=logging.ERROR)
+    asyncio.run(main_async(parse_args()))
+
+
+if __name__ == "__main__":
+    main()
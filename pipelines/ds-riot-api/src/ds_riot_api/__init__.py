@@ -1,4 +1,7 @@
+from .client import RiotAPIClient
 from .constants import SERVERS, TIERS, DIVISIONS
 from .player_rank import *
+from .player_rank_history import *
+from .daily_ladder import *
 from .player_matches import *
 from .schemata import SCHEMATA
\ No newline at end of file
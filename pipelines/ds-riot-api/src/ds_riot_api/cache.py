@@ -0,0 +1,94 @@
+"""
+Response cache for idempotent Riot API endpoints.
+
+Bodies are cached as raw bytes keyed by request URL, so cached hits go through the same
+decoder as fresh responses. Two layers:
+- An in-memory LRU, shared by every request in the step;
+- An optional on-disk directory, so retried runs (new processes) don't refetch.
+
+Only endpoints listed in CACHE_TTLS are cached. Paginated ladder pages
+(`league_entries`) are deliberately left out: players move between pages
+while a run is in progress, so mixing pages fetched at different times would
+duplicate or drop players. So are match bodies (`match_info`, `match_timeline`):
+they are stored in S3 and deduplicated through the match index, so a cache
+would save no requests, and their multi-MB bodies would pile up in both layers.
+"""
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+
+# Seconds a cached response stays valid, per endpoint
+CACHE_TTLS = {
+    'league_entries_elite': 60 * 60,             # Ladder snapshot; refreshed hourly
+    'player_riot_account': 24 * 60 * 60,         # Game names change rarely
+}
+
+
+class ResponseCache:
+    """
+    Two-level (memory, then disk) cache of raw response bodies.
+    """
+
+    def __init__(self, directory: str | None = None, max_entries: int = 256):
+        self.directory = Path(directory) if directory else None
+        self.max_entries = max_entries
+        self._memory: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, url: str) -> Path:
+        return self.directory / hashlib.sha256(url.encode()).hexdigest()
+
+    def _read(self, url: str, ttl: float) -> tuple[float, bytes] | None:
+        path = self._path(url)
+        try:
+            stored_at = path.stat().st_mtime
+            if time.time() - stored_at >= ttl:
+                return None
+            return stored_at, path.read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def _write(self, url: str, body: bytes):
+        path = self._path(url)
+        # Write then rename, so concurrent readers never see a partial body
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_bytes(body)
+        os.replace(tmp, path)
+
+    def _remember(self, url: str, stored_at: float, body: bytes):
+        self._memory[url] = (stored_at, body)
+        self._memory.move_to_end(url)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    async def get(self, url: str, ttl: float) -> bytes | None:
+        """
+        Returns the cached body for `url` if it is younger than `ttl` seconds, else None.
+        """
+        hit = self._memory.get(url)
+        if hit is not None:
+            stored_at, body = hit
+            if time.time() - stored_at < ttl:
+                self._memory.move_to_end(url)
+                return body
+            del self._memory[url]
+
+        if self.directory is None:
+            return None
+
+        hit = await asyncio.to_thread(self._read, url, ttl)
+        if hit is None:
+            return None
+        self._remember(url, *hit)
+        return hit[1]
+
+    async def set(self, url: str, body: bytes):
+        self._remember(url, time.time(), body)
+        if self.directory is not None:
+            await asyncio.to_thread(self._write, url, body)
@@ -0,0 +1,231 @@
+"""
+Riot API HTTP client, as a Dagster resource.
+
+`fetch_with_rate_limit` opens (and closes) a throwaway `aiohttp.ClientSession` when
+the caller doesn't pass one, so every ladder page would pay a fresh TCP + TLS
+handshake. This resource owns a single long-lived session per event loop instead,
+backed by a tuned `TCPConnector`:
+- Keep-alive connections, capped per host (one host per platform/region routing value);
+- Cached DNS lookups;
+- gzip/brotli response compression.
+
+The session is created lazily inside the running loop (aiohttp binds sessions to
+the loop they were created in), and recreated if a later step runs on a new loop.
+Assets should `await riot_api.close()` once they're done fetching.
+
+Idempotent endpoints (see `cache.CACHE_TTLS`) are served from a response cache,
+and concurrent identical requests are coalesced into a single HTTP call,
+so repeated lookups don't spend rate-limit budget.
+
+Requests that do go out wait for a rate-limit token from their routing value's
+scheduler before every attempt, retries included, which serves them by priority
+and deadline (see `scheduler`).
+"""
+import aiohttp
+import asyncio
+import dagster as dg
+import orjson
+import polars as pl
+from pydantic import PrivateAttr
+from typing import Any, Awaitable, Callable
+
+from .cache import CACHE_TTLS, ResponseCache
+from .get import ENDPOINTS, fetch_with_rate_limit
+from .scheduler import ENDPOINT_PRIORITIES, Priority, RateLimitScheduler, parse_rate_limits
+
+
+class RiotAPIClient(dg.ConfigurableResource):
+    """
+    Long-lived aiohttp session shared by every Riot API request in a step.
+    """
+
+    # Connector knobs (overridable where the resource is constructed).
+    # Riot's per-route rate limits are far below what a handful of keep-alive
+    # connections can sustain, so a small pool per host is plenty.
+    limit_per_host: int = 10
+    keepalive_timeout_s: float = 60.0
+    ttl_dns_cache_s: int = 300
+
+    # Response cache. Without a directory, cached bodies only live as long as the process.
+    cache_dir: str | None = None
+    cache_max_entries: int = 256
+
+    # Application rate limits per routing value (platform or region), as "count:seconds,..." (Riot's notation).
+    # Defaults to a development key's limits.
+    rate_limits: str = "20:1,100:120"
+
+    _session: aiohttp.ClientSession | None = PrivateAttr(default=None)
+    _loop: asyncio.AbstractEventLoop | None = PrivateAttr(default=None)
+    _cache: ResponseCache | None = PrivateAttr(default=None)
+    # In-flight cacheable requests, by URL (single-flight)
+    _inflight: dict[str, asyncio.Future] = PrivateAttr(default_factory=dict)
+    _schedulers: dict[str, RateLimitScheduler] = PrivateAttr(default_factory=dict)
+
+    def session(self) -> aiohttp.ClientSession:
+        """
+        Returns the session bound to the running event loop, creating it on first use.
+        Must be called from within a coroutine.
+        """
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit_per_host=self.limit_per_host,
+                    keepalive_timeout=self.keepalive_timeout_s,
+                    ttl_dns_cache=self.ttl_dns_cache_s,
+                    use_dns_cache=True,
+                ),
+                # Brotli decoding requires the `Brotli` package (a dependency).
+                headers={"Accept-Encoding": "gzip, deflate, br"},
+            )
+            self._loop = loop
+            # Futures are bound to their loop too
+            self._inflight = {}
+            self._schedulers = {}
+        return self._session
+
+    def scheduler(self, routing: str) -> RateLimitScheduler:
+        """
+        Returns the scheduler for a routing value (platform or region).
+
+        Keyed by routing value rather than by URL host,
+        so limits hold even when every route is served from one host (e.g. `replay`).
+        """
+        if routing not in self._schedulers:
+            self._schedulers[routing] = RateLimitScheduler(parse_rate_limits(self.rate_limits))
+        return self._schedulers[routing]
+
+    def metrics(self) -> dict[str, dict]:
+        """
+        Scheduler metrics (requests, queue depth, wait times) per routing value.
+        """
+        return {routing: scheduler.metrics() for routing, scheduler in self._schedulers.items()}
+
+    def cache(self) -> ResponseCache:
+        if self._cache is None:
+            self._cache = ResponseCache(self.cache_dir, self.cache_max_entries)
+        return self._cache
+
+    async def fetch(
+        self,
+        context: dg.AssetExecutionContext,
+        endpoint: str,
+        decode: Callable[[bytes], Any] = orjson.loads,
+        priority: Priority | None = None,
+        deadline: float | None = None,
+        **kwargs
+    ) -> Any:
+        """
+        Fetches `endpoint` over the shared session.
+        Same semantics (retries, errors) as `fetch_with_rate_limit`.
+
+        Cacheable endpoints are looked up in the response cache first; on a miss,
+        concurrent callers asking for the same URL share a single request.
+
+        `priority` defaults to the endpoint's (see `scheduler.ENDPOINT_PRIORITIES`);
+        `deadline` is an optional epoch timestamp by which the request should go out.
+        """
+        url = ENDPOINTS[endpoint](**kwargs)
+        routing = kwargs.get("platform") or kwargs["region"]
+        if priority is None:
+            priority = ENDPOINT_PRIORITIES.get(endpoint, max(Priority))
+
+        ttl = CACHE_TTLS.get(endpoint)
+        if ttl is None:
+            return await fetch_with_rate_limit(
+                context,
+                endpoint,
+                session=self.session(),
+                decode=decode,
+                acquire=self._acquire(routing, priority, deadline),
+                **kwargs
+            )
+
+        body = await self.cache().get(url, ttl)
+        if body is None:
+            body = await self._fetch_once(context, endpoint, url, routing, priority, deadline, **kwargs)
+        return decode(body)
+
+    def _acquire(self, routing: str, priority: Priority, deadline: float | None) -> Callable[[], Awaitable[None]]:
+        """
+        Hook taking a token from the routing value's scheduler before every attempt,
+        so retries wait their turn like any other request.
+        """
+        scheduler = self.scheduler(routing)
+        return lambda: scheduler.acquire(priority, deadline)
+
+    async def _fetch_once(
+        self,
+        context: dg.AssetExecutionContext,
+        endpoint: str,
+        url: str,
+        routing: str,
+        priority: Priority,
+        deadline: float | None,
+        **kwargs
+    ) -> bytes:
+        """
+        Fetches the raw body of `url` and caches it, joining the in-flight request if any.
+        """
+        session = self.session()
+        future = self._inflight.get(url)
+        if future is None:
+            async def fetch_and_store() -> bytes:
+                body = await fetch_with_rate_limit(
+                    context,
+                    endpoint,
+                    session=session,
+                    decode=bytes,
+                    acquire=self._acquire(routing, priority, deadline),
+                    **kwargs
+                )
+                await self.cache().set(url, body)
+                return body
+
+            future = asyncio.ensure_future(fetch_and_store())
+            self._inflight[url] = future
+            future.add_done_callback(
+                lambda done: self._inflight.pop(url) if self._inflight.get(url) is done else None
+            )
+        # A cancelled caller must not cancel the request other callers are waiting on
+        return await asyncio.shield(future)
+
+    async def fetch_bytes(
+        self,
+        context: dg.AssetExecutionContext,
+        endpoint: str,
+        **kwargs
+    ) -> bytes:
+        """
+        Fetches `endpoint` and returns the undecoded response body,
+        e.g. to store raw payloads without ever parsing them.
+        """
+        return await self.fetch(context, endpoint, decode=bytes, **kwargs)
+
+    async def fetch_dataframe(
+        self,
+        context: dg.AssetExecutionContext,
+        endpoint: str,
+        schema: dict[str, pl.DataType] | None = None,
+        **kwargs
+    ) -> pl.DataFrame:
+        """
+        Fetches `endpoint` and decodes the JSON body straight into a Polars DataFrame,
+        without materializing intermediate Python dicts.
+
+        With a `schema`, the decoder skips type inference and drops unlisted fields,
+        so pages always come back with the same columns (even when empty).
+        """
+        return await self.fetch(
+            context,
+            endpoint,
+            decode=lambda body: pl.read_json(body, schema=schema),
+            **kwargs
+        )
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._loop = None
+        self._inflight = {}
@@ -0,0 +1,157 @@
+"""
+Single-run executor for the full daily ladder (every server), raw through clean.
+
+The per-partition path (`schedule_riot_api_player_rank` → one raw run per server →
+`sensor_riot_api_league_entries_to_player_rank` → one clean run per server) pays
+run launch and scheduling overhead 30 times a day, and servers end up queued behind
+each other. This job instead:
+- Fetches all servers concurrently in one process, grouped by region
+  (ladder endpoints are platform-routed, so each server draws on its own
+  rate-limit budget in the client's scheduler);
+- Streams each server into a single clean writer as soon as its raw objects are stored,
+  batching several servers per catalog commit.
+
+Materializations are reported for the same (day, server) partitions as the assets,
+so the two paths are interchangeable. Its schedule is stopped by default:
+turn it on in place of `schedule_riot_api_player_rank` to switch over.
+"""
+import asyncio
+import dagster as dg
+from datetime import datetime, timezone
+from ds_storage import StorageS3, StorageIceberg
+import polars as pl
+from .client import RiotAPIClient
+from .constants import REGION_PER_SERVER, REGIONS, SERVERS
+from .player_rank import CLEAN_TABLE_NAME, build_player_rank, store_league_entries
+
+
+# Servers of the same region fetched at once
+MAX_CONCURRENT_SERVERS_PER_REGION = 3
+# Rows accumulated before committing to the catalog (one server's ladder is ~100k-500k)
+CLEAN_BATCH_ROWS = 1_000_000
+
+
+def _partition_key(day, server: str) -> dg.MultiPartitionKey:
+    return dg.MultiPartitionKey({"day": str(day), "server": server})
+
+
+# No "catalog_clean" concurrency tag: it would be held for the whole (hours-long) fetch.
+# Catalog commit conflicts are retried by `StorageIceberg.write_table` instead.
+@dg.op
+async def op_riot_api_daily_ladder(
+    context: dg.OpExecutionContext,
+    riot_api: RiotAPIClient,
+    riot_api_bucket: StorageS3,
+    catalog_clean: StorageIceberg,
+):
+    """
+    Fetches today's ladder for every server, and cleans it into `fact_player_rank`.
+    """
+    # Like the raw asset, only the current day can be fetched
+    day = datetime.now(timezone.utc).date()
+    region_semaphores = {region: asyncio.Semaphore(MAX_CONCURRENT_SERVERS_PER_REGION) for region in REGIONS}
+    # Servers whose raw objects are stored (None for failures)
+    finished: asyncio.Queue[str | None] = asyncio.Queue()
+
+    async def fetch_server(server: str):
+        try:
+            async with region_semaphores[REGION_PER_SERVER[server]]:
+                ranks_processed, player_count = await store_league_entries(
+                    context, riot_api, riot_api_bucket, day, server
+                )
+            context.log_event(dg.AssetMaterialization(
+                asset_key="raw_riot_api_league_entries",
+                partition=_partition_key(day, server),
+                metadata={
+                    "ranks_processed": dg.MetadataValue.json(ranks_processed),
+                    "player_count": dg.MetadataValue.int(player_count),
+                },
+            ))
+            await finished.put(server)
+        except BaseException:
+            await finished.put(None)
+            raise
+
+    async def write_clean():
+        batch: list[pl.DataFrame] = []
+        batch_servers: list[str] = []
+        errors: list[Exception] = []
+
+        async def flush():
+            if not batch_servers:
+                return
+            df = pl.concat(batch, how="diagonal_relaxed") if batch else pl.DataFrame()
+            if len(df):
+                # The catalog takes one writer at a time: a single commit per batch
+                await asyncio.to_thread(
+                    catalog_clean.write_dataframe_to_table,
+                    table_name=CLEAN_TABLE_NAME,
+                    df=df,
+                    mode='upsert',
+                )
+            context.log.info(f"Committed {len(df)} rows for {batch_servers}.")
+            for server in batch_servers:
+                context.log_event(dg.AssetMaterialization(
+                    asset_key="clean_riot_api_player_rank",
+                    partition=_partition_key(day, server),
+                ))
+            batch.clear()
+            batch_servers.clear()
+
+        for _ in SERVERS:
+            server = await finished.get()
+            if server is None:
+                continue
+
+            try:
+                df_clean, _processed_records = await asyncio.to_thread(
+                    build_player_rank, context, riot_api_bucket, catalog_clean, day, server
+                )
+            except Exception as exc:
+                # Keep writing the other servers
+                errors.append(exc)
+                continue
+            batch.append(df_clean)
+            batch_servers.append(server)
+
+            if sum(len(df) for df in batch) >= CLEAN_BATCH_ROWS:
+                await flush()
+
+        await flush()
+        if errors:
+            raise errors[0]
+
+    try:
+        results = await asyncio.gather(
+            write_clean(),
+            *[fetch_server(server) for server in SERVERS],
+            return_exceptions=True,
+        )
+    finally:
+        await riot_api.close()
+
+    context.add_output_metadata({
+        "riot_api_scheduler": dg.MetadataValue.json(riot_api.metrics()),
+    })
+
+    # Surface failures only once every other server has been written
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+
+
+@dg.job(
+    name="job_riot_api_daily_ladder",
+)
+def job_riot_api_daily_ladder():
+    op_riot_api_daily_ladder()
+
+
+@dg.schedule(
+    job=job_riot_api_daily_ladder,
+    cron_schedule="0 1 * * *",
+    default_status=dg.DefaultScheduleStatus.STOPPED,
+)
+def schedule_riot_api_daily_ladder(context):
+    today = context.scheduled_execution_time.date()
+    return dg.RunRequest(run_key=str(today))
@@ -1,11 +1,16 @@
 import aiohttp
 import asyncio
 import dagster as dg
+import orjson
+import os
 import random
+from typing import Any, Awaitable, Callable
 
 
-BASE_URL_REGION = lambda region: f"https://{region}.api.riotgames.com"
-BASE_URL_PLATFORM = lambda platform: f"https://{platform}.api.riotgames.com"
+# Overridable to point the client at a local server (see `replay`)
+BASE_URL = os.environ.get("RIOT_API_BASE_URL", "https://{routing}.api.riotgames.com")
+BASE_URL_REGION = lambda region: BASE_URL.format(routing=region)
+BASE_URL_PLATFORM = lambda platform: BASE_URL.format(routing=platform)
 ENDPOINTS = {
     'players': lambda platform:
         f"{BASE_URL_PLATFORM(platform)}/lol/league/v4/challengerleagues/by-queue/RANKED_SOLO_5x5",
@@ -19,10 +24,10 @@ ENDPOINTS = {
     'player_riot_account': lambda region, puuid:
         f"{BASE_URL_REGION(region)}/riot/account/v1/accounts/by-puuid/{puuid}",
 
-    'player_match_ids': lambda region, puuid, queue, type, count, start_time, end_time:
+    'player_match_ids': lambda region, puuid, queue, type, count, start_time, end_time, start=0:
         f"{BASE_URL_REGION(region)}/lol/match/v5/matches/by-puuid/{puuid}/ids"
         f"?startTime={start_time}&endTime={end_time}"
-        f"&start=0&queue={queue}&type={type}&count={count}",
+        f"&start={start}&queue={queue}&type={type}&count={count}",
 
     'match_info': lambda region, match_id:
         f"{BASE_URL_REGION(region)}/lol/match/v5/matches/{match_id}",
@@ -63,14 +68,24 @@ async def fetch_with_rate_limit(
     context: dg.AssetExecutionContext,
     endpoint: str,
     session: aiohttp.ClientSession = None,
+    decode: Callable[[bytes], Any] = orjson.loads,
+    acquire: Callable[[], Awaitable[None]] | None = None,
     **kwargs
-) -> dict:
+) -> Any:
     """
     Fetches data from the Riot API.
 
+    The response body is passed to `decode` as raw bytes. It defaults to orjson,
+    which parses large payloads (e.g. timelines) several times faster than the stdlib;
+    pass a different decoder to skip the Python object graph entirely
+    (e.g. straight into Polars, or `bytes` to keep the body as-is).
+
     Retries on rate limits (429), transient 5xx responses, and connection-level failures
     (DNS errors, dropped/refused connections, timeouts) with exponential backoff.
     Non-retryable HTTP errors and exhausted retries raise RiotAPIError.
+
+    `acquire`, if given, is awaited before every attempt (retries included),
+    e.g. to wait for a rate-limit token.
     """
     assert RIOT_API_KEY, "RIOT_API_KEY environment variable is not set"
 
@@ -82,6 +97,8 @@ async def fetch_with_rate_limit(
     try:
         url = ENDPOINTS[endpoint](**kwargs)
         for attempt in range(1, MAX_ATTEMPTS + 1):
+            if acquire is not None:
+                await acquire()
             try:
                 async with session.get(
                     url,
@@ -89,7 +106,7 @@ async def fetch_with_rate_limit(
                     timeout=REQUEST_TIMEOUT,
                 ) as response:
                     if response.status == 200:
-                        return await response.json()
+                        return decode(await response.read())
 
                     if response.status == 429:
                         retry_after = int(
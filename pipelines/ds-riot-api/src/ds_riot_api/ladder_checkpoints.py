@@ -0,0 +1,129 @@
+"""
+In-page checkpoints for ladder walks.
+
+A (tier, division) of a large server spans hundreds of pages, and its raw object
+is only written once the last page is fetched. So that an interrupted walk resumes
+where it stopped instead of at page 1, pages are flushed every CHECKPOINT_PAGES
+as parquet shards, next to a small manifest listing them:
+
+    league_entries_checkpoints/year=/month=/server=/tier=/division=/
+        <day>-pages-0001-0020.parquet
+        <day>-pages-0021-0040.parquet
+        <day>-manifest.json          [{"object_name": ..., "first_page": 1, "last_page": 20}, ...]
+
+Shards are written before the manifest that references them, so the manifest
+never lists a missing shard (an orphaned shard is simply refetched).
+Once the walk completes, the shards are compacted into the regular raw object
+and deleted.
+"""
+from ds_storage import StorageS3
+import polars as pl
+import re
+
+
+CHECKPOINT_TABLE_NAME = "league_entries_checkpoints"
+# Pages per shard: ~4k entries, or about 20s of a development key's budget
+CHECKPOINT_PAGES = 20
+
+
+def _partition(day, server: str, tier: str, division: str) -> dict:
+    return {"year": day.year, "month": day.month, "server": server, "tier": tier, "division": division}
+
+
+def load_manifest(
+    riot_api_bucket: StorageS3,
+    day,
+    server: str,
+    tier: str,
+    division: str,
+) -> list[dict]:
+    """
+    Returns the shards already written for the day's walk of a rank (empty if none).
+    """
+    partition = _partition(day, server, tier, division)
+    if not riot_api_bucket.list_objects(
+        CHECKPOINT_TABLE_NAME, object_name=f"{day}-manifest", file_extension='json', **partition
+    ):
+        return []
+    return riot_api_bucket.get_object_as_json(CHECKPOINT_TABLE_NAME, f"{day}-manifest", **partition)
+
+
+def write_shard(
+    riot_api_bucket: StorageS3,
+    manifest: list[dict],
+    df: pl.DataFrame,
+    day,
+    server: str,
+    tier: str,
+    division: str,
+    first_page: int,
+    last_page: int,
+):
+    """
+    Stores pages `first_page`..`last_page` as a shard, then records it in the manifest.
+    """
+    partition = _partition(day, server, tier, division)
+    object_name = f"{day}-pages-{first_page:04d}-{last_page:04d}"
+    riot_api_bucket.upload(
+        df,
+        table_name=CHECKPOINT_TABLE_NAME,
+        object_name=object_name,
+        file_extension='parquet',
+        **partition,
+    )
+    manifest.append({"object_name": object_name, "first_page": first_page, "last_page": last_page})
+    riot_api_bucket.upload(
+        manifest,
+        table_name=CHECKPOINT_TABLE_NAME,
+        object_name=f"{day}-manifest",
+        file_extension='json',
+        **partition,
+    )
+
+
+def read_shards(
+    riot_api_bucket: StorageS3,
+    manifest: list[dict],
+    day,
+    server: str,
+    tier: str,
+    division: str,
+) -> list[pl.DataFrame]:
+    partition = _partition(day, server, tier, division)
+    return [
+        riot_api_bucket.get_object_as_dataframe(
+            CHECKPOINT_TABLE_NAME, shard["object_name"], file_extension='parquet', **partition
+        )
+        for shard in manifest
+    ]
+
+
+def delete_checkpoints(
+    riot_api_bucket: StorageS3,
+    day,
+    server: str,
+    combinations: set[tuple[str, str]] | None = None,
+):
+    """
+    Deletes the day's shards and manifests for `server`,
+    restricted to the given (tier, division) combinations if any.
+    """
+    keys = [
+        key
+        for key in riot_api_bucket.list_objects(
+            CHECKPOINT_TABLE_NAME,
+            object_name=f"{day}-*",
+            file_extension='*',
+            year=day.year,
+            month=day.month,
+            server=server,
+        )
+        if combinations is None
+        or (
+            (tier := re.search(r'tier=([^/]+)', key))
+            and (division := re.search(r'division=([^/]+)', key))
+            and (tier.group(1), division.group(1)) in combinations
+        )
+    ]
+    if keys:
+        riot_api_bucket.delete_objects(keys)
@@ -0,0 +1,242 @@
+"""
+Global index of the match ids already stored in the raw layer, per region.
+
+The same ranked match shows up in the match history of up to ten players,
+across servers of the same region and across days. Each duplicate that slips
+through costs two rate-limited requests (info + timeline), so ingestion
+filters its match ids against this index in bulk before fetching anything.
+
+Each row also holds metadata of the stored match (see INDEX_SCHEMA), read from
+its info at ingestion, so that transforms select the matches they keep (e.g.
+ranked, not remade) with a single query, without opening any raw file.
+Matches indexed by the bootstrap have null metadata.
+
+Layout: one parquet segment per write, sorted by match id, under
+`match_ids_index/region=<region>/` (see `ds_common.match_index`). Segment names
+are unique per write (see `segment_name`), so runs, and retries of a step
+within a run, only ever add segments and never overwrite each other's ids. Once a region
+accumulates MAX_SEGMENTS segments, they're merged into a single one.
+
+A concurrent run may have listed the merged segments and still be reading them,
+so they aren't deleted right away: the compaction records their keys in a
+`compaction-<unix time>-...json` object next to the segments, and readers skip them
+from then on. They're deleted once the record is older than GRACE_PERIOD. A reader
+that still finds one gone lists the segments again, the compacted one included.
+"""
+import dagster as dg
+from datetime import datetime, timedelta, timezone
+from ds_common import MATCH_INDEX_TABLE_NAME
+from ds_storage import StorageS3
+import duckdb
+import orjson
+import polars as pl
+from typing import Callable
+from uuid import uuid4
+
+
+# Shared with the transforms reading the index (see `ds_common.match_index`)
+INDEX_TABLE_NAME = MATCH_INDEX_TABLE_NAME
+MAX_SEGMENTS = 64
+# How long merged segments outlive their compaction: longer than any read of the index
+GRACE_PERIOD = timedelta(hours=6)
+READ_ATTEMPTS = 3
+
+INDEX_SCHEMA = {
+    "match_id": pl.String,
+    "queue_id": pl.Int32,
+    # Remakes: the game ended before 3:30, and isn't worth transforming
+    "early_surrender": pl.Boolean,
+    "yearmonth": pl.String,
+    # Uncompressed sizes of the raw bodies
+    "info_bytes": pl.Int64,
+    "timeline_bytes": pl.Int64,
+}
+
+
+def match_metadata(match_id: str, yearmonth: str, info: bytes, timeline: bytes) -> dict:
+    """
+    Index row of a match, from its raw info and timeline bodies.
+    """
+    match_info = orjson.loads(info)["info"]
+    participants = match_info.get("participants") or [{}]
+    return {
+        "match_id": match_id,
+        "queue_id": match_info.get("queueId"),
+        "early_surrender": participants[0].get("gameEndedInEarlySurrender"),
+        "yearmonth": yearmonth,
+        "info_bytes": len(info),
+        "timeline_bytes": len(timeline),
+    }
+
+
+def segment_name(kind: str, run_id: str) -> str:
+    # Unique per write: a retried step reuses its run id
+    return f"{kind}-{run_id}-{uuid4().hex}"
+
+
+def compaction_name(run_id: str, compacted_at: datetime) -> str:
+    return f"compaction-{int(compacted_at.timestamp())}-{run_id}-{uuid4().hex}"
+
+
+def compaction_time(key: str) -> datetime:
+    return datetime.fromtimestamp(int(key.split('/')[-1].split('-')[1]), tz=timezone.utc)
+
+
+def list_compactions(riot_api_bucket: StorageS3, region: str) -> dict[str, list[str]]:
+    """
+    Returns the keys of the region's compaction records, with the keys of the segments each merged.
+    """
+    return {
+        key: [
+            record["key"]
+            for record in riot_api_bucket.get_object_as_json(
+                INDEX_TABLE_NAME,
+                key.split('/')[-1].removesuffix('.json'),
+                region=region,
+            )
+        ]
+        for key in riot_api_bucket.list_objects(
+            INDEX_TABLE_NAME,
+            object_name='compaction-*',
+            file_extension='json',
+            region=region,
+        )
+    }
+
+
+def list_segments(riot_api_bucket: StorageS3, region: str) -> list[str]:
+    """
+    Returns the keys of the region's segments, except those already merged by a compaction.
+    """
+    # Records first: a compaction recorded after them only adds a segment with duplicate ids
+    merged = {key for keys in list_compactions(riot_api_bucket, region).values() for key in keys}
+    return [
+        key
+        for key in riot_api_bucket.list_objects(
+            INDEX_TABLE_NAME,
+            file_extension='parquet',
+            region=region,
+        )
+        if key not in merged
+    ]
+
+
+def read_segments(riot_api_bucket: StorageS3, keys: list[str]) -> pl.DataFrame:
+    """
+    Returns the rows of the given segments, one per distinct match id.
+    """
+    if not keys:
+        return pl.DataFrame(schema=INDEX_SCHEMA)
+
+    con = riot_api_bucket.connect()
+    uris = ", ".join(f"'{riot_api_bucket.s3_uri()}/{key}'" for key in keys)
+    # Segments from before the metadata (or from the bootstrap) only have match ids
+    df = con.sql(f"SELECT * FROM read_parquet([{uris}], union_by_name = true)").pl()
+    return (
+        df.select(
+            (pl.col(name) if name in df.columns else pl.lit(None)).cast(dtype).alias(name)
+            for name, dtype in INDEX_SCHEMA.items()
+        )
+        # Keep the row with metadata, if any
+        .sort("match_id", "queue_id", nulls_last=True)
+        .unique("match_id", keep="first", maintain_order=True)
+    )
+
+
+def write_segment(
+    riot_api_bucket: StorageS3,
+    region: str,
+    segment_name: str,
+    df_index: pl.DataFrame,
+) -> bool:
+    """
+    Writes the rows of `df_index` as a new segment of the region's index.
+    Returns False (no-op) when there is nothing to write.
+    """
+    return riot_api_bucket.upload(
+        df_index.unique("match_id").sort("match_id"),
+        table_name=INDEX_TABLE_NAME,
+        object_name=segment_name,
+        file_extension='parquet',
+        region=region,
+    )
+
+
+def load_match_index(
+    context: dg.AssetExecutionContext,
+    riot_api_bucket: StorageS3,
+    region: str,
+    bootstrap: Callable[[], set[str]],
+) -> pl.Series:
+    """
+    Returns every match id indexed for `region`.
+
+    The first time a region is read, the index is seeded with `bootstrap()`
+    (the ids found by listing the raw tables), so matches stored before
+    the index existed aren't refetched.
+    """
+    for attempt in range(1, READ_ATTEMPTS + 1):
+        keys = list_segments(riot_api_bucket, region)
+        if not keys:
+            context.log.info(f"No match index for {region} yet; building it from the raw tables.")
+            match_ids = pl.Series("match_id", sorted(bootstrap()), dtype=pl.String)
+            write_segment(riot_api_bucket, region, segment_name("bootstrap", context.run_id), match_ids.to_frame())
+            return match_ids
+        try:
+            df_index = read_segments(riot_api_bucket, keys)
+            break
+        except duckdb.IOException:
+            # A segment was deleted since it was listed: its ids are in a newer compacted segment
+            if attempt == READ_ATTEMPTS:
+                raise
+            context.log.warning(f"A match index segment of {region} was deleted while reading it; listing them again.")
+
+    if len(keys) >= MAX_SEGMENTS:
+        # Only the segments read above are merged, so ids added concurrently survive
+        context.log.info(f"Compacting {len(keys)} match index segments for {region}.")
+        if write_segment(riot_api_bucket, region, segment_name("compacted", context.run_id), df_index):
+            riot_api_bucket.upload(
+                [{"key": key} for key in keys],
+                table_name=INDEX_TABLE_NAME,
+                object_name=compaction_name(context.run_id, datetime.now(timezone.utc)),
+                file_extension='json',
+                region=region,
+            )
+
+    delete_merged_segments(context, riot_api_bucket, region)
+    return df_index["match_id"]
+
+
+def delete_merged_segments(
+    context: dg.AssetExecutionContext,
+    riot_api_bucket: StorageS3,
+    region: str,
+):
+    """
+    Deletes the segments merged by compactions older than GRACE_PERIOD, then their records.
+    """
+    expired_before = datetime.now(timezone.utc) - GRACE_PERIOD
+    for record_key, keys in list_compactions(riot_api_bucket, region).items():
+        if compaction_time(record_key) < expired_before:
+            context.log.info(f"Deleting {len(keys)} match index segments of {region} merged since {compaction_time(record_key)}.")
+            # The record last, so that an interrupted deletion is resumed by the next run
+            riot_api_bucket.delete_objects([*keys, record_key])
+
+
+def add_to_match_index(
+    context: dg.AssetExecutionContext,
+    riot_api_bucket: StorageS3,
+    region: str,
+    rows: list[dict],
+):
+    """
+    Records newly stored matches in the region's index, as a new segment.
+    `rows` are the matches' `match_metadata`.
+    """
+    if write_segment(
+        riot_api_bucket,
+        region,
+        segment_name("run", context.run_id),
+        pl.DataFrame(rows, schema=INDEX_SCHEMA),
+    ):
+        context.log.info(f"Indexed {len(rows)} new matches for {region}.")
@@ -1,74 +1,278 @@
+import asyncio
 import dagster as dg
-from .get import *
-from .constants import REGION_PER_SERVER, SERVERS
+from datetime import datetime, timedelta, timezone
+from ds_common import MATCH_FILE_EXTENSION, MATCH_INFO_TABLE_NAME, MATCH_TIMELINE_TABLE_NAME, raw_match_partition_columns
 from ds_storage import StorageS3
+import polars as pl
+from .client import RiotAPIClient
+from .constants import ELITE_TIERS, REGION_PER_SERVER
+from .match_index import add_to_match_index, load_match_index, match_metadata
+from .player_rank import RAW_TABLE_NAME as LEAGUE_ENTRIES_TABLE_NAME
+from .player_rank import parse_partition, partition_per_day_per_server, partition_per_server
 
 
-# Define partitions
-partition_per_day = dg.DailyPartitionsDefinition(start_date="2025-01-01")
-partition_per_server = dg.StaticPartitionsDefinition(SERVERS)
-partition_per_day_per_server = dg.MultiPartitionsDefinition({
-    "day": partition_per_day,
-    "server": partition_per_server
-})
+MATCH_IDS_TABLE_NAME = "player_match_ids"
+
+RANKED_SOLO_QUEUE = 420
+MATCH_IDS_PER_REQUEST = 100  # Riot's maximum `count`
+# Players whose match history is crawled.
+# Crawling the whole ladder every day would far exceed the API key's rate limits.
+MATCH_TIERS = ELITE_TIERS
+# Requests in flight at once. Riot's rate limits are enforced by the client's
+# scheduler; this only bounds how many requests wait on it at once.
+MAX_CONCURRENT_REQUESTS = 20
+
+
+def get_tags_for_match_partition(partition_key: str):
+    # Split the multi-partition string "YYYY-MM-DD|server"
+    _day, server = partition_key.split("|")
+    return {
+        # Match endpoints are rate limited per region
+        "concurrency_group": f"riot_api_player_matches_region={REGION_PER_SERVER[server]}"
+    }
+
+
+def load_puuids(
+    riot_api_bucket: StorageS3,
+    day,
+    server: str,
+) -> list[str]:
+    """
+    Returns the distinct puuids in the day's raw league entries, for the tiers in MATCH_TIERS.
+    """
+    partition = {"year": day.year, "month": day.month, "server": server}
+    if not riot_api_bucket.list_objects(LEAGUE_ENTRIES_TABLE_NAME, object_name=day, **partition):
+        return []
+
+    con = riot_api_bucket.connect()
+    uri = riot_api_bucket.s3_uri(LEAGUE_ENTRIES_TABLE_NAME, **partition)
+    tiers = ", ".join(f"'{tier}'" for tier in MATCH_TIERS)
+    df = con.sql(f"""
+        SELECT DISTINCT puuid
+        FROM read_parquet('{uri}/tier=*/division=*/{day}.parquet')
+        WHERE tier IN ({tiers})
+    """).pl()
+    return df["puuid"].to_list()
+
+
+def existing_match_ids(
+    riot_api_bucket: StorageS3,
+    region: str,
+) -> set[str]:
+    """
+    Returns the ids of matches whose info and timeline are both already stored.
+
+    Lists every yearmonth of the region, so it's only used to seed the match index.
+    """
+    def list_ids(table_name: str) -> set[str]:
+        return {
+            key.split('/')[-1].removesuffix(f".{MATCH_FILE_EXTENSION}")
+            for key in riot_api_bucket.list_objects(
+                table_name,
+                file_extension=MATCH_FILE_EXTENSION,
+                region=region,
+            )
+        }
+
+    return list_ids(MATCH_INFO_TABLE_NAME) & list_ids(MATCH_TIMELINE_TABLE_NAME)
+
+
+async def fetch_match_ids(
+    context: dg.AssetExecutionContext,
+    riot_api: RiotAPIClient,
+    semaphore: asyncio.Semaphore,
+    region: str,
+    puuid: str,
+    start: datetime,
+    end: datetime,
+) -> list[str]:
+    """
+    Returns the ids of the ranked matches `puuid` played between `start` and `end`,
+    page by page until a page comes back short.
+    """
+    match_ids = []
+    while True:
+        async with semaphore:
+            page = await riot_api.fetch(
+                context,
+                'player_match_ids',
+                region=region,
+                puuid=puuid,
+                queue=RANKED_SOLO_QUEUE,
+                type='ranked',
+                count=MATCH_IDS_PER_REQUEST,
+                start=len(match_ids),
+                start_time=int(start.timestamp()),
+                end_time=int(end.timestamp()),
+            )
+        match_ids.extend(page)
+        if len(page) < MATCH_IDS_PER_REQUEST:
+            return match_ids
+
+
+async def fetch_and_store_match(
+    context: dg.AssetExecutionContext,
+    riot_api: RiotAPIClient,
+    riot_api_bucket: StorageS3,
+    semaphore: asyncio.Semaphore,
+    region: str,
+    yearmonth: str,
+    match_id: str,
+) -> dict:
+    """
+    Fetches a match's info and timeline, and stores both undecoded (gzipped) in S3.
+    Returns the match's row of the match index.
+    """
+    async with semaphore:
+        info, timeline = await asyncio.gather(
+            riot_api.fetch_bytes(context, 'match_info', region=region, match_id=match_id),
+            riot_api.fetch_bytes(context, 'match_timeline', region=region, match_id=match_id),
+        )
+
+    # Timeline first: a match only counts as stored once its info exists too
+    for table_name, body in ((MATCH_TIMELINE_TABLE_NAME, timeline), (MATCH_INFO_TABLE_NAME, info)):
+        await asyncio.to_thread(
+            riot_api_bucket.upload,
+            body,
+            table_name=table_name,
+            object_name=match_id,
+            file_extension=MATCH_FILE_EXTENSION,
+            # The layout the transforms read (see `ds_common.raw_matches`)
+            **raw_match_partition_columns(region, yearmonth),
+        )
+    return match_metadata(match_id, yearmonth, info, timeline)
 
 
 @dg.multi_asset(
     specs=[
-        dg.AssetSpec("riot_api_player_match_ids"),
-        dg.AssetSpec("riot_api_match_info"),
-        dg.AssetSpec("riot_api_match_timeline"),
+        dg.AssetSpec("riot_api_player_match_ids", deps=["raw_riot_api_league_entries"]),
+        dg.AssetSpec("riot_api_match_info", deps=["riot_api_player_match_ids"]),
+        dg.AssetSpec("riot_api_match_timeline", deps=["riot_api_player_match_ids"]),
     ],
     group_name="riot_api",
     partitions_def=partition_per_day_per_server,
 )
 async def asset_riot_api_player_matches_per_day_per_server(
     context: dg.AssetExecutionContext,
+    riot_api: RiotAPIClient,
     riot_api_bucket: StorageS3
 ):
     """
-    A partitioned asset that selects player IDs and fetches corresponding match IDs.
+    A partitioned asset that fetches the ranked matches played on a given day and server.
+
+    Process:
+    1. Read the players in the day's league entries (see MATCH_TIERS).
+    2. Fetch the ids of the ranked matches each player played within the day.
+    3. Deduplicate match ids across players (a match has up to ten of them),
+    and skip those already in the region's match index.
+    4. Fetch match info and timeline concurrently,
+    and store the raw responses gzipped, partitioned by region and yearmonth.
+    5. Add the stored matches to the match index, with their queue and remake status.
     """
-    # Get the partition keys for the current run
-    partition_keys: dg.MultiPartitionKey = context.partition_key.keys_by_dimension
-
-    date = partition_keys["day"]
-    server = partition_keys["server"]
-    context.log.info(f"Fetching data for {date} on {server}")
-
-    list_of_match_ids = await fetch_with_rate_limit(
-        'player_match_ids',
-        region=REGION_PER_SERVER.get(server),
-        puuid="QjHAbswPOuBJcq1IlLni4wTR8wbctL3a7XPl7-cGWO-FJkp53zYvLZ21Y7qeV1ybCz2BbeIhVAtQ4A",
-        queue=420,
-        type='ranked',
-        count=100,
-        # filtrar por data!!!
-    )
-    print(list_of_match_ids)
+    day, server = parse_partition(context)
+    region = REGION_PER_SERVER[server]
+    start = datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+    end = start + timedelta(days=1)
+    # Match ids are filtered by start time, so every match belongs to the partition's month
+    yearmonth = day.strftime("%Y%m")
+    context.log.info(f"Fetching matches for {day} on {server}")
+
+    puuids = load_puuids(riot_api_bucket, day, server)
+    context.log.info(f"Found {len(puuids)} players in league entries.")
+
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    try:
+        list_of_match_ids = await asyncio.gather(*[
+            fetch_match_ids(context, riot_api, semaphore, region, puuid, start, end)
+            for puuid in puuids
+        ])
 
-    yield dg.MaterializeResult()
+        df_match_ids = pl.DataFrame(
+            {"puuid": puuids, "match_id": list_of_match_ids},
+            schema={"puuid": pl.String, "match_id": pl.List(pl.String)},
+        ).explode("match_id").drop_nulls()
+
+        riot_api_bucket.upload(
+            df_match_ids,
+            table_name=MATCH_IDS_TABLE_NAME,
+            object_name=day,
+            file_extension='parquet',
+            year=day.year,
+            month=day.month,
+            server=server,
+        )
+
+        match_ids = df_match_ids["match_id"].unique()
+        indexed_match_ids = load_match_index(
+            context,
+            riot_api_bucket,
+            region,
+            bootstrap=lambda: existing_match_ids(riot_api_bucket, region),
+        )
+        missing_match_ids = match_ids.filter(~match_ids.is_in(indexed_match_ids)).sort().to_list()
+        context.log.info(
+            f"Found {len(match_ids)} unique matches; {len(missing_match_ids)} not yet stored."
+        )
+
+        results = await asyncio.gather(*[
+            fetch_and_store_match(
+                context, riot_api, riot_api_bucket, semaphore, region, yearmonth, match_id
+            )
+            for match_id in missing_match_ids
+        ], return_exceptions=True)
+
+        # Index whatever was stored, even if some matches failed
+        add_to_match_index(context, riot_api_bucket, region, [
+            result for result in results if not isinstance(result, BaseException)
+        ])
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+    finally:
+        await riot_api.close()
+
+    yield dg.MaterializeResult(
+        asset_key="riot_api_player_match_ids",
+        metadata={
+            "player_count": dg.MetadataValue.int(len(puuids)),
+            "match_id_count": dg.MetadataValue.int(len(df_match_ids)),
+            "riot_api_scheduler": dg.MetadataValue.json(riot_api.metrics()),
+        }
+    )
+    for asset_key in ("riot_api_match_info", "riot_api_match_timeline"):
+        yield dg.MaterializeResult(
+            asset_key=asset_key,
+            metadata={
+                "matches_fetched": dg.MetadataValue.int(len(missing_match_ids)),
+                "matches_skipped": dg.MetadataValue.int(len(match_ids) - len(missing_match_ids)),
+            }
+        )
 
 
 # Create a job scheduled to run daily
 job_riot_api_player_matches = dg.define_asset_job(
     name="job_riot_api_player_matches",
     selection=[asset_riot_api_player_matches_per_day_per_server],
+    config=dg.PartitionedConfig(
+        partitions_def=partition_per_day_per_server,
+        run_config_for_partition_fn=lambda _: {},
+        tags_for_partition_key_fn=get_tags_for_match_partition
+    ),
 )
 @dg.schedule(
     job=job_riot_api_player_matches,
-    cron_schedule="0 0 * * *",  # Run at 0:00 AM every day
+    cron_schedule="0 3 * * *",  # After the day's league entries (1:00 AM) have landed
 )
 def schedule_riot_api_player_matches(context):
-     # Create a run request for each partition
-    today = context.scheduled_execution_time.date()
+    # Fetch the previous, complete day
+    yesterday = context.scheduled_execution_time.date() - timedelta(days=1)
     return [
         dg.RunRequest(
-            run_key=f"{today}|{server}",
+            run_key=f"{yesterday}|{server}",
             partition_key=dg.MultiPartitionKey({
-                "day": today,
+                "day": str(yesterday),
                 "server": server
             }),
         )
         for server in partition_per_server.get_partition_keys()
-    ]
\ No newline at end of file
+    ]
@@ -0,0 +1,248 @@
+"""
+Change-data-capture (CDC) mode for player ranks.
+
+`fact_player_rank` stores the full ladder every day, although most players'
+LP, wins and losses don't move from one day to the next. This alternative
+keeps each player's rank state once per change instead:
+- `player_rank_state` holds the latest known state per player (one row each);
+- Each day's ladder is diffed against it, and only new or changed players
+  are written to `fact_player_rank_history`, valid from their fetch time;
+- The rows they supersede (and those of players who left the ladder)
+  are closed by setting `valid_to`.
+
+`load_player_rank_as_of` reconstructs the ladder at any point in time.
+
+Days must be processed in order per server: a day older than the latest
+state is skipped. The sensor is stopped by default; turn it on to enable CDC.
+"""
+import dagster as dg
+from datetime import date, datetime, timezone
+from ds_storage import StorageS3, StorageIceberg
+from ds_storage.polars import iceberg_to_polars_schema
+import polars as pl
+from pyiceberg.expressions import And, EqualTo, GreaterThan, IsNull, LessThanOrEqual, Or
+import re
+from typing import Callable
+from .constants import TIERS_AND_DIVISIONS
+from .player_rank import (
+    RAW_TABLE_NAME,
+    parse_partition,
+    partition_per_day_per_server,
+    scan_league_entries,
+    transform_league_entries,
+)
+from .schemata import SCHEMATA
+
+
+HISTORY_TABLE_NAME = "fact_player_rank_history"
+STATE_TABLE_NAME = "player_rank_state"
+
+# A change in any of these starts a new validity interval
+TRACKED_COLUMNS = [
+    "league_id",
+    "tier",
+    "division",
+    "rank",
+    "league_points",
+    "wins",
+    "losses",
+    "fresh_blood",
+    "hot_streak",
+    "inactive",
+    "veteran",
+]
+
+
+def load_player_rank_as_of(
+    catalog_clean: StorageIceberg,
+    as_of: datetime,
+    server: str | None = None,
+) -> pl.DataFrame:
+    """
+    Reconstructs the ladder as it was at `as_of`, from `fact_player_rank_history`.
+    """
+    return catalog_clean.load_table_to_polars(
+        table_name=HISTORY_TABLE_NAME,
+        row_filter=And(
+            LessThanOrEqual("valid_from", as_of),
+            Or(IsNull("valid_to"), GreaterThan("valid_to", as_of))
+        ),
+        server=server,
+    )
+
+
+def diff_player_ranks(
+    df_state: pl.DataFrame,
+    df_ladder: pl.DataFrame,
+) -> tuple[pl.DataFrame, pl.DataFrame, pl.DataFrame]:
+    """
+    Diffs a server's ladder against its latest rank states (one row per player each).
+
+    Returns the new or changed players, the states they supersede or of players
+    who left the ladder (closed at their successor's `valid_from`, or at the ladder's start),
+    and the unchanged states.
+
+    Tracked columns can be null (e.g. `league_id`), and nulls compare equal:
+    otherwise a player with one would count as changed every day.
+    """
+    on = ["puuid", *TRACKED_COLUMNS]
+    ladder_start = df_ladder["valid_from"].min()
+
+    # New players, and players whose state changed
+    df_changed = df_ladder.join(df_state, on=on, how="anti", nulls_equal=True)
+    # States superseded by a change, or of players who left the ladder
+    df_closed = (
+        df_state
+        .join(df_ladder, on=on, how="anti", nulls_equal=True)
+        .join(
+            df_ladder.select("puuid", pl.col("valid_from").alias("valid_to")),
+            on="puuid",
+            how="left",
+        )
+        .with_columns(pl.col("valid_to").fill_null(ladder_start))
+    )
+    df_unchanged = df_state.join(df_ladder, on=on, how="semi", nulls_equal=True)
+    return df_changed, df_closed, df_unchanged
+
+
+def record_player_rank_changes(
+    context: dg.AssetExecutionContext,
+    catalog_clean: StorageIceberg,
+    scan_league_entries: Callable[[], pl.LazyFrame],
+    day: date,
+    server: str,
+) -> dict[str, int] | None:
+    """
+    Diffs the day's complete ladder of a server (its raw league entries, from `scan_league_entries`)
+    against the latest rank states, upserts the changes into the history, and replaces the server's states.
+
+    Returns the counts of players per outcome, or None if the state is already at (or past) this day,
+    in which case the raw league entries aren't scanned.
+    """
+    # Iceberg timestamps are read back without a timezone
+    start = datetime(day.year, day.month, day.day, tzinfo=timezone.utc).replace(tzinfo=None)
+
+    for table_name in (HISTORY_TABLE_NAME, STATE_TABLE_NAME):
+        catalog_clean.create_table_if_not_exists(table_name, SCHEMATA[table_name])
+    state_schema = iceberg_to_polars_schema(SCHEMATA[STATE_TABLE_NAME].schema)
+
+    df_state = catalog_clean.load_table_to_polars(
+        table_name=STATE_TABLE_NAME,
+        server=server,
+    ).cast(state_schema)
+
+    if len(df_state) and df_state["valid_from"].max() >= start:
+        context.log.info(f"State of {server} is already at {df_state['valid_from'].max()}; skipping.")
+        return None
+
+    df_ladder = (
+        scan_league_entries()
+        .pipe(transform_league_entries)
+        .rename({"timestamp": "valid_from"})
+        # Players can show up in two ranks if they moved while the ladder was fetched
+        .sort("valid_from")
+        .unique(subset=["puuid"], keep="last")
+        .select(state_schema.keys())
+        .cast(state_schema)
+        .collect()
+    )
+    df_changed, df_closed, df_unchanged = diff_player_ranks(df_state, df_ladder)
+
+    df_history = pl.concat(
+        [df_closed, df_changed.with_columns(valid_to=pl.lit(None, dtype=pl.Datetime("us")))],
+        how="diagonal",
+    )
+    if len(df_history):
+        catalog_clean.write_dataframe_to_table(
+            table_name=HISTORY_TABLE_NAME,
+            df=df_history,
+            mode='upsert',
+        )
+
+    # Written last: if the history write fails, a retry recomputes the same diff
+    catalog_clean.write_dataframe_to_table(
+        table_name=STATE_TABLE_NAME,
+        df=pl.concat([df_unchanged, df_changed]),
+        mode='overwrite',
+        overwrite_filter=EqualTo("server", server),
+    )
+
+    context.log.info(
+        f"{len(df_ladder)} players: {len(df_changed)} new or changed, "
+        f"{len(df_closed)} intervals closed, {len(df_unchanged)} unchanged."
+    )
+    return {
+        "player_count": len(df_ladder),
+        "changed_count": len(df_changed),
+        "closed_count": len(df_closed),
+        "unchanged_count": len(df_unchanged),
+    }
+
+
+@dg.asset(
+    deps=['raw_riot_api_league_entries'],
+    name="clean_riot_api_player_rank_history",
+    group_name='riot_api',
+    partitions_def=partition_per_day_per_server,
+    tags={"concurrency_group": "catalog_clean"}
+)
+def asset_clean_riot_api_player_rank_history(
+    context: dg.AssetExecutionContext,
+    riot_api_bucket: StorageS3,
+    catalog_clean: StorageIceberg
+):
+    """
+    Diffs the day's ladder of a server against the latest known rank states,
+    and records only the changes.
+
+    Each partition corresponds to a unique combination of day and server.
+
+    Process:
+    1. Skip the partition if the state is already at (or past) this day.
+    2. Check that every rank of the day was fetched: a partial ladder
+    would close the intervals of every player missing from it.
+    3. Scan the day's raw objects as a single frame, keeping each player's latest entry.
+    4. Anti-join against the state to find new/changed players and superseded states.
+    5. Upsert both into the history, then replace the server's state.
+    """
+    day, server = parse_partition(context)
+
+    def scan_complete_ladder() -> pl.LazyFrame:
+        raw_partition = {"year": day.year, "month": day.month, "server": server}
+        existing_combinations = {
+            (tier.group(1), division.group(1))
+            for key in riot_api_bucket.list_objects(RAW_TABLE_NAME, object_name=day, **raw_partition)
+            if (tier := re.search(r'tier=([^/]+)', key)) and (division := re.search(r'division=([^/]+)', key))
+        }
+        missing_combinations = set(TIERS_AND_DIVISIONS) - existing_combinations
+        if missing_combinations:
+            context.log.error(f"Missing combinations: {missing_combinations}")
+            raise ValueError(f"Missing combinations: {missing_combinations}")
+        return scan_league_entries(riot_api_bucket, day, server)
+
+    counts = record_player_rank_changes(context, catalog_clean, scan_complete_ladder, day, server)
+    if counts is None:
+        return dg.MaterializeResult(metadata={"skipped": dg.MetadataValue.bool(True)})
+
+    return dg.MaterializeResult(
+        metadata={name: dg.MetadataValue.int(count) for name, count in counts.items()}
+    )
+
+
+job_clean_riot_api_player_rank_history = dg.define_asset_job(
+    name="job_clean_riot_api_player_rank_history",
+    selection=[
+        asset_clean_riot_api_player_rank_history
+    ],
+)
+
+# Optional: CDC runs alongside (or instead of) the full daily snapshots once turned on
+@dg.asset_sensor(
+    asset_key=dg.AssetKey("raw_riot_api_league_entries"),
+    job=job_clean_riot_api_player_rank_history,
+    default_status=dg.DefaultSensorStatus.STOPPED,
+)
+def sensor_riot_api_league_entries_to_player_rank_history(context, asset_event):
+    return dg.RunRequest(
+        partition_key=asset_event.partition_key,
+    )
@@ -0,0 +1,428 @@
+"""
+Local replay server for the Riot API, to test and benchmark the client without a key.
+
+Serves every endpoint of `get.ENDPOINTS` under `http://{host}:{port}/{routing}/...`
+(point the client at it by setting `RIOT_API_BASE_URL` to `ReplayServer.base_url`),
+and behaves like the real API where it matters for throughput:
+- Per-request latency, drawn from a log-normal distribution;
+- Application rate limits per routing value, with the `X-App-Rate-Limit(-Count)`
+  headers on every response and 429s carrying `Retry-After` once a window is full;
+- Bursts of consecutive 5xx responses.
+
+Bodies are recorded payloads when `fixtures_dir` holds a `{endpoint}.json` file
+(e.g. a real match saved once), and deterministic synthetic payloads otherwise.
+
+Run standalone with `python -m ds_riot_api.replay --port 8080`,
+so the server doesn't share a CPU with the client it measures.
+"""
+import aiohttp.web as web
+import argparse
+import asyncio
+from collections import Counter, deque
+from dataclasses import dataclass
+from functools import lru_cache
+import math
+import orjson
+import os
+import random
+import time
+from .constants import ELITE_TIERS
+from .scheduler import parse_rate_limits
+
+
+@dataclass
+class ReplayConfig:
+    """
+    Behaviour of the replay server.
+
+    `rate_limits` are enforced per routing value, in Riot's "count:seconds,..." notation;
+    an empty string disables them. Each request starts a burst of `error_burst`
+    5xx responses on its routing value with probability `error_rate`.
+    """
+    latency_median_s: float = 0.05
+    latency_sigma: float = 0.5
+    rate_limits: str = "20:1,100:120"
+    error_rate: float = 0.0
+    error_burst: int = 3
+    ladder_pages: int = 5
+    page_size: int = 205
+    match_ids_per_player: int = 20
+    # Distinct matches per region: players share matches, as on the real ladder
+    match_pool: int = 100_000
+    timeline_frames: int = 30
+    fixtures_dir: str | None = None
+    seed: int = 0
+
+
+def _rng(*key) -> random.Random:
+    # Seeded from the request itself, so the same URL always returns the same body
+    return random.Random(":".join(map(str, key)))
+
+
+def _entry(rng: random.Random, puuid: str) -> dict:
+    wins, losses = rng.randrange(10, 500), rng.randrange(10, 500)
+    return {
+        "puuid": puuid,
+        "leaguePoints": rng.randrange(0, 100),
+        "wins": wins,
+        "losses": losses,
+        "veteran": rng.random() < 0.1,
+        "inactive": rng.random() < 0.01,
+        "freshBlood": rng.random() < 0.1,
+        "hotStreak": rng.random() < 0.1,
+    }
+
+
+@lru_cache(maxsize=1024)
+def _league_entries(seed: int, platform: str, tier: str, division: str, page: int, config: tuple) -> bytes:
+    ladder_pages, page_size = config
+    if not 1 <= page <= ladder_pages:
+        return b"[]"
+    rng = _rng(seed, platform, tier, division, page)
+    return orjson.dumps([
+        {
+            **_entry(rng, f"{platform}-{tier}-{division}-{page}-{i}"),
+            "leagueId": f"{platform}-{tier}-{rng.randrange(100)}",
+            "queueType": "RANKED_SOLO_5x5",
+            "tier": tier,
+            "rank": division,
+        }
+        for i in range(page_size)
+    ])
+
+
+@lru_cache(maxsize=256)
+def _league_list(seed: int, platform: str, elite_tier: str, page_size: int) -> bytes:
+    rng = _rng(seed, platform, elite_tier)
+    return orjson.dumps({
+        "leagueId": f"{platform}-{elite_tier}",
+        "queue": "RANKED_SOLO_5x5",
+        "tier": elite_tier,
+        "name": f"{elite_tier.title()} League",
+        "entries": [
+            {**_entry(rng, f"{platform}-{elite_tier}-{i}"), "rank": "I"}
+            for i in range(page_size)
+        ],
+    })
+
+
+def _participants(seed: int, region: str, match_id: str) -> list[str]:
+    rng = _rng(seed, region, match_id, "participants")
+    return [f"{region}-player-{rng.randrange(1_000_000)}" for _ in range(10)]
+
+
+@lru_cache(maxsize=1024)
+def _match_info(seed: int, region: str, match_id: str) -> bytes:
+    rng = _rng(seed, region, match_id)
+    puuids = _participants(seed, region, match_id)
+    return orjson.dumps({
+        "metadata": {"dataVersion": "2", "matchId": match_id, "participants": puuids},
+        "info": {
+            "gameCreation": 1_700_000_000_000 + rng.randrange(10**10),
+            "gameDuration": rng.randrange(900, 2700),
+            "gameMode": "CLASSIC",
+            "gameVersion": "15.1.1",
+            "queueId": 420,
+            "participants": [
+                {
+                    "participantId": participant_id,
+                    "puuid": puuid,
+                    "teamId": 100 if participant_id <= 5 else 200,
+                    "championId": rng.randrange(1, 950),
+                    "kills": rng.randrange(20),
+                    "deaths": rng.randrange(20),
+                    "assists": rng.randrange(30),
+                    "goldEarned": rng.randrange(5_000, 20_000),
+                    "totalMinionsKilled": rng.randrange(300),
+                    "win": participant_id <= 5,
+                }
+                for participant_id, puuid in enumerate(puuids, start=1)
+            ],
+            "teams": [{"teamId": 100, "win": True}, {"teamId": 200, "win": False}],
+        },
+    })
+
+
+@lru_cache(maxsize=256)
+def _match_timeline(seed: int, region: str, match_id: str, frames: int) -> bytes:
+    rng = _rng(seed, region, match_id, "timeline")
+    return orjson.dumps({
+        "metadata": {"dataVersion": "2", "matchId": match_id, "participants": _participants(seed, region, match_id)},
+        "info": {
+            "frameInterval": 60_000,
+            "frames": [
+                {
+                    "timestamp": frame * 60_000,
+                    "participantFrames": {
+                        str(participant_id): {
+                            "participantId": participant_id,
+                            "level": min(18, 1 + frame // 2),
+                            "currentGold": rng.randrange(3_000),
+                            "totalGold": 500 + frame * rng.randrange(300, 500),
+                            "xp": frame * rng.randrange(300, 600),
+                            "minionsKilled": frame * rng.randrange(4, 9),
+                            "position": {"x": rng.randrange(15_000), "y": rng.randrange(15_000)},
+                        }
+                        for participant_id in range(1, 11)
+                    },
+                    "events": [
+                        {
+                            "type": rng.choice(["ITEM_PURCHASED", "WARD_PLACED", "SKILL_LEVEL_UP", "CHAMPION_KILL"]),
+                            "timestamp": frame * 60_000 + rng.randrange(60_000),
+                            "participantId": rng.randrange(1, 11),
+                        }
+                        for _ in range(rng.randrange(5, 30))
+                    ],
+                }
+                for frame in range(frames)
+            ],
+        },
+    })
+
+
+class ReplayServer:
+    """
+    aiohttp server replaying the Riot API; use as an async context manager.
+    `stats` counts responses by kind ("ok", "rate_limited", "server_error", ...).
+    """
+
+    def __init__(self, config: ReplayConfig | None = None):
+        self.config = config or ReplayConfig()
+        self.rate_limits = parse_rate_limits(self.config.rate_limits) if self.config.rate_limits else []
+        self.stats = Counter()
+        self.base_url = None
+        self._runner = None
+        self._rng = random.Random(self.config.seed)
+        # Per routing value: one deque of request timestamps per rate-limit window
+        self._windows: dict[str, list[deque]] = {}
+        self._bursts: Counter = Counter()
+        self._fixtures: dict[str, bytes] = {}
+
+        if self.config.fixtures_dir:
+            for filename in os.listdir(self.config.fixtures_dir):
+                endpoint, extension = os.path.splitext(filename)
+                if extension == ".json":
+                    with open(os.path.join(self.config.fixtures_dir, filename), "rb") as f:
+                        self._fixtures[endpoint] = f.read()
+
+        self.app = web.Application(middlewares=[self._middleware])
+        self.app.router.add_routes([
+            web.get(
+                "/{platform}/lol/league/v4/entries/{queue}/{tier}/{division}",
+                self._handle("league_entries", self._league_entries),
+            ),
+            web.get(
+                "/{platform}/lol/league/v4/{elite_tier:[a-z]+}leagues/by-queue/{queue}",
+                self._handle("league_entries_elite", self._league_list),
+            ),
+            web.get(
+                "/{region}/riot/account/v1/accounts/by-puuid/{puuid}",
+                self._handle("player_riot_account", self._account),
+            ),
+            web.get(
+                "/{region}/lol/match/v5/matches/by-puuid/{puuid}/ids",
+                self._handle("player_match_ids", self._match_ids),
+            ),
+            web.get(
+                "/{region}/lol/match/v5/matches/{match_id}/timeline",
+                self._handle("match_timeline", self._match_timeline),
+            ),
+            web.get(
+                "/{region}/lol/match/v5/matches/{match_id}",
+                self._handle("match_info", self._match_info),
+            ),
+        ])
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """
+        Starts serving (on a free port by default) and returns the base URL template.
+        """
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        host, port = self._runner.addresses[0][:2]
+        self.base_url = f"http://{host}:{port}/{{routing}}"
+        return self.base_url
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self) -> "ReplayServer":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def reset(self):
+        """
+        Clears stats, rate-limit windows and error bursts (e.g. between benchmark runs).
+        """
+        self.stats.clear()
+        self._windows.clear()
+        self._bursts.clear()
+
+    def _rate_limit(self, routing: str) -> tuple[dict[str, str], float | None]:
+        """
+        Records a request against `routing`'s windows.
+        Returns the rate-limit headers, and the seconds to wait if a window is full.
+        """
+        now = time.monotonic()
+        windows = self._windows.setdefault(routing, [deque() for _ in self.rate_limits])
+        retry_after = None
+        for (count, seconds), window in zip(self.rate_limits, windows):
+            while window and window[0] <= now - seconds:
+                window.popleft()
+            if len(window) >= count:
+                wait = window[0] + seconds - now
+                retry_after = max(retry_after or 0, wait)
+        # Rejected requests don't count against the limits
+        if retry_after is None:
+            for window in windows:
+                window.append(now)
+
+        headers = {
+            "X-App-Rate-Limit": ",".join(f"{count}:{seconds:g}" for count, seconds in self.rate_limits),
+            "X-App-Rate-Limit-Count": ",".join(
+                f"{len(window)}:{seconds:g}" for (_, seconds), window in zip(self.rate_limits, windows)
+            ),
+        }
+        return headers, retry_after
+
+    @web.middleware
+    async def _middleware(self, request: web.Request, handler):
+        self.stats["requests"] += 1
+        if not request.headers.get("X-Riot-Token"):
+            self.stats["forbidden"] += 1
+            return web.json_response({"status": {"message": "Forbidden", "status_code": 403}}, status=403)
+
+        routing = request.path.split("/")[1]
+        headers = {}
+        if self.rate_limits:
+            headers, retry_after = self._rate_limit(routing)
+            if retry_after is not None:
+                self.stats["rate_limited"] += 1
+                headers["Retry-After"] = str(math.ceil(retry_after))
+                headers["X-Rate-Limit-Type"] = "application"
+                return web.json_response(
+                    {"status": {"message": "Rate limit exceeded", "status_code": 429}},
+                    status=429,
+                    headers=headers,
+                )
+
+        config = self.config
+        await asyncio.sleep(self._rng.lognormvariate(math.log(config.latency_median_s), config.latency_sigma))
+
+        if not self._bursts[routing] and self._rng.random() < config.error_rate:
+            self._bursts[routing] = config.error_burst
+        if self._bursts[routing]:
+            self._bursts[routing] -= 1
+            self.stats["server_error"] += 1
+            return web.json_response(
+                {"status": {"message": "Service Unavailable", "status_code": 503}},
+                status=503,
+                headers=headers,
+            )
+
+        response = await handler(request)
+        response.headers.update(headers)
+        self.stats["ok"] += 1
+        return response
+
+    def _handle(self, endpoint: str, synthesize):
+        async def handler(request: web.Request) -> web.Response:
+            body = self._fixtures.get(endpoint)
+            if body is None:
+                body = synthesize(request.match_info, request.query)
+            return web.Response(body=body, content_type="application/json")
+        return handler
+
+    def _league_entries(self, match_info, query) -> bytes:
+        return _league_entries(
+            self.config.seed,
+            match_info["platform"],
+            match_info["tier"],
+            match_info["division"],
+            int(query.get("page", 1)),
+            (self.config.ladder_pages, self.config.page_size),
+        )
+
+    def _league_list(self, match_info, query) -> bytes:
+        elite_tier = match_info["elite_tier"].upper()
+        if elite_tier not in ELITE_TIERS:
+            raise web.HTTPNotFound()
+        return _league_list(self.config.seed, match_info["platform"], elite_tier, self.config.page_size)
+
+    def _account(self, match_info, query) -> bytes:
+        puuid = match_info["puuid"]
+        return orjson.dumps({"puuid": puuid, "gameName": puuid[-16:], "tagLine": "0000"})
+
+    def _match_ids(self, match_info, query) -> bytes:
+        region = match_info["region"]
+        rng = _rng(self.config.seed, region, match_info["puuid"], query.get("startTime"))
+        match_ids = [
+            f"{region.upper()}_{rng.randrange(self.config.match_pool)}"
+            for _ in range(self.config.match_ids_per_player)
+        ]
+        start = int(query.get("start", 0))
+        return orjson.dumps(match_ids[start:start + int(query.get("count", 20))])
+
+    def _match_info(self, match_info, query) -> bytes:
+        return _match_info(self.config.seed, match_info["region"], match_info["match_id"])
+
+    def _match_timeline(self, match_info, query) -> bytes:
+        return _match_timeline(
+            self.config.seed, match_info["region"], match_info["match_id"], self.config.timeline_frames
+        )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Serve a local replay of the Riot API.")
+    defaults = ReplayConfig()
+
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind.")
+    parser.add_argument("--port", type=int, default=8080, help="Port to bind.")
+    parser.add_argument("--latency-median-s", type=float, default=defaults.latency_median_s,
+                        help="Median response latency, in seconds.")
+    parser.add_argument("--latency-sigma", type=float, default=defaults.latency_sigma,
+                        help="Spread of the log-normal latency distribution.")
+    parser.add_argument("--rate-limits", default=defaults.rate_limits,
+                        help="Application rate limits per routing value, as 'count:seconds,...'.")
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate,
+                        help="Probability that a request starts a burst of 5xx responses.")
+    parser.add_argument("--error-burst", type=int, default=defaults.error_burst,
+                        help="Consecutive 5xx responses per burst.")
+    parser.add_argument("--fixtures-dir", default=None,
+                        help="Directory of recorded '{endpoint}.json' payloads.")
+
+    return parser.parse_args()
+
+
+async def serve(config: ReplayConfig, host: str, port: int):
+    server = ReplayServer(config)
+    base_url = await server.start(host, port)
+    print(f"Serving on {base_url} (set RIOT_API_BASE_URL to it)")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+
+
+def main():
+    args = parse_args()
+    config = ReplayConfig(
+        latency_median_s=args.latency_median_s,
+        latency_sigma=args.latency_sigma,
+        rate_limits=args.rate_limits,
+        error_rate=args.error_rate,
+        error_burst=args.error_burst,
+        fixtures_dir=args.fixtures_dir,
+    )
+    asyncio.run(serve(config, args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Priority scheduling of Riot API requests against the API key's rate limits.
+
+Riot enforces the application rate limits per routing value (platform or region),
+and every endpoint on that route draws from the same budget. Rather than letting each
+asset burn through it in whatever order it happens to issue calls (and then sit out
+429s), requests wait here for a token, and tokens go to the most important waiter:
+1. Any waiter whose deadline is within URGENCY_WINDOW_S (earliest deadline first);
+2. Otherwise, the lowest `Priority`, then the earliest deadline, then arrival order.
+
+Limits use Riot's own `X-App-Rate-Limit` notation, e.g. "20:1,100:120"
+(20 requests per second and 100 requests per 2 minutes).
+"""
+import asyncio
+from collections import deque
+from dataclasses import dataclass, field
+from enum import IntEnum
+import heapq
+import itertools
+import math
+import time
+
+
+URGENCY_WINDOW_S = 60
+
+
+class Priority(IntEnum):
+    """Lower values are served first."""
+    LADDER = 0
+    ACCOUNT = 1
+    MATCH_IDS = 2
+    MATCH_INFO = 3
+    MATCH_TIMELINE = 4
+
+
+ENDPOINT_PRIORITIES = {
+    'players': Priority.LADDER,
+    'league_entries': Priority.LADDER,
+    'league_entries_elite': Priority.LADDER,
+    'player_riot_account': Priority.ACCOUNT,
+    'player_match_ids': Priority.MATCH_IDS,
+    'match_info': Priority.MATCH_INFO,
+    'match_timeline': Priority.MATCH_TIMELINE,
+}
+
+
+def parse_rate_limits(rate_limits: str) -> list[tuple[int, float]]:
+    """
+    Parses "count:seconds,count:seconds" into [(count, seconds), ...].
+    """
+    return [
+        (int(count), float(seconds))
+        for count, seconds in (window.split(":") for window in rate_limits.split(","))
+    ]
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    deadline: float
+    seq: int
+    enqueued_at: float = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+
+
+class RateLimitScheduler:
+    """
+    Hands out request tokens for a single routing value.
+    Must be used from a single event loop.
+    """
+
+    def __init__(self, rate_limits: list[tuple[int, float]]):
+        self.rate_limits = rate_limits
+        # Grant timestamps within each window
+        self._grants = [deque() for _ in rate_limits]
+        self._by_priority: list[_Waiter] = []
+        self._by_deadline: list[tuple[float, int, _Waiter]] = []
+        self._seq = itertools.count()
+        self._dispatcher: asyncio.Task | None = None
+        self._pending = 0
+
+        # Metrics
+        self.requests = 0
+        self.max_queue_depth = 0
+        self.total_wait_s = 0.0
+        self.max_wait_s = 0.0
+        self.deadline_misses = 0
+
+    async def acquire(self, priority: int, deadline: float | None = None):
+        """
+        Waits until this request may be sent.
+        `deadline` is an epoch timestamp (seconds) by which the request should go out.
+        """
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(
+            priority=priority,
+            deadline=deadline if deadline is not None else math.inf,
+            seq=next(self._seq),
+            enqueued_at=time.time(),
+            future=loop.create_future(),
+        )
+        heapq.heappush(self._by_priority, waiter)
+        if deadline is not None:
+            heapq.heappush(self._by_deadline, (waiter.deadline, waiter.seq, waiter))
+        self._pending += 1
+        self.max_queue_depth = max(self.max_queue_depth, self._pending)
+
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.ensure_future(self._dispatch())
+        try:
+            await waiter.future
+        finally:
+            self._pending -= 1
+
+    def _wait_for_token(self, now: float) -> float:
+        """Seconds until every window has room for another request."""
+        wait = 0.0
+        for (count, seconds), grants in zip(self.rate_limits, self._grants):
+            while grants and grants[0] <= now - seconds:
+                grants.popleft()
+            if len(grants) >= count:
+                wait = max(wait, grants[0] + seconds - now)
+        return wait
+
+    def _next_waiter(self, now: float) -> _Waiter | None:
+        # Served or cancelled waiters are dropped lazily from both heaps
+        while self._by_deadline and self._by_deadline[0][2].future.done():
+            heapq.heappop(self._by_deadline)
+        if self._by_deadline and self._by_deadline[0][0] - now <= URGENCY_WINDOW_S:
+            return heapq.heappop(self._by_deadline)[2]
+
+        while self._by_priority:
+            waiter = heapq.heappop(self._by_priority)
+            if not waiter.future.done():
+                return waiter
+        return None
+
+    async def _dispatch(self):
+        while True:
+            now = time.time()
+            wait = self._wait_for_token(now)
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+
+            waiter = self._next_waiter(now)
+            if waiter is None:
+                return
+
+            for grants in self._grants:
+                grants.append(now)
+            waiter.future.set_result(None)
+
+            waited = now - waiter.enqueued_at
+            self.requests += 1
+            self.total_wait_s += waited
+            self.max_wait_s = max(self.max_wait_s, waited)
+            if now > waiter.deadline:
+                self.deadline_misses += 1
+
+    def metrics(self) -> dict:
+        return {
+            "requests": self.requests,
+            "queue_depth": self._pending,
+            "max_queue_depth": self.max_queue_depth,
+            "mean_wait_s": round(self.total_wait_s / self.requests, 3) if self.requests else 0.0,
+            "max_wait_s": round(self.max_wait_s, 3),
+            "deadline_misses": self.deadline_misses,
+        }
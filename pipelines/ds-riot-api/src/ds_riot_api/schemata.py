@@ -1,8 +1,9 @@
 from ds_storage import IcebergTableSpec
+import polars as pl
 from pyiceberg.partitioning import PartitionSpec, PartitionField
 from pyiceberg.schema import Schema
 from pyiceberg.table.sorting import SortOrder, SortField, SortDirection, NullOrder
-from pyiceberg.transforms import DayTransform, IdentityTransform
+from pyiceberg.transforms import DayTransform, IdentityTransform, MonthTransform
 from pyiceberg.types import (
     BooleanType,
     FloatType,
@@ -69,5 +70,112 @@ SCHEMATA = {
                 null_order=NullOrder.NULLS_LAST
             )
         )
-    )
+    ),
+
+    # Change-data-capture alternative to `fact_player_rank`:
+    # a row is only written when a player's rank state changes,
+    # and stays valid from `valid_from` until `valid_to` (null while current).
+    'fact_player_rank_history': IcebergTableSpec(
+        schema=Schema(
+            NestedField(1, 'puuid', StringType(), required=True),
+            NestedField(2, 'valid_from', TimestampType(), required=True),
+            NestedField(3, 'valid_to', TimestampType(), required=False),
+            NestedField(4, "server", StringType(), required=True),
+            NestedField(5, "league_id", StringType(), required=True),
+            NestedField(6, "tier", StringType(), required=True),
+            NestedField(7, "division", StringType(), required=True),
+            NestedField(8, "rank", StringType(), required=True),
+            NestedField(9, "league_points", IntegerType(), required=True),
+            NestedField(10, "games_played", IntegerType(), required=True),
+            NestedField(11, "wins", IntegerType(), required=True),
+            NestedField(12, "losses", IntegerType(), required=True),
+            NestedField(13, "win_rate", FloatType(), required=True),
+            NestedField(14, "fresh_blood", BooleanType(), required=True),
+            NestedField(15, "hot_streak", BooleanType(), required=True),
+            NestedField(16, "inactive", BooleanType(), required=True),
+            NestedField(17, "veteran", BooleanType(), required=True),
+
+            # Primary Keys
+            identifier_field_ids=[1, 2]
+        ),
+        partition_spec=PartitionSpec(
+            PartitionField(
+                source_id=4, # Points to 'server'
+                field_id=1000,
+                transform=IdentityTransform(),
+                name="server"
+            ),
+            PartitionField(
+                source_id=2, # Points to 'valid_from'
+                field_id=1001,
+                transform=MonthTransform(), # Changes are sparse: months, not days
+                name="valid_from_month"
+            )
+        ),
+    ),
+
+    # Latest known rank state per player: the open rows of `fact_player_rank_history`.
+    # Kept separately so each day's diff reads one row per player instead of the history.
+    'player_rank_state': IcebergTableSpec(
+        schema=Schema(
+            NestedField(1, 'puuid', StringType(), required=True),
+            NestedField(2, 'valid_from', TimestampType(), required=True),
+            NestedField(3, "server", StringType(), required=True),
+            NestedField(4, "league_id", StringType(), required=True),
+            NestedField(5, "tier", StringType(), required=True),
+            NestedField(6, "division", StringType(), required=True),
+            NestedField(7, "rank", StringType(), required=True),
+            NestedField(8, "league_points", IntegerType(), required=True),
+            NestedField(9, "games_played", IntegerType(), required=True),
+            NestedField(10, "wins", IntegerType(), required=True),
+            NestedField(11, "losses", IntegerType(), required=True),
+            NestedField(12, "win_rate", FloatType(), required=True),
+            NestedField(13, "fresh_blood", BooleanType(), required=True),
+            NestedField(14, "hot_streak", BooleanType(), required=True),
+            NestedField(15, "inactive", BooleanType(), required=True),
+            NestedField(16, "veteran", BooleanType(), required=True),
+
+            # Primary Keys
+            identifier_field_ids=[1]
+        ),
+        partition_spec=PartitionSpec(
+            PartitionField(
+                source_id=3, # Points to 'server'
+                field_id=1000,
+                transform=IdentityTransform(),
+                name="server"
+            ),
+        ),
+    ),
+}
+
+
+# Raw league entries, as returned by `league/v4/entries` (one LeagueEntryDTO per row).
+# Decoding with a fixed schema keeps every raw parquet object on the same columns.
+LEAGUE_ENTRIES = {
+    'leagueId': pl.String,
+    'puuid': pl.String,
+    'queueType': pl.String,
+    'tier': pl.String,
+    'rank': pl.String,
+    'leaguePoints': pl.Int32,
+    'wins': pl.Int32,
+    'losses': pl.Int32,
+    'veteran': pl.Boolean,
+    'inactive': pl.Boolean,
+    'freshBlood': pl.Boolean,
+    'hotStreak': pl.Boolean,
+}
+
+# Elite tiers are served as a single LeagueListDTO whose `entries` (LeagueItemDTO)
+# lack the league-level fields, which are broadcast onto each entry after decoding.
+LEAGUE_LIST = {
+    'leagueId': pl.String,
+    'queue': pl.String,
+    'tier': pl.String,
+    'entries': pl.List(pl.Struct({
+        column: dtype
+        for column, dtype in LEAGUE_ENTRIES.items()
+        if column not in ('leagueId', 'queueType', 'tier')
+    })),
 }
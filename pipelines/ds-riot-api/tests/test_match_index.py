@@ -0,0 +1,110 @@
+from datetime import timedelta
+from ds_common import match_index_partition
+from ds_riot_api import match_index
+from ds_storage import StorageS3
+import duckdb
+import json
+import logging
+from pathlib import Path
+from types import SimpleNamespace
+
+
+CONTEXT = SimpleNamespace(log=logging.getLogger(__name__), run_id="run")
+
+
+def test_index_layout_is_the_one_transforms_read():
+    # As the `riot_api_bucket` resource is configured
+    riot_api_bucket = StorageS3(
+        root="prod",
+        dataset="riot_api",
+        schema_name="raw",
+        tables=[match_index.INDEX_TABLE_NAME],
+        bucket_endpoint="https://bucket.invalid",
+        bucket_name="bucket",
+        access_key_id="key",
+        secret_access_key="secret",
+    )
+
+    assert (
+        riot_api_bucket.partition_path(match_index.INDEX_TABLE_NAME, region="europe")
+        == match_index_partition("prod", "europe")
+    )
+
+
+class LocalBucket:
+    """
+    The StorageS3 methods the index uses, on a local directory.
+    """
+    def __init__(self, root: Path):
+        self.root = root
+
+    def list_objects(self, table_name: str, object_name: str = "*", file_extension: str = "parquet", region: str = None):
+        return sorted(
+            str(path.relative_to(self.root))
+            for path in (self.root / table_name / f"region={region}").glob(f"{object_name}.{file_extension}")
+        )
+
+    def upload(self, data, table_name: str, object_name: str, file_extension: str, region: str):
+        if len(data) == 0:
+            return False
+        path = self.root / table_name / f"region={region}" / f"{object_name}.{file_extension}"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if file_extension == 'json':
+            path.write_text(json.dumps(data))
+        else:
+            data.write_parquet(path)
+        return True
+
+    def get_object_as_json(self, table_name: str, object_name: str, region: str):
+        return json.loads((self.root / table_name / f"region={region}" / f"{object_name}.json").read_text())
+
+    def delete_objects(self, keys: list[str]):
+        for key in keys:
+            (self.root / key).unlink(missing_ok=True)
+
+    def s3_uri(self):
+        return str(self.root)
+
+    def connect(self):
+        return duckdb.connect()
+
+
+def test_compaction_keeps_merged_segments_for_concurrent_readers(tmp_path, monkeypatch):
+    bucket = LocalBucket(tmp_path)
+    monkeypatch.setattr(match_index, "MAX_SEGMENTS", 3)
+
+    def index(rows: list[str]):
+        match_index.add_to_match_index(CONTEXT, bucket, "europe", [{"match_id": match_id} for match_id in rows])
+
+    def load() -> list[str]:
+        return sorted(match_index.load_match_index(CONTEXT, bucket, "europe", bootstrap=lambda: {"EUW1_0"}))
+
+    assert load() == ["EUW1_0"]
+    index(["EUW1_1"])
+    index(["EUW1_2"])
+    # A concurrent run lists the 3 segments before they're compacted
+    listed = match_index.list_segments(bucket, "europe")
+    assert load() == ["EUW1_0", "EUW1_1", "EUW1_2"]
+
+    # The merged segments are still readable, but no longer listed
+    assert match_index.read_segments(bucket, listed)["match_id"].to_list() == ["EUW1_0", "EUW1_1", "EUW1_2"]
+    assert len(match_index.list_segments(bucket, "europe")) == 1
+    index(["EUW1_3"])
+    assert load() == ["EUW1_0", "EUW1_1", "EUW1_2", "EUW1_3"]
+    assert len(bucket.list_objects(match_index.INDEX_TABLE_NAME, region="europe")) == 5
+
+    # Deleted past the grace period, along with the record
+    monkeypatch.setattr(match_index, "GRACE_PERIOD", timedelta(seconds=-1))
+    assert load() == ["EUW1_0", "EUW1_1", "EUW1_2", "EUW1_3"]
+    assert len(bucket.list_objects(match_index.INDEX_TABLE_NAME, region="europe")) == 2
+    assert bucket.list_objects(match_index.INDEX_TABLE_NAME, file_extension="json", region="europe") == []
+
+    # A reader that listed them before finds them gone, and lists again
+    listings = [listed]
+    list_segments = match_index.list_segments
+    monkeypatch.setattr(
+        match_index, "list_segments",
+        lambda bucket, region: listings.pop() if listings else list_segments(bucket, region),
+    )
+    assert load() == ["EUW1_0", "EUW1_1", "EUW1_2", "EUW1_3"]
+    assert listings == []
@@ -0,0 +1,61 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+import gzip
+import logging
+import pytest
+from types import SimpleNamespace
+from ds_common import MATCH_INFO_TABLE_NAME, MATCH_FILE_EXTENSION, raw_match_partition_columns, read_raw_match
+from ds_riot_api import get, player_matches
+from ds_riot_api.client import RiotAPIClient
+from ds_riot_api.replay import ReplayConfig, ReplayServer
+from ds_storage import StorageS3
+
+
+CONTEXT = SimpleNamespace(log=logging.getLogger(__name__))
+
+
+def riot_api_bucket(root: str) -> StorageS3:
+    # As the `riot_api_bucket` resource is configured
+    return StorageS3(
+        root=root,
+        dataset="riot_api",
+        schema_name="raw",
+        tables=[player_matches.MATCH_IDS_TABLE_NAME, MATCH_INFO_TABLE_NAME],
+        bucket_endpoint="https://bucket.invalid",
+        bucket_name="bucket",
+        access_key_id="key",
+        secret_access_key="secret",
+    )
+
+
+def test_raw_matches_are_stored_where_transforms_read_them(tmp_path):
+    # The key ingestion uploads a match's info to, mirrored under `tmp_path`
+    path = tmp_path / riot_api_bucket("prod").object_path(
+        MATCH_INFO_TABLE_NAME,
+        "EUW1_1",
+        MATCH_FILE_EXTENSION,
+        **raw_match_partition_columns("europe", "202603"),
+    )
+    path.parent.mkdir(parents=True)
+    path.write_bytes(gzip.compress(b'{"info": {"queueId": 420}}'))
+
+    assert read_raw_match(tmp_path / "prod", MATCH_INFO_TABLE_NAME, "europe", "EUW1_1") == {"info": {"queueId": 420}}
+
+
+@pytest.mark.asyncio
+async def test_fetch_match_ids_reads_every_page_offline(monkeypatch):
+    monkeypatch.setattr(get, "RIOT_API_KEY", "replay")
+    day = datetime(2026, 3, 1, tzinfo=timezone.utc)
+    async with ReplayServer(ReplayConfig(latency_median_s=0.001, rate_limits="", match_ids_per_player=250)) as server:
+        monkeypatch.setattr(get, "BASE_URL", server.base_url)
+        client = RiotAPIClient(rate_limits="100:1")
+        try:
+            match_ids = await player_matches.fetch_match_ids(
+                CONTEXT, client, asyncio.Semaphore(1), "europe", "puuid", day, day + timedelta(days=1)
+            )
+        finally:
+            await client.close()
+
+    # Pages of 100, 100 and 50
+    assert len(match_ids) == 250
+    assert server.stats["requests"] == 3
@@ -0,0 +1,61 @@
+from datetime import date
+from ds_riot_api import player_rank
+from ds_riot_api.schemata import LEAGUE_ENTRIES
+from ds_storage import StorageS3
+import polars as pl
+
+
+DAY = date(2026, 3, 1)
+
+
+def test_scan_league_entries_aligns_old_and_new_objects(tmp_path, monkeypatch):
+    # The bucket's keys, mirrored under `tmp_path`
+    monkeypatch.setattr(
+        StorageS3, "s3_uri",
+        lambda self, table_name, **partition_columns: str(self.partition_path(table_name, **partition_columns)),
+    )
+    monkeypatch.setattr(StorageS3, "storage_options", lambda self: None)
+    riot_api_bucket = StorageS3(
+        root=str(tmp_path),
+        dataset="riot_api",
+        schema_name="raw",
+        tables=[player_rank.RAW_TABLE_NAME],
+        file_extension="parquet",
+        bucket_endpoint="https://bucket.invalid",
+        bucket_name="bucket",
+        access_key_id="key",
+        secret_access_key="secret",
+    )
+    partition = {"year": DAY.year, "month": DAY.month, "server": "euw1"}
+
+    def write(df: pl.DataFrame, tier: str, division: str):
+        path = riot_api_bucket.object_path(
+            player_rank.RAW_TABLE_NAME, DAY, "parquet", **partition, tier=tier, division=division
+        )
+        path.parent.mkdir(parents=True)
+        df.write_parquet(path)
+
+    # Old elite layout: the league's `name` and `queue`, no `queueType`, and inferred dtypes
+    write(pl.DataFrame({
+        "leagueId": ["league"], "name": ["Foo's Legends"], "queue": ["RANKED_SOLO_5x5"], "tier": ["CHALLENGER"],
+        "puuid": ["old"], "rank": ["I"], "leaguePoints": [1200], "wins": [100], "losses": [80],
+        "veteran": [True], "inactive": [False], "freshBlood": [False], "hotStreak": [True],
+        "timestamp": [1_772_323_200],
+    }), "CHALLENGER", "I")
+    # Current layout
+    write(pl.DataFrame({
+        "leagueId": [None], "puuid": ["new"], "queueType": ["RANKED_SOLO_5x5"], "tier": ["GOLD"], "rank": ["II"],
+        "leaguePoints": [50], "wins": [10], "losses": [12], "veteran": [False], "inactive": [False],
+        "freshBlood": [True], "hotStreak": [None],
+    }, schema=LEAGUE_ENTRIES).with_columns(timestamp=pl.lit(1_772_323_200)), "GOLD", "II")
+
+    df = player_rank.scan_league_entries(riot_api_bucket, DAY, "euw1").collect().sort("puuid")
+
+    assert df.select(LEAGUE_ENTRIES.keys()).schema == pl.Schema(LEAGUE_ENTRIES)
+    assert df.select("puuid", "tier", "division", "queueType", "leaguePoints").rows() == [
+        ("new", "GOLD", "II", "RANKED_SOLO_5x5", 50),
+        ("old", "CHALLENGER", "I", None, 1200),
+    ]
+    assert "name" not in df.columns
+    # Both make it through the clean transform
+    assert player_rank.transform_league_entries(df.lazy()).collect()["games_played"].to_list() == [22, 180]
@@ -0,0 +1,163 @@
+from datetime import date, datetime, timedelta, timezone
+from ds_riot_api import player_rank_history
+from ds_riot_api.schemata import LEAGUE_ENTRIES
+from ds_storage.polars import convert_polars_df_to_pyarrow_table_using_iceberg_schema, iceberg_to_polars_schema
+import logging
+import operator
+import polars as pl
+from pyiceberg.expressions import (
+    And,
+    BooleanExpression,
+    EqualTo,
+    GreaterThan,
+    GreaterThanOrEqual,
+    IsNull,
+    LessThan,
+    LessThanOrEqual,
+    Or,
+)
+from pyiceberg.expressions.literals import TimestampLiteral
+import pytest
+from types import SimpleNamespace
+
+
+CONTEXT = SimpleNamespace(log=logging.getLogger(__name__))
+DAY_1, DAY_2 = date(2026, 3, 1), date(2026, 3, 2)
+
+
+COMPARISONS = {
+    EqualTo: operator.eq,
+    GreaterThan: operator.gt,
+    GreaterThanOrEqual: operator.ge,
+    LessThan: operator.lt,
+    LessThanOrEqual: operator.le,
+}
+
+
+def to_polars(expression: BooleanExpression) -> pl.Expr:
+    """
+    The Polars expression of the row filters the history uses.
+    """
+    match expression:
+        case And():
+            return to_polars(expression.left) & to_polars(expression.right)
+        case Or():
+            return to_polars(expression.left) | to_polars(expression.right)
+        case IsNull():
+            return pl.col(expression.term.name).is_null()
+        case _:
+            column = pl.col(expression.term.name)
+            if isinstance(expression.literal, TimestampLiteral):
+                column = column.dt.epoch("us")
+            return COMPARISONS[type(expression)](column, expression.literal.value)
+
+
+class InMemoryCatalog:
+    """
+    The StorageIceberg methods the history uses, on in-memory Polars frames.
+    """
+    def __init__(self):
+        self.tables: dict[str, pl.DataFrame] = {}
+        self.schemas = {}
+
+    def create_table_if_not_exists(self, table_name: str, spec):
+        if table_name not in self.tables:
+            self.schemas[table_name] = spec.schema
+            self.tables[table_name] = pl.DataFrame(schema=iceberg_to_polars_schema(spec.schema))
+
+    def load_table_to_polars(self, table_name: str, selected_fields=None, row_filter=None, **partition_columns):
+        df = self.tables[table_name]
+        for column, value in partition_columns.items():
+            if value is not None:
+                df = df.filter(pl.col(column) == value)
+        if row_filter is not None:
+            df = df.filter(to_polars(row_filter))
+        return df.select(selected_fields) if selected_fields else df
+
+    def write_dataframe_to_table(self, table_name: str, df: pl.DataFrame, mode: str = "append", overwrite_filter=None):
+        schema = self.schemas[table_name]
+        df = pl.from_arrow(convert_polars_df_to_pyarrow_table_using_iceberg_schema(df, schema))
+        df_existing = self.tables[table_name]
+        match mode:
+            case "upsert":
+                keys = list(schema.identifier_field_names())
+                df_existing = df_existing.join(df, on=keys, how="anti")
+            case "overwrite":
+                df_existing = df_existing.filter(~to_polars(overwrite_filter))
+        self.tables[table_name] = pl.concat([df_existing, df])
+
+
+def fetched_at(day: date, hours: int) -> datetime:
+    return datetime(day.year, day.month, day.day, hours)
+
+
+def league_entries(day: date, entries: list[dict]) -> pl.LazyFrame:
+    """
+    Raw league entries of a day on euw1, fetched at 1 AM unless stated otherwise.
+    """
+    return pl.LazyFrame([
+        {
+            "leagueId": "league", "queueType": "RANKED_SOLO_5x5", "tier": "GOLD", "rank": "II",
+            "wins": 10, "losses": 10, "veteran": False, "inactive": False, "freshBlood": False, "hotStreak": False,
+            "server": "euw1", "division": "II",
+            "timestamp": int(fetched_at(day, 1).replace(tzinfo=timezone.utc).timestamp()),
+            **entry,
+        }
+        for entry in entries
+    ], schema_overrides={**LEAGUE_ENTRIES, "timestamp": pl.Int64})
+
+
+def test_history_records_only_the_changes():
+    catalog_clean = InMemoryCatalog()
+
+    def record(day: date, entries: list[dict]):
+        return player_rank_history.record_player_rank_changes(
+            CONTEXT, catalog_clean, lambda: league_entries(day, entries), day, "euw1"
+        )
+
+    # A league without an id, and counters missing from the entry: null, yet unchanged
+    nulls = {"leagueId": None, "wins": None, "veteran": None}
+    assert record(DAY_1, [
+        {"puuid": "unchanged", "leaguePoints": 10},
+        {"puuid": "nulls", "leaguePoints": 20, **nulls},
+        {"puuid": "changed", "leaguePoints": 30},
+        {"puuid": "left", "leaguePoints": 40},
+    ]) == {"player_count": 4, "changed_count": 4, "closed_count": 0, "unchanged_count": 0}
+
+    changed_at = int(fetched_at(DAY_2, 2).replace(tzinfo=timezone.utc).timestamp())
+    assert record(DAY_2, [
+        {"puuid": "unchanged", "leaguePoints": 10},
+        {"puuid": "nulls", "leaguePoints": 20, **nulls},
+        {"puuid": "changed", "leaguePoints": 55, "wins": 11, "timestamp": changed_at},
+        {"puuid": "new", "leaguePoints": 0},
+    ]) == {"player_count": 4, "changed_count": 2, "closed_count": 2, "unchanged_count": 2}
+
+    # A day older than the state is skipped, without scanning its entries
+    assert player_rank_history.record_player_rank_changes(
+        CONTEXT, catalog_clean, lambda: pytest.fail("scanned"), DAY_1, "euw1"
+    ) is None
+
+    df_history = catalog_clean.load_table_to_polars(player_rank_history.HISTORY_TABLE_NAME).sort("puuid", "valid_from")
+    assert df_history.select("puuid", "league_points", "valid_from", "valid_to").rows() == [
+        # Closed when its change was fetched
+        ("changed", 30, fetched_at(DAY_1, 1), fetched_at(DAY_2, 2)),
+        ("changed", 55, fetched_at(DAY_2, 2), None),
+        # Closed when the ladder it's missing from was fetched
+        ("left", 40, fetched_at(DAY_1, 1), fetched_at(DAY_2, 1)),
+        ("new", 0, fetched_at(DAY_2, 1), None),
+        ("nulls", 20, fetched_at(DAY_1, 1), None),
+        ("unchanged", 10, fetched_at(DAY_1, 1), None),
+    ]
+
+    df_state = catalog_clean.load_table_to_polars(player_rank_history.STATE_TABLE_NAME, server="euw1")
+    assert sorted(df_state["puuid"]) == ["changed", "new", "nulls", "unchanged"]
+
+    def ladder_as_of(as_of: datetime) -> list[tuple[str, int]]:
+        df = player_rank_history.load_player_rank_as_of(catalog_clean, as_of, server="euw1")
+        return sorted(df.select("puuid", "league_points").rows())
+
+    assert ladder_as_of(fetched_at(DAY_1, 12)) == [("changed", 30), ("left", 40), ("nulls", 20), ("unchanged", 10)]
+    assert ladder_as_of(fetched_at(DAY_2, 1) + timedelta(minutes=30)) == [
+        ("changed", 30), ("new", 0), ("nulls", 20), ("unchanged", 10),
+    ]
+    assert ladder_as_of(fetched_at(DAY_2, 12)) == [("changed", 55), ("new", 0), ("nulls", 20), ("unchanged", 10)]
@@ -0,0 +1,68 @@
+import logging
+import pytest
+from types import SimpleNamespace
+from ds_riot_api import get
+from ds_riot_api.client import RiotAPIClient
+from ds_riot_api.replay import ReplayConfig, ReplayServer
+
+
+CONTEXT = SimpleNamespace(log=logging.getLogger(__name__))
+
+
+@pytest.fixture
+def offline(monkeypatch):
+    monkeypatch.setattr(get, "RIOT_API_KEY", "replay")
+    monkeypatch.setattr(get, "BACKOFF_BASE", 0.01)
+
+
+@pytest.mark.asyncio
+async def test_fetch_retries_through_errors_offline(offline, monkeypatch):
+    async with ReplayServer(ReplayConfig(latency_median_s=0.001, rate_limits="", error_rate=0.5, error_burst=2)) as server:
+        monkeypatch.setattr(get, "BASE_URL", server.base_url)
+        pages = [
+            await get.fetch_with_rate_limit(
+                CONTEXT, 'league_entries', platform='euw1', tier='GOLD', division='II', page=page
+            )
+            for page in range(1, 6)
+        ]
+
+    assert all(len(entries) == ReplayConfig().page_size for entries in pages)
+    assert server.stats["ok"] == 5
+    assert server.stats["server_error"] > 0
+
+
+@pytest.mark.asyncio
+async def test_client_stays_within_rate_limits_offline(offline, monkeypatch):
+    async with ReplayServer(ReplayConfig(latency_median_s=0.001, rate_limits="10:1")) as server:
+        monkeypatch.setattr(get, "BASE_URL", server.base_url)
+        # Headroom for network jitter between the client's and the server's clocks
+        client = RiotAPIClient(rate_limits="8:1")
+        try:
+            for platform in ('euw1', 'kr'):
+                for page in range(1, 16):
+                    await client.fetch(
+                        CONTEXT, 'league_entries', platform=platform, tier='GOLD', division='II', page=page
+                    )
+        finally:
+            await client.close()
+
+    assert server.stats["rate_limited"] == 0
+    assert server.stats["ok"] == 30
+
+
+@pytest.mark.asyncio
+async def test_client_takes_a_token_per_attempt_offline(offline, monkeypatch):
+    async with ReplayServer(ReplayConfig(latency_median_s=0.001, rate_limits="", error_rate=0.5, error_burst=2)) as server:
+        monkeypatch.setattr(get, "BASE_URL", server.base_url)
+        client = RiotAPIClient(rate_limits="100:1")
+        try:
+            for page in range(1, 6):
+                await client.fetch(
+                    CONTEXT, 'league_entries', platform='euw1', tier='GOLD', division='II', page=page
+                )
+        finally:
+            await client.close()
+
+    assert server.stats["server_error"] > 0
+    # Retries went through the scheduler too
+    assert client.metrics()["euw1"]["requests"] == server.stats["requests"]
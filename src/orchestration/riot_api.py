@@ -4,6 +4,8 @@ Self-contained Dagster code location for the Riot Games API source platform.
 """
 import dagster as dg
 import ds_riot_api, ds_storage
+import os
+import tempfile
 from ds_platform import *
 
 
@@ -11,21 +13,29 @@ modules = [ds_riot_api]
 jobs = [
     ds_riot_api.job_raw_riot_api_league_entries,
     ds_riot_api.job_clean_riot_api_player_rank,
+    ds_riot_api.job_clean_riot_api_player_rank_history,
     ds_riot_api.job_riot_api_player_matches,
+    ds_riot_api.job_riot_api_daily_ladder,
 ]
 schedules = [
     ds_riot_api.schedule_riot_api_player_rank,
     ds_riot_api.schedule_riot_api_player_matches,
+    ds_riot_api.schedule_riot_api_daily_ladder,
 ]
 sensors = [
     ds_riot_api.sensor_riot_api_league_entries_to_player_rank,
+    ds_riot_api.sensor_riot_api_league_entries_to_player_rank_history,
 ]
 resources = {
+    "riot_api": ds_riot_api.RiotAPIClient(
+        # Survives step retries on the same host
+        cache_dir=os.path.join(tempfile.gettempdir(), "riot_api_cache"),
+    ),
     "riot_api_bucket": ds_storage.StorageS3(
         root=ENVIRONMENT,
         dataset='riot_api',
         schema_name='raw',
-        tables=['league_entries'],
+        tables=['league_entries', 'league_entries_checkpoints', 'player_match_ids', 'match_info', 'match_timeline', 'match_ids_index'],
         file_extension='parquet',
         bucket_endpoint=BUCKET_ENDPOINT,
         bucket_name=BUCKET_NAME,